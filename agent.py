@@ -0,0 +1,150 @@
+"""Агент для удаленного мониторинга: отдает сборщики monitoring.py и
+выполнение команд боту на другом сервере.
+
+Запуск на наблюдаемом сервере (токен общий с ботом, AGENT_TOKEN в .env):
+    python agent.py --host 0.0.0.0 --port 8765
+"""
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import os
+import platform
+import struct
+import zlib
+import config
+
+logger = logging.getLogger(__name__)
+
+# Кадр протокола: длина (4 байта, big-endian) + JSON, сжатый zlib.
+# Лимит действует и на сжатый, и на распакованный размер
+FRAME_HEADER = struct.Struct('>I')
+MAX_FRAME = 16 * 1024 * 1024
+# Лимит кадра до авторизации: ответ на вызов - одна короткая строка
+HELLO_MAX_FRAME = 4096
+
+class AgentError(Exception):
+    """Ошибка протокола или авторизации агента"""
+
+def sign(token, nonce):
+    """Ответ на вызов: HMAC-SHA256 одноразового nonce общим токеном"""
+    return hmac.new(token.encode(), nonce.encode(), hashlib.sha256).hexdigest()
+
+def decode_frame(data, limit=MAX_FRAME):
+    """Распаковать тело кадра не больше limit байт (защита от zip-бомбы)"""
+    decompressor = zlib.decompressobj()
+    try:
+        raw = decompressor.decompress(data, limit)
+    except zlib.error as e:
+        raise AgentError(f"Некорректный кадр: {e}")
+    if decompressor.unconsumed_tail or not decompressor.eof:
+        raise AgentError(f"Кадр больше {limit} байт после распаковки или обрезан")
+    return json.loads(raw)
+
+async def read_frame(reader, limit=MAX_FRAME):
+    """Прочитать один кадр; None при закрытом соединении"""
+    try:
+        header = await reader.readexactly(FRAME_HEADER.size)
+    except asyncio.IncompleteReadError:
+        return None
+    (length,) = FRAME_HEADER.unpack(header)
+    if length > limit:
+        raise AgentError(f"Слишком большой кадр: {length} байт")
+    data = await reader.readexactly(length)
+    return decode_frame(data, limit)
+
+async def write_frame(writer, message):
+    """Отправить один кадр"""
+    data = zlib.compress(json.dumps(message, ensure_ascii=False).encode(), 6)
+    writer.write(FRAME_HEADER.pack(len(data)) + data)
+    await writer.drain()
+
+async def handle_request(request):
+    """Выполнить одну операцию пакета"""
+    # Импорт здесь: сборщики нужны только на стороне агента
+    from commands import predefined_commands, run_predefined
+    from monitoring import VIEWS, snapshot_summary
+    
+    op = request.get('op')
+    loop = asyncio.get_running_loop()
+    if op == 'snapshot':
+        return snapshot_summary()
+    if op == 'view':
+        view = VIEWS[request['name']]
+        return await loop.run_in_executor(None, lambda: view(**request.get('kwargs', {})))
+    if op == 'predefined':
+        if request['name'] not in predefined_commands:
+            raise AgentError(f"Неизвестная команда {request['name']!r}")
+        return await run_predefined(request['name'], user_id=request.get('user_id'))
+    raise AgentError(f"Неизвестная операция {op!r}")
+
+async def run_request(request):
+    try:
+        return {'ok': True, 'result': await handle_request(request)}
+    except Exception as e:
+        return {'ok': False, 'error': str(e)}
+
+def make_handler(token):
+    async def handle_client(reader, writer):
+        """Соединение: вызов-ответ для авторизации, затем пакеты запросов"""
+        peer = writer.get_extra_info('peername')
+        nonce = os.urandom(16).hex()
+        try:
+            await write_frame(writer, {'nonce': nonce, 'host': platform.node()})
+            hello = await asyncio.wait_for(read_frame(reader, HELLO_MAX_FRAME), 10)
+            if (not isinstance(hello, dict)
+                    or not hmac.compare_digest(str(hello.get('auth', '')), sign(token, nonce))):
+                logger.warning(f"Агент: отказ в доступе для {peer}")
+                await write_frame(writer, {'error': 'auth'})
+                return
+            await write_frame(writer, {'ok': True})
+            
+            while True:
+                batch = await read_frame(reader)
+                if batch is None:
+                    break
+                if not isinstance(batch, dict):
+                    raise AgentError("Некорректный пакет запросов")
+                # Запросы пакета выполняются параллельно
+                results = await asyncio.gather(*(run_request(r) for r in batch.get('requests', [])))
+                await write_frame(writer, {'results': results})
+        except (AgentError, asyncio.TimeoutError, ConnectionError, ValueError) as e:
+            logger.warning(f"Агент: соединение {peer} закрыто: {e}")
+        finally:
+            writer.close()
+    return handle_client
+
+async def sample_forever():
+    """Собственный фоновый сборщик метрик агента"""
+    from monitoring import refresh_snapshot
+    from processes import get_tracker
+    loop = asyncio.get_running_loop()
+    while True:
+        await loop.run_in_executor(None, refresh_snapshot)
+        await loop.run_in_executor(None, get_tracker().update)
+        await asyncio.sleep(config.Config.SAMPLER_INTERVAL)
+
+async def serve(host, port, token, sample=True):
+    """Запустить сервер агента (возвращает asyncio.Server)"""
+    if not token:
+        raise AgentError("AGENT_TOKEN не задан - агент без авторизации не запускается")
+    server = await asyncio.start_server(make_handler(token), host, port)
+    if sample:
+        server.sampler = asyncio.create_task(sample_forever())
+    return server
+
+async def main(host, port):
+    server = await serve(host, port, config.Config.AGENT_TOKEN)
+    print(f"✅ Агент слушает {host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Агент мониторинга для бота')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=config.Config.AGENT_PORT)
+    args = parser.parse_args()
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+    asyncio.run(main(args.host, args.port))
@@ -0,0 +1,239 @@
+import asyncio
+import logging
+import re
+import time
+from collections import namedtuple
+import config
+import services
+from send_queue import BACKGROUND
+
+logger = logging.getLogger(__name__)
+
+# Значения, доступные в правилах, из monitoring.MetricsSnapshot
+METRICS = {
+    'cpu': lambda s: s.cpu_percent,
+    'cpu.percent': lambda s: s.cpu_percent,
+    'load1': lambda s: s.load_avg[0],
+    'load5': lambda s: s.load_avg[1],
+    'load15': lambda s: s.load_avg[2],
+    'mem.percent': lambda s: s.memory.percent,
+    'mem.available_mb': lambda s: s.memory.available / 1024 ** 2,
+    'swap.percent': lambda s: s.swap.percent,
+    'temp': lambda s: s.cpu_temp,
+    # Только разделы блочных устройств: tmpfs и сетевые ФС не считаются
+    'disk.percent': lambda s: max((usage.percent for usage in s.disks if usage.block), default=None),
+}
+
+RULE_RE = re.compile(
+    r'^(?:service:(?P<service>\S+)\s+(?P<state>down|up)'
+    r'|(?P<metric>[\w.]+)\s*(?P<op>[<>])\s*(?P<threshold>-?[\d.]+))'
+    r'(?:\s+for\s+(?P<duration>\d+[smhd]))?'
+    r'(?:\s+clear\s+(?P<clear>-?[\d.]+))?$'
+)
+
+DURATION_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+# Состояния юнита systemd (ActiveState), при которых он считается онлайн
+UNIT_UP_STATES = ('active', 'reloading')
+
+# Смена состояния правила: 'firing' или 'resolved'
+AlertEvent = namedtuple('AlertEvent', ['rule', 'state', 'value', 'timestamp'])
+
+class AlertRule:
+    """Правило с гистерезисом: срабатывает после duration, снимается по порогу clear"""
+    
+    def __init__(self, text, kind, subject, op, threshold, clear, duration):
+        self.text = text
+        self.kind = kind          # 'metric' или 'service'
+        self.subject = subject    # имя метрики или сервиса
+        self.op = op
+        self.threshold = threshold
+        self.clear = clear
+        self.duration = duration
+        
+        self.state = 'ok'         # ok -> pending -> firing -> ok
+        self.pending_since = None
+        self.notified = False
+        self.last_notified = None
+        self.value = None
+    
+    def _breached(self, value):
+        return value > self.threshold if self.op == '>' else value < self.threshold
+    
+    def _cleared(self, value):
+        return value <= self.clear if self.op == '>' else value >= self.clear
+    
+    def evaluate(self, value, now):
+        """Учесть новое значение; возвращает AlertEvent при смене состояния"""
+        self.value = value
+        
+        if self.state == 'firing':
+            if not self._cleared(value):
+                return None
+            self.state, self.pending_since = 'ok', None
+            # "Решено" отправляем, только если сообщали о срабатывании
+            if self.notified:
+                self.notified = False
+                return AlertEvent(self, 'resolved', value, now)
+            return None
+        
+        if not self._breached(value):
+            self.state, self.pending_since = 'ok', None
+            return None
+        
+        if self.pending_since is None:
+            self.state, self.pending_since = 'pending', now
+        if now - self.pending_since < self.duration:
+            return None
+        
+        self.state = 'firing'
+        # Повторные срабатывания в пределах cooldown не рассылаем
+        if self.last_notified is not None and now - self.last_notified < config.Config.ALERT_COOLDOWN:
+            return None
+        self.notified = True
+        self.last_notified = now
+        return AlertEvent(self, 'firing', value, now)
+
+def parse_duration(text):
+    """'5m' -> 300"""
+    return int(text[:-1]) * DURATION_UNITS[text[-1]] if text else 0
+
+def parse_rule(text):
+    """Разбор строки правила, например 'mem.percent > 90 for 5m' или 'service:cloud down'"""
+    match = RULE_RE.match(text.strip())
+    if not match:
+        raise ValueError(f"Не удалось разобрать правило: {text!r}")
+    
+    duration = parse_duration(match['duration'])
+    if match['service']:
+        # Сервис: 1 - онлайн, 0 - офлайн
+        op = '<' if match['state'] == 'down' else '>'
+        return AlertRule(text, 'service', match['service'], op, 0.5, 0.5, duration)
+    
+    metric = match['metric']
+    if metric not in METRICS:
+        raise ValueError(f"Неизвестная метрика {metric!r} в правиле {text!r}")
+    
+    op = match['op']
+    threshold = float(match['threshold'])
+    if match['clear'] is not None:
+        clear = float(match['clear'])
+    else:
+        margin = abs(threshold) * config.Config.ALERT_HYSTERESIS
+        clear = threshold - margin if op == '>' else threshold + margin
+    return AlertRule(text, 'metric', metric, op, threshold, clear, duration)
+
+class AlertEngine:
+    """Инкрементальная проверка правил: на каждом тике O(число правил)"""
+    
+    def __init__(self, rules):
+        self.rules = []
+        for text in rules:
+            try:
+                self.rules.append(parse_rule(text))
+            except ValueError as e:
+                logger.error(str(e))
+        self.metric_rules = [r for r in self.rules if r.kind == 'metric']
+        self.service_rules = {}
+        for rule in self.rules:
+            if rule.kind == 'service':
+                self.service_rules.setdefault(rule.subject, []).append(rule)
+    
+    def observe_snapshot(self, snapshot):
+        """Проверить метрические правила на новом снимке"""
+        events = []
+        for rule in self.metric_rules:
+            value = METRICS[rule.subject](snapshot)
+            if value is None:
+                continue
+            event = rule.evaluate(value, snapshot.timestamp)
+            if event:
+                events.append(event)
+        return events
+    
+    def observe_services(self, results, now=None):
+        """Проверить правила сервисов на результатах services.iter_services_status"""
+        now = now or time.time()
+        events = []
+        for result in results:
+            for rule in self.service_rules.get(result.check.name, ()):
+                event = rule.evaluate(1 if result.ok else 0, now)
+                if event:
+                    events.append(event)
+        return events
+
+    def unit_rules(self, unit):
+        """Правила, относящиеся к юниту: по именам systemd-проверок с target == unit
+        и по имени самого юнита. Для юнита без проверки и правила создается
+        'service:<юнит> down', так что мигающий юнит подчиняется cooldown"""
+        names = [check.name for check in services.get_checks()
+                 if check.kind == 'systemd' and check.target == unit]
+        rules = [rule for name in dict.fromkeys([*names, unit]) for rule in self.service_rules.get(name, ())]
+        if rules or names:
+            return rules
+        rule = parse_rule(f"service:{unit} down")
+        self.rules.append(rule)
+        self.service_rules[unit] = [rule]
+        return [rule]
+    
+    def observe_units(self, events):
+        """Смена состояния юнитов systemd (systemd_units.UnitEvent) -> правила сервисов"""
+        alerts = []
+        for event in events:
+            value = 1 if event.new in UNIT_UP_STATES else 0
+            for rule in self.unit_rules(event.unit):
+                alert = rule.evaluate(value, event.timestamp)
+                if alert:
+                    alerts.append(alert)
+        return alerts
+
+def format_event(event):
+    """Текст уведомления"""
+    rule = event.rule
+    if rule.kind == 'service':
+        value = "онлайн" if event.value else "офлайн"
+    else:
+        value = f"{event.value:.1f}"
+    
+    if event.state == 'firing':
+        return f"🚨 *Алерт:* `{rule.text}`\n\nТекущее значение: {value}"
+    return f"✅ *Решено:* `{rule.text}`\n\nТекущее значение: {value}"
+
+def format_rules(engine):
+    """Список правил с текущими состояниями"""
+    icons = {'ok': '🟢', 'pending': '🟡', 'firing': '🔴'}
+    if not engine.rules:
+        return "📣 *Алерты*\n\nПравила не заданы (`Config.ALERT_RULES`)"
+    
+    lines = ["📣 *Алерты*\n"]
+    for rule in engine.rules:
+        value = "—" if rule.value is None else f"{rule.value:.1f}"
+        lines.append(f"{icons[rule.state]} `{rule.text}` (сейчас: {value})")
+    return "\n".join(lines)
+
+# Очередь уведомлений для администраторов (создается внутри event loop)
+_send_queue = None
+
+def get_send_queue():
+    global _send_queue
+    if _send_queue is None:
+        _send_queue = asyncio.Queue()
+    return _send_queue
+
+def queue_alerts(events):
+    """Поставить уведомления в очередь рассылки всем администраторам"""
+    for event in events:
+        logger.warning(f"Алерт {event.state}: {event.rule.text} = {event.value}")
+        text = format_event(event)
+        for admin_id in config.Config.ADMIN_IDS:
+            get_send_queue().put_nowait((admin_id, text))
+
+async def alert_sender(bot):
+    """Рассылка уведомлений; темп задает общая очередь отправки (фоновый приоритет)"""
+    while True:
+        chat_id, text = await get_send_queue().get()
+        try:
+            await bot.send_message(chat_id=chat_id, text=text, parse_mode='Markdown',
+                                   rate_limit_args=BACKGROUND)
+        except Exception as e:
+            logger.error(f"Не удалось отправить алерт {chat_id}: {e}")
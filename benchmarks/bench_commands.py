@@ -0,0 +1,62 @@
+"""Бенчмарк движка команд: задержка колбэков других пользователей при N параллельных командах
+
+Запуск из корня репозитория:
+    python benchmarks/bench_commands.py [N]
+"""
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from commands import execute_command
+
+COMMAND = 'sleep 0.3 && uptime'
+TICK = 0.01
+
+async def probe_latency(stop):
+    """Имитация колбэка другого администратора: насколько опаздывает каждый тик"""
+    delays = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        delays.append((time.perf_counter() - start - TICK) * 1000)
+    return delays
+
+def legacy_execute(command):
+    """Старый вариант: блокирующий subprocess.run прямо в обработчике"""
+    return subprocess.run(command, shell=True, capture_output=True, text=True).stdout
+
+async def legacy_handler(command):
+    return legacy_execute(command)
+
+async def run_case(n, make_call):
+    stop = asyncio.Event()
+    probe = asyncio.create_task(probe_latency(stop))
+    await asyncio.sleep(0.05)
+    start = time.perf_counter()
+    await asyncio.gather(*(make_call(i) for i in range(n)))
+    total = time.perf_counter() - start
+    stop.set()
+    delays = await probe
+    return total, delays
+
+def report(name, total, delays):
+    delays = sorted(delays) or [0.0]
+    p95 = delays[int(len(delays) * 0.95) - 1] if len(delays) > 1 else delays[0]
+    print(f"{name:10} | всего {total:6.2f} с | тиков {len(delays):4} | "
+          f"задержка колбэка p50 {statistics.median(delays):7.2f} мс, "
+          f"p95 {p95:7.2f} мс, max {delays[-1]:7.2f} мс")
+
+async def main(n):
+    print(f"{n} параллельных команд: {COMMAND!r}\n")
+    total, delays = await run_case(n, lambda i: legacy_handler(COMMAND))
+    report('blocking', total, delays)
+    total, delays = await run_case(n, lambda i: execute_command(COMMAND, user_id=i))
+    report('asyncio', total, delays)
+
+if __name__ == '__main__':
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 8))
@@ -0,0 +1,62 @@
+"""Бенчмарк опроса агентов: последовательный против параллельного
+
+Поднимает несколько агентов на localhost (без фонового сборщика) и
+измеряет время обзора серверов. Параллельный опрос должен стоить
+примерно как один самый медленный агент, а не сумму.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_fleet.py [агентов] [повторов]
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+import fleet
+from agent import serve
+from monitoring import refresh_snapshot
+
+TOKEN = 'bench-token'
+
+async def main(agents, repeat):
+    refresh_snapshot()
+    servers = [await serve('127.0.0.1', 0, TOKEN, sample=False) for _ in range(agents)]
+    config.Config.AGENT_TOKEN = TOKEN
+    config.Config.AGENTS = {
+        f'agent{i}': f"127.0.0.1:{server.sockets[0].getsockname()[1]}"
+        for i, server in enumerate(servers)
+    }
+    fleet._agents = None
+    
+    async def sequential():
+        for host in fleet.get_agents():
+            await fleet.call_one(host, {'op': 'snapshot'})
+    
+    async def view():
+        await asyncio.gather(*(fleet.fetch_view(host, 'system') for host in fleet.get_agents()))
+    
+    # Первый вызов устанавливает соединения - в замеры не входит
+    await fleet.fetch_summaries()
+    
+    for name, call in [('последовательно', sequential),
+                       ('параллельно', fleet.fetch_summaries),
+                       ('экран system', view)]:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            await call()
+        print(f"{name:16} {(time.perf_counter() - start) / repeat * 1000:8.2f} мс")
+    
+    print(fleet.render_overview(await fleet.fetch_summaries()))
+    await fleet.close_agents()
+    await asyncio.sleep(0.1)
+    for server in servers:
+        server.close()
+        await server.wait_closed()
+
+if __name__ == '__main__':
+    agents = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    asyncio.run(main(agents, repeat))
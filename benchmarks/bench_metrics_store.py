@@ -0,0 +1,74 @@
+"""Бенчмарк истории метрик: вставка 30 дней сэмплов раз в 10 с и задержка запросов
+
+Запуск из корня репозитория:
+    python benchmarks/bench_metrics_store.py
+"""
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics_store import FIELDS, MetricsStore
+
+DAYS = 30
+STEP = 10
+SAMPLES = DAYS * 86400 // STEP
+
+def fake_values(i):
+    """Правдоподобные значения: суточная волна + шум"""
+    wave = math.sin(i * STEP / 86400 * 2 * math.pi)
+    return (
+        30 + 20 * wave + random.random() * 10,
+        1.0 + wave, 0.9 + wave, 0.8 + wave,
+        60 + 20 * wave,
+        5.0,
+        45 + 5 * wave,
+        71.3,
+        random.random() * 1e6,
+        random.random() * 5e6,
+    )
+
+def timed(label, func, repeat=20):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f"  {label:38} {elapsed * 1000:9.3f} мс")
+    return result
+
+def main():
+    retention = {'raw': SAMPLES, '1m': DAYS * 1440, '1h': DAYS * 24}
+    values = [fake_values(i) for i in range(SAMPLES)]
+    now = int(time.time())
+    begin = now - SAMPLES * STEP
+    
+    with tempfile.TemporaryDirectory() as directory:
+        store = MetricsStore(directory, retention=retention)
+        start = time.perf_counter()
+        for i, row in enumerate(values):
+            store.add(begin + i * STEP, row)
+        store.flush()
+        elapsed = time.perf_counter() - start
+        
+        size = sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory))
+        print(f"Вставка {SAMPLES:,} сэмплов ({len(FIELDS)} метрик): {elapsed:.2f} с, "
+              f"{SAMPLES / elapsed:,.0f} сэмплов/с, файлы {size / 1024 / 1024:.1f} MB\n")
+        
+        print("Запросы:")
+        for label, seconds in (('1 час', 3600), ('6 часов', 6 * 3600),
+                               ('сутки', 86400), ('30 дней', DAYS * 86400)):
+            for resolution in ('raw', '1m', '1h'):
+                points = timed(f"query mem {label} [{resolution}]",
+                               lambda: store.query('mem', now - seconds, now, resolution))
+                if resolution == 'raw':
+                    print(f"    точек: {len(points):,}")
+            timed(f"aggregate mem {label} [авто]",
+                  lambda: store.aggregate('mem', now - seconds, now))
+        store.close()
+
+if __name__ == '__main__':
+    main()
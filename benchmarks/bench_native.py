@@ -0,0 +1,46 @@
+"""Бенчмарк заготовленных команд: fork/exec против встроенных сборщиков /proc
+
+Для каждой команды с 'native' сравнивается время и процессорное время
+(свое + дочерних процессов) на один вызов.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_native.py [повторов]
+"""
+import asyncio
+import os
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from commands import execute_command, predefined_commands
+
+def cpu_time():
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+async def measure(call, repeat):
+    wall, cpu = time.perf_counter(), cpu_time()
+    for _ in range(repeat):
+        await call()
+    return (time.perf_counter() - wall) / repeat * 1000, (cpu_time() - cpu) / repeat * 1000
+
+async def main(repeat):
+    print(f"{'команда':16} | {'fork, мс':>9} {'CPU, мс':>8} | {'native, мс':>10} {'CPU, мс':>8} | ускорение")
+    for name, entry in predefined_commands.items():
+        native = entry.get('native')
+        if native is None:
+            continue
+        fork_wall, fork_cpu = await measure(lambda: execute_command(entry['command']), repeat)
+        
+        async def run_native():
+            return native()
+        native_wall, native_cpu = await measure(run_native, repeat)
+        
+        print(f"{name:16} | {fork_wall:9.2f} {fork_cpu:8.2f} | {native_wall:10.3f} {native_cpu:8.3f} | "
+              f"x{fork_wall / max(native_wall, 1e-6):.0f}")
+
+if __name__ == '__main__':
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 20))
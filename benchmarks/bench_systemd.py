@@ -0,0 +1,89 @@
+"""Бенчмарк опроса юнитов systemd: systemctl is-active на каждый юнит
+против одного systemctl show на все
+
+Без systemd (контейнер, CI) подставляется фиктивный systemctl на sh - он
+дешевле настоящего, так что выигрыш от одного процесса здесь занижен.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_systemd.py [юнитов] [повторов]
+"""
+import asyncio
+import os
+import stat
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import systemd_units
+
+FAKE_SYSTEMCTL = """#!/bin/sh
+case "$1" in
+    is-active) echo active ;;
+    show)
+        shift 4  # show --no-pager -p <свойства>
+        for unit in "$@"; do
+            printf 'Id=%s.service\\nLoadState=loaded\\nActiveState=active\\nSubState=running\\n\\n' "$unit"
+        done ;;
+esac
+"""
+
+def install_fake_systemctl(directory):
+    path = os.path.join(directory, 'systemctl')
+    with open(path, 'w') as f:
+        f.write(FAKE_SYSTEMCTL)
+    os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+    os.environ['PATH'] = directory + os.pathsep + os.environ['PATH']
+
+async def is_active(unit):
+    proc = await asyncio.create_subprocess_exec(
+        'systemctl', 'is-active', unit,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.DEVNULL
+    )
+    stdout, _ = await proc.communicate()
+    return stdout.decode().strip() == 'active'
+
+def cpu_time():
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+async def main(count, repeat):
+    units = [f'unit{i}' for i in range(count)]
+
+    async def sequential():
+        for unit in units:
+            await is_active(unit)
+
+    async def parallel():
+        await asyncio.gather(*(is_active(unit) for unit in units))
+
+    collector = systemd_units.SystemdCollector()
+    collector.watch(units)
+
+    async def batched():
+        states = await collector.refresh(timeout=10)
+        assert len(states) == len(units), states
+
+    print(f"{'Способ':24} {'wall, мс':>9} {'cpu, мс':>9} {'процессов':>10}")
+    for name, call, forks in [('is-active по очереди', sequential, count),
+                              ('is-active параллельно', parallel, count),
+                              ('один systemctl show', batched, 1)]:
+        await call()  # прогрев
+        wall, cpu = time.perf_counter(), cpu_time()
+        for _ in range(repeat):
+            await call()
+        wall = (time.perf_counter() - wall) / repeat * 1000
+        cpu = (cpu_time() - cpu) / repeat * 1000
+        print(f"{name:24} {wall:9.2f} {cpu:9.2f} {forks:10}")
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    with tempfile.TemporaryDirectory() as directory:
+        # Проверка sd_booted(): настоящий systemd есть, только если он PID 1
+        if not os.path.isdir('/run/systemd/system'):
+            print("systemd не запущен - используется фиктивный systemctl\n")
+            install_fake_systemctl(directory)
+        asyncio.run(main(count, repeat))
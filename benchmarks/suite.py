@@ -0,0 +1,352 @@
+"""Набор бенчмарков: сборщики monitoring, выполнение команд и обработчики бота
+
+Для каждого сценария измеряется:
+  * wall  - медиана времени одного вызова;
+  * cpu   - процессорное время на вызов (свое + дочерних процессов);
+  * alloc - пик выделенной памяти Python за вызов (tracemalloc, отдельный проход);
+  * block - самая долгая блокировка event loop во время замера.
+
+Все работает без сети: сервисы из Config.SERVICES подменяются локальными
+заглушками HTTP/TCP/Minecraft, а Telegram - фиктивным транспортом Bot API, так что
+обработчики проходят полный путь Application -> router -> SendQueue -> Bot.
+
+Запуск из корня репозитория:
+    python benchmarks/suite.py                 # замер и сравнение с baseline
+    python benchmarks/suite.py --save          # сохранить результаты как baseline
+    python benchmarks/suite.py -k monitor      # только сценарии с "monitor" в имени
+
+Код выхода 1, если есть регрессии относительно baseline.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram import Update
+from telegram.ext import Application, CallbackQueryHandler, CommandHandler
+from telegram.request import BaseRequest
+
+import config
+import minecraft
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+ADMIN_ID = config.Config.ADMIN_IDS[0] if config.Config.ADMIN_IDS else 1
+
+def cpu_time():
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+# --- Заглушки сети ---------------------------------------------------------
+
+async def http_stub(reader, writer):
+    try:
+        # keep-alive: все запросы на одном соединении; HEAD - без тела
+        while True:
+            head = await reader.readuntil(b'\r\n\r\n')
+            body = b"" if head.startswith(b'HEAD ') else b"ok"
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\nContent-Type: text/plain\r\n\r\n" + body)
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+async def tcp_stub(reader, writer):
+    writer.close()
+
+class FakeTelegram(BaseRequest):
+    """Транспорт Bot API без сети: отвечает правдоподобными объектами"""
+
+    def __init__(self):
+        self.calls = 0
+        self.message_id = 1000
+
+    @property
+    def read_timeout(self):
+        return 5
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    def message(self, params):
+        self.message_id += 1
+        chat_id = int(params.get('chat_id', ADMIN_ID))
+        return {
+            'message_id': int(params.get('message_id', self.message_id)),
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': {'id': 1, 'is_bot': True, 'first_name': 'bot'},
+            'text': params.get('text', ''),
+        }
+
+    async def do_request(self, url, method, request_data=None, *args, **kwargs):
+        self.calls += 1
+        endpoint = url.rsplit('/', 1)[-1]
+        params = request_data.parameters if request_data else {}
+        if endpoint == 'getMe':
+            result = {'id': 1, 'is_bot': True, 'first_name': 'bot', 'username': 'bench_bot'}
+        elif endpoint in ('sendMessage', 'editMessageText', 'sendDocument', 'sendPhoto'):
+            result = self.message(params)
+        else:
+            result = True
+        return 200, json.dumps({'ok': True, 'result': result}).encode()
+
+def callback_update(data, update_id=[0]):
+    update_id[0] += 1
+    return {
+        'update_id': update_id[0],
+        'callback_query': {
+            'id': str(update_id[0]),
+            'from': {'id': ADMIN_ID, 'is_bot': False, 'first_name': 'admin'},
+            'chat_instance': '1',
+            'data': data,
+            'message': {
+                'message_id': 10,
+                'date': int(time.time()),
+                'chat': {'id': ADMIN_ID, 'type': 'private'},
+                'text': 'старое сообщение',
+            },
+        },
+    }
+
+def message_update(text, update_id=[100000]):
+    update_id[0] += 1
+    return {
+        'update_id': update_id[0],
+        'message': {
+            'message_id': 20,
+            'date': int(time.time()),
+            'chat': {'id': ADMIN_ID, 'type': 'private'},
+            'from': {'id': ADMIN_ID, 'is_bot': False, 'first_name': 'admin'},
+            'text': text,
+            'entities': [{'type': 'bot_command', 'offset': 0, 'length': text.split()[0].__len__()}]
+            if text.startswith('/') else [],
+        },
+    }
+
+# --- Сценарии --------------------------------------------------------------
+
+async def build_cases(stack):
+    """Список сценариев: (имя, функция, итераций). Функция может быть async"""
+    http = await asyncio.start_server(http_stub, '127.0.0.1', 0)
+    tcp = await asyncio.start_server(tcp_stub, '127.0.0.1', 0)
+    mc = await asyncio.start_server(minecraft.stub_handler(minecraft.STUB_STATUS), '127.0.0.1', 0)
+    stack.extend([http, tcp, mc])
+
+    # Сервисы - только локальные заглушки, без systemctl и чужих портов
+    config.Config.SERVICES = {
+        f'stub-http-{i}': f"http://127.0.0.1:{http.sockets[0].getsockname()[1]}/" for i in range(3)
+    }
+    config.Config.SERVICES['stub-tcp'] = f"127.0.0.1:{tcp.sockets[0].getsockname()[1]}"
+    config.Config.SERVICES['stub-mc'] = f"minecraft://127.0.0.1:{mc.sockets[0].getsockname()[1]}"
+    config.Config.SERVICES['stub-file'] = {'type': 'file_age', 'target': __file__, 'max_age': 10 ** 9}
+    # Без кэша: каждый замер проходит полный Server List Ping
+    config.Config.MINECRAFT_CACHE_TTL = 0
+    # Лимиты очереди отправки не должны тормозить замер обработчиков
+    config.Config.SEND_CHAT_RATE = config.Config.SEND_CHAT_BURST = 1e9
+    config.Config.SEND_GLOBAL_RATE = 1e9
+
+    import monitoring
+    from commands import execute_command, run_predefined
+    import bot
+    # bot.py настраивает логирование на INFO - в замерах нужны только ошибки
+    logging.getLogger().setLevel(logging.WARNING)
+
+    monitoring.refresh_snapshot()
+    bot.get_process_tracker().update()
+
+    application = (
+        Application.builder()
+        .token('1:bench')
+        .request(FakeTelegram())
+        .get_updates_request(FakeTelegram())
+        .rate_limiter(bot.SendQueue())
+        .build()
+    )
+    application.add_handler(CommandHandler("status", bot.status_command))
+    application.add_handler(CommandHandler("cmd", bot.handle_message))
+    application.add_handler(CallbackQueryHandler(bot.router.dispatch))
+    await application.initialize()
+    stack.append(application)
+
+    def handler(update_factory, payload):
+        async def run():
+            await application.process_update(Update.de_json(update_factory(payload), application.bot))
+        return run
+
+    cases = [
+        ('monitor.collect_snapshot', monitoring.collect_snapshot, 50),
+        ('monitor.system_info', monitoring.get_system_info, 200),
+        ('monitor.memory_info', monitoring.get_memory_info, 200),
+        ('monitor.disk_info', monitoring.get_disk_info, 200),
+        ('monitor.detailed_disk_info', monitoring.get_detailed_disk_info, 200),
+        ('monitor.network_info', monitoring.get_network_info, 200),
+        ('monitor.processes_info', monitoring.get_processes_info, 200),
+        ('monitor.cpu_temperature', monitoring.get_cpu_temperature, 200),
+        ('monitor.uptime', monitoring.get_uptime, 200),
+        ('monitor.services_status', monitoring.get_services_status, 30),
+        ('command.exec', lambda: execute_command('echo benchmark'), 30),
+        ('command.exec_shell', lambda: execute_command('echo benchmark | cat'), 30),
+        ('command.predefined_native', lambda: run_predefined('top_processes'), 30),
+        ('handler.main_menu', handler(callback_update, 'main_menu'), 100),
+        ('handler.services_status', handler(callback_update, 'services_status'), 100),
+        ('handler.system_status', handler(callback_update, 'system_status'), 100),
+        ('handler.processes', handler(callback_update, 'procs:mem'), 50),
+        ('handler.quick_uptime', handler(callback_update, 'quick_uptime'), 50),
+        ('handler.status_command', handler(message_update, '/status'), 100),
+        ('handler.cmd', handler(message_update, '/cmd echo benchmark'), 20),
+    ]
+    return cases
+
+# --- Измерение -------------------------------------------------------------
+
+class LoopMonitor:
+    """Фоновая задача, замечающая, насколько event loop опаздывает с тиками"""
+
+    TICK = 0.0005
+
+    def __init__(self):
+        self.max_lag = 0.0
+        self.task = None
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.TICK)
+            self.max_lag = max(self.max_lag, loop.time() - started - self.TICK)
+
+    def __enter__(self):
+        self.max_lag = 0.0
+        self.task = asyncio.create_task(self.run())
+        return self
+
+    def __exit__(self, *exc):
+        self.task.cancel()
+
+async def call(func):
+    result = func()
+    if asyncio.iscoroutine(result):
+        result = await result
+    return result
+
+async def measure(func, iterations):
+    for _ in range(min(3, iterations)):
+        await call(func)
+
+    walls = []
+    with LoopMonitor() as monitor:
+        await asyncio.sleep(0.01)
+        monitor.max_lag = 0.0
+        cpu_start = cpu_time()
+        for _ in range(iterations):
+            started = time.perf_counter()
+            await call(func)
+            walls.append(time.perf_counter() - started)
+            # Даем монитору заметить блокировку до следующего вызова
+            await asyncio.sleep(0)
+        cpu = (cpu_time() - cpu_start) / iterations
+        await asyncio.sleep(0.002)
+        block = monitor.max_lag
+
+    tracemalloc.start()
+    peaks = []
+    for _ in range(min(10, iterations)):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        await call(func)
+        peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+
+    return {
+        'wall': statistics.median(walls),
+        'cpu': cpu,
+        'alloc': max(peaks),
+        'block': block,
+        'iterations': iterations,
+    }
+
+def compare(name, result, baseline, tolerance):
+    """Список регрессий сценария относительно baseline"""
+    old = baseline.get(name)
+    if not old:
+        return []
+    problems = []
+    # Абсолютные пороги отсекают шум на очень быстрых сценариях
+    for key, floor in (('wall', 0.0002), ('cpu', 0.0002), ('alloc', 16 * 1024)):
+        if result[key] > old[key] * (1 + tolerance) and result[key] - old[key] > floor:
+            problems.append(f"{key} {old[key]:.6g} -> {result[key]:.6g}")
+    return problems
+
+def format_row(name, r, problems):
+    mark = "  ⚠ " + "; ".join(problems) if problems else ""
+    return (f"{name:30} {r['wall'] * 1000:9.3f} {r['cpu'] * 1000:9.3f} "
+            f"{r['alloc'] / 1024:9.1f} {r['block'] * 1000:9.2f}{mark}")
+
+async def main(args):
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+
+    stack = []
+    try:
+        cases = await build_cases(stack)
+        results = {}
+        regressions = 0
+        print(f"{'Сценарий':30} {'wall, мс':>9} {'cpu, мс':>9} {'alloc, КБ':>9} {'block, мс':>9}")
+        for name, func, iterations in cases:
+            if args.k and args.k not in name:
+                continue
+            iterations = max(1, int(iterations * args.scale))
+            result = await measure(func, iterations)
+            results[name] = result
+            problems = compare(name, result, baseline, args.tolerance)
+            regressions += bool(problems)
+            print(format_row(name, result, problems))
+    finally:
+        for item in reversed(stack):
+            if isinstance(item, Application):
+                await item.shutdown()
+            else:
+                item.close()
+        from http_probe import close_http_client
+        await close_http_client()
+
+    if args.save:
+        with open(args.baseline, 'w') as f:
+            json.dump({
+                'created': datetime.now().isoformat(timespec='seconds'),
+                'host': platform.node(),
+                'python': platform.python_version(),
+                'results': results,
+            }, f, indent=2)
+        print(f"\nBaseline сохранен: {args.baseline}")
+    elif not baseline:
+        print("\nBaseline нет - сохраните его флагом --save")
+    elif regressions:
+        print(f"\n⚠ Регрессий: {regressions} (допуск {args.tolerance:.0%})")
+    return 1 if regressions and not args.save else 0
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Бенчмарки бота')
+    parser.add_argument('--save', action='store_true', help='сохранить результаты как baseline')
+    parser.add_argument('--baseline', default=BASELINE, help='файл baseline (JSON)')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='допустимое ухудшение (доля)')
+    parser.add_argument('--scale', type=float, default=1.0, help='множитель числа итераций')
+    parser.add_argument('-k', default='', help='только сценарии, содержащие подстроку')
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -1,20 +1,45 @@
+import asyncio
 import logging
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from functools import lru_cache, partial
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InputMediaPhoto
+from telegram.error import BadRequest, TelegramError
 from telegram.ext import (
     Application, CommandHandler, CallbackQueryHandler,
-    ContextTypes, MessageHandler, filters
+    ContextTypes, MessageHandler, TypeHandler, filters
 )
 import config
-from commands import execute_command, predefined_commands
+import perf
+from commands import predefined_commands, run_predefined, stream_command
+from output import get_output, gzip_document, page_keyboard, render_page, store_text
 from monitoring import (
+    refresh_snapshot,
+    get_snapshot,
+    format_age,
     get_system_info,
+    get_memory_info,
     get_disk_info,
     get_network_info,
     get_services_status,
+    get_cached_services_status,
     get_detailed_disk_info,
-    get_processes_info
+    get_processes_info,
+    get_process_history
 )
+from processes import SORT_KEYS, get_tracker as get_process_tracker
 from auth import is_admin
+from services import get_checks, get_scheduler
+from http_probe import close_http_client
+from metrics_store import get_store
+from router import Router, admin_only, answer, cached, format_route_stats, timed
+from screens import Screen, fill, get_screen, get_screens, keyboard, reply, show, view_screen
+from send_queue import SendQueue, format_send_stats
+from alerts import AlertEngine, alert_sender, format_rules, queue_alerts
+from systemd_units import get_collector as get_systemd_collector
+from charts import CHART_METRICS, CHART_WINDOWS, get_chart, remember_file_id, resolve_metric
+from loop_watchdog import format_loop_stats, get_watchdog, label_update
+import log_tail
+from log_tail import JOURNAL, LogFilter, parse_priority, render_chunk
+from fleet import close_agents, fetch_view, fleet_overview, run_fleet_command, run_remote_predefined
 
 # Настройка логирования
 logging.basicConfig(
@@ -30,6 +55,9 @@ logger = logging.getLogger(__name__)
 # Состояния для хранения последних сообщений с кнопками
 user_messages = {}
 
+# Правила алертов разбираются один раз при запуске
+alert_engine = AlertEngine(config.Config.ALERT_RULES)
+
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Команда /start - главное меню"""
     user_id = update.effective_user.id
@@ -48,285 +76,340 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         except:
             pass
     
-    keyboard = [
-        [InlineKeyboardButton("📊 Мониторинг", callback_data='monitoring')],
-        [InlineKeyboardButton("⚡ Быстрые команды", callback_data='quick_cmds')],
-        [InlineKeyboardButton("🖥️ Терминал", callback_data='terminal')],
-        [InlineKeyboardButton("🔧 Управление", callback_data='management')],
-        [InlineKeyboardButton("ℹ️ Помощь", callback_data='help_menu')]
-    ]
-    
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
-    msg = await update.message.reply_text(
-        "👋 *Добро пожаловать в панель управления сервером!*\n\n"
-        "Выберите раздел:",
-        reply_markup=reply_markup,
-        parse_mode='Markdown'
-    )
+    msg = await reply(update.message, get_screen('main_menu'))
     
     # Сохраняем ID сообщения с кнопками
     user_messages[user_id] = msg.message_id
 
+# Кнопки: проверка доступа до ответа на запрос, затем замер времени обработчика
+router = Router([admin_only(is_admin), answer, timed])
 
-async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Обработчик кнопок"""
-    query = update.callback_query
-    await query.answer()
-    
-    user_id = query.from_user.id
-    
-    if not is_admin(user_id):
-        await query.edit_message_text("⛔ Доступ запрещен")
+# Кнопки, которые просто показывают готовое меню
+MENU_SCREENS = ('main_menu', 'monitoring', 'quick_cmds', 'terminal', 'management', 'help_menu', 'graphs', 'fleetcmds',
+                'logs_menu')
+
+async def show_menu(name, query, context, payload):
+    return get_screen(name)
+
+for name in MENU_SCREENS:
+    router.add(name, partial(show_menu, name))
+
+# Экраны с данными мониторинга (кнопка -> функция из monitoring). Данные
+# берутся из снимка, который обновляется раз в SAMPLER_INTERVAL - чаще строить
+# экран незачем
+VIEW_SCREENS = {
+    'system_status': get_system_info,
+    'disk_status': get_disk_info,
+    'network_status': get_network_info,
+    'disk_detailed': get_detailed_disk_info,
+    'memory_status': get_memory_info,
+}
+
+async def show_view(view, query, context, payload):
+    return view_screen(view())
+
+for name, view in VIEW_SCREENS.items():
+    router.add(name, partial(show_view, view), middleware=[cached(config.Config.SAMPLER_INTERVAL)])
+
+@router.route('fleet')
+async def show_fleet(query, context, payload):
+    """Сводка по всем серверам и выбор сервера"""
+    await query.edit_message_text("⏳ Опрашиваю серверы...")
+    return fill('fleet', await fleet_overview())
+
+@router.route('fleetrun', name=str)
+async def fleet_run_button(query, context, payload):
+    if payload.name in predefined_commands:
+        await run_fleet(query.message, payload.name, query.from_user.id)
+
+@router.route('host', host=str)
+async def show_host(query, context, payload):
+    return get_screens().get(f'host:{payload.host}')
+
+@router.route('rview', host=str, view=str)
+async def show_remote_view(query, context, payload):
+    await query.edit_message_text(f"⏳ Запрашиваю данные с *{payload.host}*...", parse_mode='Markdown')
+    info = await fetch_view(payload.host, payload.view)
+    return Screen(
+        f"🖥️ *{payload.host}*\n\n{info}",
+        keyboard([("🔄 Обновить", query.data)], [("🔙 Назад", f'host:{payload.host}')])
+    )
+
+@router.route('rquick', host=str, name=str)
+async def run_remote_quick(query, context, payload):
+    host, cmd_name = payload
+    if cmd_name not in predefined_commands:
         return
+    await query.edit_message_text(f"⏳ Выполняю команду на *{host}*...", parse_mode='Markdown')
+    result = await run_remote_predefined(host, cmd_name, user_id=query.from_user.id)
+    run_id = store_text(
+        predefined_commands[cmd_name]['command'],
+        result,
+        title=f"🖥️ *{host}*: *{predefined_commands[cmd_name]['description']}*\n\n"
+              f"```\n{predefined_commands[cmd_name]['command']}\n```",
+        actions=[("🔄 Повторить", query.data), ("🔙 Назад", f'host:{host}')]
+    )
+    return output_page(run_id, 0)
+
+@router.route('graph', metric=str, window=str)
+async def graph_button(query, context, payload):
+    # Из меню отправляем новое фото, на самом графике - меняем картинку
+    await send_chart(query.message, payload.metric, payload.window, edit=bool(query.message.photo))
+
+@router.route('services_status')
+async def show_services(query, context, payload):
+    # Результаты фонового планировщика: нажатие не запускает проверки
+    return fill('services', get_cached_services_status())
+
+@router.route('services_refresh')
+async def refresh_services(query, context, payload):
+    last_edit = 0
+    
+    async def show_progress(text):
+        # Промежуточные результаты не чаще раза в секунду
+        nonlocal last_edit
+        now = asyncio.get_running_loop().time()
+        if now - last_edit < 1:
+            return
+        last_edit = now
+        await query.edit_message_text(text, parse_mode='Markdown')
     
-    if query.data == 'main_menu':
-        await show_main_menu(query)
-    
-    elif query.data == 'monitoring':
-        await show_monitoring_menu(query)
-    
-    elif query.data == 'quick_cmds':
-        await show_quick_commands(query)
-    
-    elif query.data == 'terminal':
-        await show_terminal_menu(query)
-    
-    elif query.data == 'management':
-        await show_management_menu(query)
-    
-    elif query.data == 'help_menu':
-        await show_help_menu(query)
-    
-    elif query.data == 'system_status':
-        info = get_system_info()
-        keyboard = [[InlineKeyboardButton("🔙 Назад", callback_data='monitoring')]]
-        await query.edit_message_text(
-            info,
-            reply_markup=InlineKeyboardMarkup(keyboard),
-            parse_mode='Markdown'
-        )
-    
-    elif query.data == 'disk_status':
-        info = get_disk_info()
-        keyboard = [[InlineKeyboardButton("🔙 Назад", callback_data='monitoring')]]
-        await query.edit_message_text(
-            info,
-            reply_markup=InlineKeyboardMarkup(keyboard),
-            parse_mode='Markdown'
-        )
-    
-    elif query.data == 'network_status':
-        info = get_network_info()
-        keyboard = [[InlineKeyboardButton("🔙 Назад", callback_data='monitoring')]]
-        await query.edit_message_text(
-            info,
-            reply_markup=InlineKeyboardMarkup(keyboard),
-            parse_mode='Markdown'
-        )
-    
-    elif query.data == 'services_status':
-        info = get_services_status()
-        keyboard = [[InlineKeyboardButton("🔙 Назад", callback_data='monitoring')]]
-        await query.edit_message_text(
-            info,
-            reply_markup=InlineKeyboardMarkup(keyboard),
-            parse_mode='Markdown'
-        )
-    
-    # НОВЫЕ ОБРАБОТЧИКИ ДЛЯ ДОПОЛНИТЕЛЬНЫХ КНОПОК
-    elif query.data == 'disk_detailed':
-        info = get_detailed_disk_info()  # Теперь функция импортирована
-        keyboard = [[InlineKeyboardButton("🔙 Назад", callback_data='monitoring')]]
-        await query.edit_message_text(
-            info,
-            reply_markup=InlineKeyboardMarkup(keyboard),
-            parse_mode='Markdown'
-        )
-    
-    elif query.data == 'memory_status':
-        info = get_system_info()
-        # Берем только часть о памяти - исправленная версия
-        lines = info.split('\n')
-        memory_lines = []
-        for line in lines:
-            lower_line = line.lower()
-            if any(word in lower_line for word in ['память', 'memory', 'оператив', 'swap', 'свободно', 'использовано', 'доступно']):
-                memory_lines.append(line)
-        
-        if memory_lines:
-            memory_info = '\n'.join(memory_lines)
-        else:
-            memory_info = "Информация о памяти не найдена"
-            
-        keyboard = [[InlineKeyboardButton("🔙 Назад", callback_data='monitoring')]]
-        await query.edit_message_text(
-            f"🧠 *Детальная информация о памяти:*\n\n{memory_info}",
-            reply_markup=InlineKeyboardMarkup(keyboard),
-            parse_mode='Markdown'
-        )
-    
-    elif query.data == 'processes_status':
-        info = get_processes_info()  # Теперь функция импортирована
-        keyboard = [[InlineKeyboardButton("🔙 Назад", callback_data='monitoring')]]
-        await query.edit_message_text(
-            info,
-            reply_markup=InlineKeyboardMarkup(keyboard),
-            parse_mode='Markdown'
-        )
-    
-    elif query.data.startswith('quick_'):
-        cmd_name = query.data[6:]  # Убираем 'quick_'
-        if cmd_name in predefined_commands:
-            await query.edit_message_text("⏳ Выполняю команду...")
-            result = execute_command(predefined_commands[cmd_name]['command'])
-            
-            keyboard = [
-                [InlineKeyboardButton("🔄 Повторить", callback_data=f'quick_{cmd_name}')],
-                [InlineKeyboardButton("🔙 Назад", callback_data='quick_cmds')]
-            ]
-            
-            await query.edit_message_text(
-                f"*{predefined_commands[cmd_name]['description']}*\n\n"
-                f"```\n{predefined_commands[cmd_name]['command']}\n```\n\n"
-                f"*Результат:*\n```\n{result}\n```",
-                reply_markup=InlineKeyboardMarkup(keyboard),
-                parse_mode='Markdown'
-            )
-    
-    elif query.data == 'custom_command':
-        context.user_data['awaiting_command'] = True
-        keyboard = [[InlineKeyboardButton("❌ Отмена", callback_data='terminal')]]
-        await query.edit_message_text(
-            "📝 *Введите команду для выполнения:*\n\n"
-            "Примеры:\n"
-            "• `ls -la`\n"
-            "• `df -h`\n"
-            "• `systemctl status nginx`\n\n"
-            "⚠️ *Будьте осторожны с командами!*",
-            reply_markup=InlineKeyboardMarkup(keyboard),
-            parse_mode='Markdown'
-        )
+    return fill('services', await get_services_status(on_progress=show_progress))
+
+@router.route('processes_status')
+async def show_processes_default(query, context, payload):
+    return await processes_screen('cpu')
+
+@router.route('procs', sort=str)
+async def show_processes(query, context, payload):
+    if payload.sort in SORT_KEYS:
+        return await processes_screen(payload.sort)
 
-async def show_main_menu(query):
-    """Показать главное меню"""
-    keyboard = [
-        [InlineKeyboardButton("📊 Мониторинг", callback_data='monitoring')],
-        [InlineKeyboardButton("⚡ Быстрые команды", callback_data='quick_cmds')],
-        [InlineKeyboardButton("🖥️ Терминал", callback_data='terminal')],
-        [InlineKeyboardButton("🔧 Управление", callback_data='management')],
-        [InlineKeyboardButton("ℹ️ Помощь", callback_data='help_menu')]
+async def processes_screen(sort):
+    """Топ процессов с выбором сортировки и переходом к истории процесса"""
+    tracker = get_process_tracker()
+    if tracker.last_update is None:
+        # Фоновый сэмпл еще не прошел - обход /proc в пуле потоков, не в event loop
+        await asyncio.get_running_loop().run_in_executor(None, tracker.update)
+    sort_buttons = [
+        (f"• {title}" if key == sort else title, f'procs:{key}')
+        for key, title in (('cpu', 'CPU'), ('mem', 'RAM'), ('io', 'IO'), ('threads', 'Потоки'))
     ]
-    
-    await query.edit_message_text(
-        "👋 *Добро пожаловать в панель управления сервером!*\n\n"
-        "Выберите раздел:",
-        reply_markup=InlineKeyboardMarkup(keyboard),
-        parse_mode='Markdown'
+    history_buttons = [
+        (f"🔍 {proc.pid}", f'prochist:{proc.pid}')
+        for proc in tracker.top(sort, 4)
+    ]
+    return Screen(
+        get_processes_info(sort),
+        keyboard(sort_buttons, history_buttons, [("🔙 Назад", 'monitoring')])
     )
 
-async def show_monitoring_menu(query):
-    """Меню мониторинга"""
-    keyboard = [
-        [InlineKeyboardButton("📈 Статус системы", callback_data='system_status')],
-        [InlineKeyboardButton("💾 Дисковое пространство", callback_data='disk_status')],
-        [InlineKeyboardButton("💽 Детально о дисках", callback_data='disk_detailed')],
-        [InlineKeyboardButton("🧠 Использование памяти", callback_data='memory_status')],
-        [InlineKeyboardButton("🌐 Сетевая информация", callback_data='network_status')],
-        [InlineKeyboardButton("📡 Состояние сервисов", callback_data='services_status')],
-        [InlineKeyboardButton("📈 Топ процессов", callback_data='processes_status')],
-        [InlineKeyboardButton("🔙 Главное меню", callback_data='main_menu')]
-    ]
-    
-    await query.edit_message_text(
-        "📊 *Мониторинг сервера*\n\n"
-        "Выберите что хотите посмотреть:",
-        reply_markup=InlineKeyboardMarkup(keyboard),
-        parse_mode='Markdown'
+@router.route('prochist', pid=int)
+async def show_process_history(query, context, payload):
+    return Screen(
+        get_process_history(payload.pid),
+        keyboard([("🔄 Обновить", f'prochist:{payload.pid}')], [("🔙 К процессам", 'processes_status')])
     )
 
-async def show_quick_commands(query):
-    """Меню быстрых команд"""
-    keyboard = []
-    
-    # Добавляем кнопки для каждой заготовленной команды
-    for cmd_name, cmd_info in predefined_commands.items():
-        keyboard.append([InlineKeyboardButton(
-            cmd_info['description'],
-            callback_data=f'quick_{cmd_name}'
-        )])
-    
-    keyboard.append([InlineKeyboardButton("🔙 Главное меню", callback_data='main_menu')])
-    
-    await query.edit_message_text(
-        "⚡ *Быстрые команды*\n\n"
-        "Выберите команду для выполнения:",
-        reply_markup=InlineKeyboardMarkup(keyboard),
-        parse_mode='Markdown'
+@router.prefix('quick_')
+async def run_quick(query, context, payload):
+    cmd_name = payload.name
+    if cmd_name not in predefined_commands:
+        return
+    screen = predefined_commands[cmd_name].get('screen')
+    if screen:
+        # Кнопки из старых сообщений ведут на экран команды
+        route, screen_payload = router.resolve(screen)
+        return await route.handler(query, context, screen_payload)
+    await query.edit_message_text("⏳ Выполняю команду...")
+    result = await run_predefined(cmd_name, user_id=query.from_user.id)
+    
+    run_id = store_text(
+        predefined_commands[cmd_name]['command'],
+        result,
+        title=f"*{predefined_commands[cmd_name]['description']}*\n\n"
+              f"```\n{predefined_commands[cmd_name]['command']}\n```",
+        actions=[("🔄 Повторить", f'quick_{cmd_name}'), ("🔙 Назад", 'quick_cmds')]
     )
+    return output_page(run_id, 0)
 
-async def show_terminal_menu(query):
-    """Меню терминала"""
-    keyboard = [
-        [InlineKeyboardButton("📝 Ввести команду", callback_data='custom_command')],
-        [InlineKeyboardButton("🔙 Главное меню", callback_data='main_menu')]
-    ]
+@router.route('page', run_id=str, page=int)
+async def show_page(query, context, payload):
+    return output_page(payload.run_id, payload.page)
+
+def output_page(run_id, page):
+    """Страница сохраненного вывода (без повторного выполнения команды)"""
+    text = render_page(run_id, page)
+    if text is None:
+        return Screen("⌛ Вывод больше недоступен, выполните команду заново", None)
+    return Screen(text, page_keyboard(run_id, page))
+
+@router.route('gz', run_id=str)
+async def send_gzip(query, context, payload):
+    document = gzip_document(payload.run_id)
+    if document is None:
+        await query.message.reply_text("⌛ Вывод больше недоступен, выполните команду заново")
+        return
+    await query.message.reply_document(document, filename='output.txt.gz')
+
+async def logs_view(user_id, source, read, flt=None):
+    """Экран с записями лога; read - log_tail.read_latest или read_new"""
+    try:
+        chunk = await read(user_id, source) if flt is None else await read(user_id, source, flt)
+    except OSError as e:
+        text = f"⚠️ Лог *{source}* недоступен: {e.strerror or e}"
+        return fill(f'logs:{source}', text)
+    flt = log_tail.get_store().filter(user_id, source)
+    note = "🔁 Файл ротирован, чтение с начала" if chunk.rotated else None
+    return fill(f'logs:{source}', render_chunk(source, flt, chunk.lines, note))
+
+@router.route('logs', source=str)
+async def show_logs(query, context, payload):
+    if payload.source not in log_tail.sources():
+        return
+    return await logs_view(query.from_user.id, payload.source, log_tail.read_latest)
+
+@router.route('logsmore', source=str)
+async def show_new_logs(query, context, payload):
+    if payload.source not in log_tail.sources():
+        return
+    return await logs_view(query.from_user.id, payload.source, log_tail.read_new)
+
+@router.route('logsfollow', source=str)
+async def follow_logs(query, context, payload):
+    source, user_id = payload.source, query.from_user.id
+    if source not in log_tail.sources():
+        return
+    flt = log_tail.get_store().filter(user_id, source)
+    message = await show(query, fill(f'logsfollow:{source}', render_chunk(source, flt, [], "▶️ Слежу за новыми записями...")))
+    shown = []
+    
+    async def show_tail(lines):
+        shown[:] = lines
+        try:
+            await message.edit_text(
+                render_chunk(source, flt, lines, "▶️ Слежу за новыми записями..."),
+                reply_markup=get_screen(f'logsfollow:{source}').reply_markup,
+                parse_mode='Markdown'
+            )
+        except BadRequest:
+            pass
     
-    await query.edit_message_text(
-        "🖥️ *Терминал сервера*\n\n"
-        "Вы можете выполнить любую команду на сервере.\n"
-        "⚠️ *Внимание:* Выполняйте только проверенные команды!",
-        reply_markup=InlineKeyboardMarkup(keyboard),
+    async def run():
+        note = "⏹ Слежение завершено"
+        try:
+            await log_tail.follow(user_id, source, show_tail)
+        except asyncio.CancelledError:
+            note = "⏹ Слежение остановлено"
+            raise
+        except OSError as e:
+            note = f"⚠️ Лог недоступен: {e.strerror or e}"
+        finally:
+            try:
+                await message.edit_text(
+                    render_chunk(source, flt, shown, note),
+                    reply_markup=get_screen(f'logs:{source}').reply_markup,
+                    parse_mode='Markdown'
+                )
+            except TelegramError:
+                pass
+    
+    # Слежение идет в фоне: обработчик не держит очередь обновлений
+    log_tail.start_follow(user_id, run())
+
+@router.route('logsstop', source=str)
+async def stop_following_logs(query, context, payload):
+    if payload.source not in log_tail.sources():
+        return
+    # Задача сама покажет последние строки и клавиатуру просмотра; если ее
+    # уже нет (бот перезапускался) - просто возвращаем клавиатуру просмотра
+    if not log_tail.stop_follow(query.from_user.id):
+        await query.edit_message_reply_markup(get_screen(f'logs:{payload.source}').reply_markup)
+
+@router.route('custom_command')
+async def ask_command(query, context, payload):
+    context.user_data['awaiting_command'] = True
+    return get_screen('custom_command')
+
+async def run_fleet(status, cmd_name, user_id):
+    """Запустить команду на всех серверах, обновляя сообщение по мере ответов"""
+    await status.edit_text(f"⏳ Выполняю `{cmd_name}` на всех серверах...", parse_mode='Markdown')
+    last_edit = 0
+    
+    async def show_progress(summary, text):
+        # Промежуточные результаты не чаще раза в секунду
+        nonlocal last_edit
+        now = asyncio.get_running_loop().time()
+        if now - last_edit < 1:
+            return
+        last_edit = now
+        try:
+            await status.edit_text(
+                f"⏳ `{cmd_name}`: _{summary}_\n\n```\n{text[-3000:]}\n```",
+                parse_mode='Markdown'
+            )
+        except BadRequest:
+            pass  # обрезанный вывод может временно не парситься
+    
+    summary, result = await run_fleet_command(cmd_name, user_id=user_id, on_progress=show_progress)
+    command = predefined_commands[cmd_name]['command']
+    run_id = store_text(
+        command,
+        result,
+        title=f"⚡ *На всех серверах:* `{command}`\n_{summary}_",
+        actions=[("🔄 Повторить", f'fleetrun:{cmd_name}'), ("🔙 К серверам", 'fleet')]
+    )
+    await status.edit_text(
+        render_page(run_id, 0),
+        reply_markup=page_keyboard(run_id, 0),
         parse_mode='Markdown'
     )
 
-async def show_management_menu(query):
-    """Меню управления"""
-    keyboard = [
-        [InlineKeyboardButton("🔄 Перезагрузить сервер", callback_data='quick_reboot')],
-        [InlineKeyboardButton("⏹️ Остановить сервер", callback_data='quick_shutdown')],
-        [InlineKeyboardButton("📊 Логи системы", callback_data='quick_logs')],
-        [InlineKeyboardButton("🔙 Главное меню", callback_data='main_menu')]
+@lru_cache(maxsize=None)
+def chart_keyboard(metric, window):
+    """Кнопки под графиком: окна и соседние метрики"""
+    windows = [
+        InlineKeyboardButton(f"• {name}" if name == window else name,
+                             callback_data=f'graph:{metric}:{name}')
+        for name in CHART_WINDOWS
     ]
-    
-    await query.edit_message_text(
-        "🔧 *Управление сервером*\n\n"
-        "Выберите действие:",
-        reply_markup=InlineKeyboardMarkup(keyboard),
-        parse_mode='Markdown'
-    )
+    metrics = [
+        InlineKeyboardButton(name, callback_data=f'graph:{name}:{window}')
+        for name in ('cpu', 'mem', 'temp', 'net_rx') if name != metric
+    ]
+    return InlineKeyboardMarkup([windows, metrics])
 
-async def show_help_menu(query):
-    """Меню помощи"""
-    keyboard = [[InlineKeyboardButton("🔙 Главное меню", callback_data='main_menu')]]
-    
-    help_text = """
-🆘 *Помощь по управлению ботом*
-
-*Основные команды в чате:*
-`/start` - Главное меню
-`/menu` - Показать меню
-`/status` - Краткий статус
-`/cmd <команда>` - Выполнить команду
-`/help` - Эта справка
-
-*Быстрые команды в меню:*
-• 📊 Мониторинг - информация о системе
-• ⚡ Быстрые команды - готовые команды
-• 🖥️ Терминал - ввод своих команд
-• 🔧 Управление - управление сервером
-
-*Безопасность:*
-• Только администраторы имеют доступ
-• Все действия логируются
-• Опасные команды требуют подтверждения
-    """
-    
-    await query.edit_message_text(
-        help_text,
-        reply_markup=InlineKeyboardMarkup(keyboard),
-        parse_mode='Markdown'
-    )
+async def send_chart(message, metric, window, edit=False):
+    """Отправить график (повторно - по file_id, без загрузки картинки)"""
+    chart = await get_chart(metric, window)
+    reply_markup = chart_keyboard(metric, window)
+    
+    try:
+        if chart.png is None:
+            if edit:
+                await message.edit_caption(chart.caption, reply_markup=reply_markup, parse_mode='Markdown')
+            else:
+                await message.reply_text(chart.caption, reply_markup=reply_markup, parse_mode='Markdown')
+            return
+        
+        photo = chart.file_id or chart.png
+        if edit:
+            sent = await message.edit_media(
+                InputMediaPhoto(photo, caption=chart.caption, parse_mode='Markdown'),
+                reply_markup=reply_markup
+            )
+        else:
+            sent = await message.reply_photo(
+                photo,
+                caption=chart.caption,
+                reply_markup=reply_markup,
+                parse_mode='Markdown'
+            )
+        remember_file_id(chart, sent)
+    except BadRequest as e:
+        # Повторное нажатие на ту же кнопку - картинка не изменилась
+        if 'not modified' not in str(e):
+            raise
 
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработка текстовых сообщений"""
@@ -343,45 +426,46 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if command.lower() in ['отмена', 'cancel', '❌']:
             context.user_data['awaiting_command'] = False
             await update.message.reply_text("❌ Команда отменена")
-            await show_terminal_menu(update)
+            await reply(update.message, get_screen('terminal'))
             return
         
-        # Выполняем команду
-        await update.message.reply_text("⏳ Выполняю команду...")
-        result = execute_command(command)
-        
-        # Обрезаем слишком длинный вывод
-        if len(result) > 3500:
-            result = result[:3500] + "\n... (вывод обрезан)"
-        
-        keyboard = [
-            [InlineKeyboardButton("🔄 Повторить", callback_data='custom_command')],
-            [InlineKeyboardButton("🔙 Терминал", callback_data='terminal')]
-        ]
-        
-        await update.message.reply_text(
-            f"*Команда:* `{command}`\n\n"
-            f"*Результат:*\n```\n{result}\n```",
-            reply_markup=InlineKeyboardMarkup(keyboard),
-            parse_mode='Markdown'
-        )
-        
         context.user_data['awaiting_command'] = False
+        
+        # Выполняем команду
+        actions = [("🔄 Повторить", 'custom_command'), ("🔙 Терминал", 'terminal')]
+        await run_streaming_command(update.message, command, user_id, actions)
     
     # Быстрые команды через слэши
     elif update.message.text.startswith('/cmd '):
         command = update.message.text[5:]  # Убираем '/cmd '
-        await update.message.reply_text("⏳ Выполняю команду...")
-        result = execute_command(command)
-        
-        if len(result) > 3500:
-            result = result[:3500] + "\n... (вывод обрезан)"
-        
-        await update.message.reply_text(
-            f"*Команда:* `{command}`\n\n"
-            f"*Результат:*\n```\n{result}\n```",
-            parse_mode='Markdown'
-        )
+        await run_streaming_command(update.message, command, user_id)
+
+async def run_streaming_command(message, command, user_id, actions=None):
+    """Выполнить команду, показывая вывод по ходу выполнения в одном сообщении"""
+    status = await message.reply_text("⏳ Выполняю команду...")
+    
+    async def show_output(tail):
+        try:
+            await status.edit_text(
+                f"⏳ *Выполняется:* `{command}`\n\n```\n{tail}\n```",
+                parse_mode='Markdown'
+            )
+        except BadRequest:
+            pass  # вывод не изменился или временно не парсится
+    
+    result = await stream_command(command, show_output, user_id=user_id, actions=actions)
+    
+    if result.output_id is None:
+        await status.edit_text(result.text)
+        return
+    
+    # Полный вывод сохранен постранично - показываем последнюю страницу
+    last_page = len(get_output(result.output_id).pages) - 1
+    await status.edit_text(
+        render_page(result.output_id, last_page),
+        reply_markup=page_keyboard(result.output_id, last_page),
+        parse_mode='Markdown'
+    )
 
 async def menu_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Команда /menu для показа меню"""
@@ -391,14 +475,6 @@ async def menu_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("⛔ Доступ запрещен")
         return
     
-    keyboard = [
-        [InlineKeyboardButton("📊 Мониторинг", callback_data='monitoring')],
-        [InlineKeyboardButton("⚡ Быстрые команды", callback_data='quick_cmds')],
-        [InlineKeyboardButton("🖥️ Терминал", callback_data='terminal')],
-        [InlineKeyboardButton("🔧 Управление", callback_data='management')],
-        [InlineKeyboardButton("ℹ️ Помощь", callback_data='help_menu')]
-    ]
-    
     # Удаляем старое меню если есть
     if user_id in user_messages:
         try:
@@ -409,11 +485,7 @@ async def menu_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         except:
             pass
     
-    msg = await update.message.reply_text(
-        "👋 *Главное меню*\n\nВыберите раздел:",
-        reply_markup=InlineKeyboardMarkup(keyboard),
-        parse_mode='Markdown'
-    )
+    msg = await reply(update.message, get_screen('menu'))
     
     user_messages[user_id] = msg.message_id
 
@@ -423,67 +495,252 @@ async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("⛔ Доступ запрещен")
         return
     
-    from monitoring import get_system_info
-    info = get_system_info()
+    snapshot = get_snapshot()
+    info = get_system_info(snapshot)
     
     # Обрезаем для краткости
     lines = info.split('\n')
     short_info = '\n'.join(lines[:15])  # Первые 15 строк
+    short_info += f"\n\n_Данные обновлены: {format_age(snapshot)}_"
     
-    keyboard = [[InlineKeyboardButton("📊 Подробнее", callback_data='system_status')]]
+    await reply(update.message, Screen(short_info, keyboard([("📊 Подробнее", 'system_status')])))
+
+async def graph_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда /graph <метрика> [окно], например /graph cpu 6h"""
+    if not is_admin(update.effective_user.id):
+        await update.message.reply_text("⛔ Доступ запрещен")
+        return
     
-    await update.message.reply_text(
-        short_info,
-        reply_markup=InlineKeyboardMarkup(keyboard),
-        parse_mode='Markdown'
-    )
+    metric = resolve_metric(context.args[0]) if context.args else 'cpu'
+    window = context.args[1].lower() if len(context.args) > 1 else '6h'
+    
+    if metric is None or window not in CHART_WINDOWS:
+        await update.message.reply_text(
+            "📉 *Использование:* `/graph <метрика> [окно]`\n\n"
+            f"Метрики: {', '.join(f'`{name}`' for name in CHART_METRICS)}\n"
+            f"Окна: {', '.join(f'`{name}`' for name in CHART_WINDOWS)}",
+            parse_mode='Markdown'
+        )
+        return
+    
+    await send_chart(update.message, metric, window)
+
+async def fleet_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда /fleet <команда> - заготовленная команда на всех серверах"""
+    if not is_admin(update.effective_user.id):
+        await update.message.reply_text("⛔ Доступ запрещен")
+        return
+    
+    if not context.args or context.args[0] not in predefined_commands:
+        await update.message.reply_text(
+            "⚡ *Использование:* `/fleet <команда>`\n\n"
+            f"Команды: {', '.join(f'`{name}`' for name in predefined_commands)}",
+            parse_mode='Markdown'
+        )
+        return
+    
+    status = await update.message.reply_text("⏳ Выполняю команду...")
+    await run_fleet(status, context.args[0], update.effective_user.id)
+
+async def alerts_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда /alerts - правила алертов и их состояние"""
+    if not is_admin(update.effective_user.id):
+        await update.message.reply_text("⛔ Доступ запрещен")
+        return
+    
+    await update.message.reply_text(format_rules(alert_engine), parse_mode='Markdown')
+
+async def queue_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда /queue - метрики очереди отправки"""
+    if not is_admin(update.effective_user.id):
+        await update.message.reply_text("⛔ Доступ запрещен")
+        return
+    
+    await update.message.reply_text(format_send_stats(context.bot.rate_limiter), parse_mode='Markdown')
+
+async def routes_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда /routes - время обработки кнопок"""
+    if not is_admin(update.effective_user.id):
+        await update.message.reply_text("⛔ Доступ запрещен")
+        return
+    
+    await update.message.reply_text(format_route_stats(router), parse_mode='Markdown')
+
+async def perf_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда /perf [префикс] - время операций бота (p50/p95/p99)"""
+    if not is_admin(update.effective_user.id):
+        await update.message.reply_text("⛔ Доступ запрещен")
+        return
+    
+    prefix = context.args[0] if context.args else ''
+    await update.message.reply_text(perf.format_perf(prefix), parse_mode='Markdown')
+
+async def lag_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда /lag - задержка event loop и кто его блокировал"""
+    if not is_admin(update.effective_user.id):
+        await update.message.reply_text("⛔ Доступ запрещен")
+        return
+    
+    await update.message.reply_text(format_loop_stats(), parse_mode='Markdown')
+
+async def logs_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда /logs [источник] [-u юнит] [-p приоритет] [текст] - логи с фильтром"""
+    if not is_admin(update.effective_user.id):
+        await update.message.reply_text("⛔ Доступ запрещен")
+        return
+    
+    args = list(context.args)
+    source = args.pop(0) if args and args[0] in log_tail.sources() else JOURNAL
+    unit = priority = None
+    words = []
+    try:
+        while args:
+            arg = args.pop(0)
+            if arg in ('-u', '-p') and not args:
+                raise ValueError(f"Не указано значение {arg}")
+            if arg == '-u':
+                unit = args.pop(0)
+            elif arg == '-p':
+                priority = parse_priority(args.pop(0))
+            else:
+                words.append(arg)
+        if unit and source != JOURNAL:
+            raise ValueError("Фильтр по юниту есть только у журнала")
+    except ValueError as e:
+        await update.message.reply_text(
+            f"⚠️ {e}\n\n"
+            "📊 *Использование:* `/logs [источник] [-u юнит] [-p приоритет] [текст]`\n\n"
+            f"Источники: {', '.join(f'`{name}`' for name in log_tail.sources())}\n"
+            "Приоритет: `emerg` ... `debug` или `0` ... `7`, текст - регулярное выражение",
+            parse_mode='Markdown'
+        )
+        return
+    
+    flt = LogFilter(unit, priority, " ".join(words) or None)
+    await reply(update.message, await logs_view(update.effective_user.id, source, log_tail.read_latest, flt))
 
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Команда /help"""
-    help_text = """
-*Быстрые команды в чате:*
-
-`/start` - Главное меню с кнопками
-`/menu` - Показать меню
-`/status` - Краткий статус системы
-`/cmd <команда>` - Выполнить команду
-`/help` - Справка
-
-*Быстрые клавиши:*
-Для быстрого доступа закрепите эти команды:
-• `Статус` → `/status`
-• `Диски` → `/cmd df -h`
-• `Память` → `/cmd free -h`
-• `Процессы` → `/cmd ps aux --sort=-%cpu | head -10`
-
-Используйте `/menu` для полного меню с кнопками!
-    """
-    
-    keyboard = [[InlineKeyboardButton("📋 Открыть меню", callback_data='main_menu')]]
-    
-    await update.message.reply_text(
-        help_text,
-        reply_markup=InlineKeyboardMarkup(keyboard),
-        parse_mode='Markdown'
-    )
+    await reply(update.message, get_screen('help'))
+
+@perf.timed('sampler.snapshot')
+def record_sample():
+    """Собрать снимок метрик и сохранить его в историю"""
+    snapshot = refresh_snapshot()
+    get_store().add_snapshot(snapshot)
+    return snapshot
+
+async def sample_metrics(context: ContextTypes.DEFAULT_TYPE):
+    """Фоновый сбор метрик: psutil вызывается в пуле потоков, не блокируя event loop"""
+    loop = asyncio.get_running_loop()
+    snapshot = await loop.run_in_executor(None, record_sample)
+    queue_alerts(alert_engine.observe_snapshot(snapshot))
+
+async def sample_processes(context: ContextTypes.DEFAULT_TYPE):
+    """Фоновый сэмпл таблицы процессов"""
+    loop = asyncio.get_running_loop()
+    with perf.timer('sampler.processes'):
+        await loop.run_in_executor(None, get_process_tracker().update)
+
+def observe_services(results):
+    """Результаты фоновых проверок сервисов -> алерты"""
+    queue_alerts(alert_engine.observe_services(results))
+
+def observe_units(events):
+    """Смена состояния юнитов systemd -> алерты (с тем же cooldown)"""
+    queue_alerts(alert_engine.observe_units(events))
+
+async def dump_perf(context: ContextTypes.DEFAULT_TYPE):
+    """Периодическая выгрузка метрик производительности в файл для Prometheus"""
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, perf.write_prometheus_file)
+
+async def on_startup(application: Application):
+    """Запуск фоновой рассылки алертов, сторожа event loop и эндпоинта метрик"""
+    get_watchdog().start()
+    # Каждая проверка сервиса - по своему расписанию из Config.SERVICES
+    get_scheduler().start(on_results=observe_services)
+    if config.Config.SYSTEMD_NOTIFY:
+        get_systemd_collector().subscribe(observe_units)
+    application.bot_data['alert_sender'] = asyncio.create_task(alert_sender(application.bot))
+    if config.Config.PERF_PROMETHEUS_PORT:
+        application.bot_data['metrics_server'] = await perf.start_metrics_server()
+
+async def on_shutdown(application: Application):
+    """Освобождение ресурсов при остановке"""
+    sender = application.bot_data.get('alert_sender')
+    if sender:
+        sender.cancel()
+    metrics_server = application.bot_data.get('metrics_server')
+    if metrics_server:
+        metrics_server.close()
+    await get_watchdog().stop()
+    await get_scheduler().stop()
+    await log_tail.stop_all()
+    await close_http_client()
+    await close_agents()
+    get_store().close()
 
 def main():
     """Запуск бота"""
     print("🚀 Запуск бота с улучшенным интерфейсом...")
     
-    application = Application.builder().token(config.Config.BOT_TOKEN).build()
+    application = (
+        Application.builder()
+        .token(config.Config.BOT_TOKEN)
+        .rate_limiter(SendQueue())
+        .post_init(on_startup)
+        .post_shutdown(on_shutdown)
+        .build()
+    )
     
-    # Регистрация обработчиков
+    # Регистрация обработчиков. Группа -1 подписывает задачу апдейта кнопкой
+    # или командой - по этой подписи сторож event loop находит виновника
+    application.add_handler(TypeHandler(Update, label_update), group=-1)
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("menu", menu_command))
     application.add_handler(CommandHandler("status", status_command))
     application.add_handler(CommandHandler("help", help_command))
+    application.add_handler(CommandHandler("graph", graph_command))
+    application.add_handler(CommandHandler("alerts", alerts_command))
+    application.add_handler(CommandHandler("fleet", fleet_command))
+    application.add_handler(CommandHandler("queue", queue_command))
+    application.add_handler(CommandHandler("routes", routes_command))
+    application.add_handler(CommandHandler("perf", perf_command))
+    application.add_handler(CommandHandler("lag", lag_command))
+    application.add_handler(CommandHandler("logs", logs_command))
     application.add_handler(CommandHandler("cmd", 
         lambda u, c: handle_message(u, c) if u.message.text.startswith('/cmd ') else None))
     
-    application.add_handler(CallbackQueryHandler(button_handler))
+    application.add_handler(CallbackQueryHandler(router.dispatch))
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
     
+    # Фоновый сборщик метрик: обработчики только отображают готовый снимок
+    application.job_queue.run_repeating(
+        sample_metrics,
+        interval=config.Config.SAMPLER_INTERVAL,
+        first=0,
+        name='metrics_sampler'
+    )
+    application.job_queue.run_repeating(
+        sample_processes,
+        interval=config.Config.PROCESS_SAMPLE_INTERVAL,
+        first=0,
+        name='process_sampler'
+    )
+    if config.Config.PERF_PROMETHEUS_FILE:
+        application.job_queue.run_repeating(
+            dump_perf,
+            interval=config.Config.PERF_DUMP_INTERVAL,
+            first=config.Config.PERF_DUMP_INTERVAL,
+            name='perf_dump'
+        )
+    
+    # Статические меню строятся один раз (после загрузки конфига агентов),
+    # проверки сервисов разбираются и проверяются тоже один раз
+    get_screens()
+    get_checks()
+    
     print("✅ Бот запущен")
     print("📱 Используйте /menu для открытия меню с кнопками")
     
@@ -0,0 +1,177 @@
+import asyncio
+import struct
+import time
+import zlib
+from collections import namedtuple
+from datetime import datetime
+import config
+from metrics_store import get_store
+
+# Метрики для графиков: поле хранилища -> (название, единицы, фиксированный максимум шкалы)
+CHART_METRICS = {
+    'cpu': ('CPU', '%', 100),
+    'mem': ('Память', '%', 100),
+    'swap': ('SWAP', '%', 100),
+    'temp': ('Температура', '°C', None),
+    'disk': ('Диск /', '%', 100),
+    'load1': ('Загрузка (1 мин)', '', None),
+    'net_rx': ('Сеть: прием', 'B/s', None),
+    'net_tx': ('Сеть: отправка', 'B/s', None),
+}
+
+# Короткие имена для команды /graph
+METRIC_ALIASES = {'load': 'load1', 'net': 'net_rx', 'rx': 'net_rx', 'tx': 'net_tx', 'ram': 'mem'}
+
+# Окна графиков: имя -> длительность в секундах
+CHART_WINDOWS = {'1h': 3600, '6h': 6 * 3600, '24h': 86400, '7d': 7 * 86400, '30d': 30 * 86400}
+
+CHART_WIDTH = 480
+CHART_HEIGHT = 200
+CHART_BUCKETS = 120
+
+# Палитра PNG (индексированные цвета): фон, сетка, заливка, линия
+PALETTE = bytes([
+    0xff, 0xff, 0xff,
+    0xe0, 0xe0, 0xe0,
+    0xc6, 0xdb, 0xef,
+    0x21, 0x71, 0xb5,
+])
+BG, GRID, FILL, LINE = range(4)
+
+Chart = namedtuple('Chart', ['key', 'png', 'file_id', 'caption'])
+
+# Готовые графики: (метрика, окно, корзина) -> (версия данных, png, подпись)
+_chart_cache = {}
+# Telegram file_id уже загруженных картинок: (метрика, окно, корзина, версия) -> file_id
+_file_ids = {}
+
+def resolve_metric(name):
+    """Имя метрики из команды -> поле хранилища (или None)"""
+    name = name.lower()
+    name = METRIC_ALIASES.get(name, name)
+    return name if name in CHART_METRICS else None
+
+def bucket_seconds(window):
+    """Размер корзины для окна (не мельче интервала сбора)"""
+    return max(config.Config.SAMPLER_INTERVAL, CHART_WINDOWS[window] // CHART_BUCKETS)
+
+def bucketize(points, start, bucket, count):
+    """Средние значения по корзинам (None - нет данных)"""
+    sums = [0.0] * count
+    counts = [0] * count
+    for ts, value in points:
+        i = int((ts - start) // bucket)
+        if 0 <= i < count:
+            sums[i] += value
+            counts[i] += 1
+    return [s / c if c else None for s, c in zip(sums, counts)]
+
+def encode_png(width, height, rows):
+    """Минимальный PNG кодировщик: 8-битные индексированные цвета"""
+    def chunk(tag, data):
+        return (struct.pack('>I', len(data)) + tag + data +
+                struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff))
+    
+    raw = b''.join(b'\x00' + row for row in rows)
+    return (b'\x89PNG\r\n\x1a\n' +
+            chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 3, 0, 0, 0)) +
+            chunk(b'PLTE', PALETTE) +
+            chunk(b'IDAT', zlib.compress(raw, 6)) +
+            chunk(b'IEND', b''))
+
+def render_png(values, low, high, width=CHART_WIDTH, height=CHART_HEIGHT):
+    """Линейный график с заливкой
+
+    Картинка строится по столбцам (x * height + y), чтобы заливка и линия
+    рисовались срезами bytearray, а строки для PNG получаются шаговым срезом.
+    """
+    buf = bytearray([BG]) * (width * height)
+    
+    # Горизонтальная сетка на 25/50/75%
+    for fraction in (0.25, 0.5, 0.75):
+        y = int(height * fraction)
+        buf[y::height] = bytes([GRID]) * width
+    
+    span = (high - low) or 1
+    n = len(values)
+    prev_y = None
+    for i, value in enumerate(values):
+        x0, x1 = i * width // n, (i + 1) * width // n
+        if value is None:
+            prev_y = None
+            continue
+        y = height - 1 - int((min(max(value, low), high) - low) / span * (height - 1))
+        top, bottom = (y, y) if prev_y is None else (min(y, prev_y), max(y, prev_y))
+        for x in range(x0, x1):
+            column = x * height
+            buf[column + y:column + height] = bytes([FILL]) * (height - y)
+            # Линия толщиной 2 px; в первом столбце корзины соединяем с предыдущей
+            line_top = top if x == x0 else y
+            line_bottom = (bottom if x == x0 else y) + 2
+            line_bottom = min(line_bottom, height)
+            buf[column + line_top:column + line_bottom] = bytes([LINE]) * (line_bottom - line_top)
+        prev_y = y
+    
+    rows = [bytes(buf[y::height]) for y in range(height)]
+    return encode_png(width, height, rows)
+
+def format_value(value, unit):
+    """Значение для подписи"""
+    if unit == 'B/s':
+        for suffix in ('B/s', 'KB/s', 'MB/s'):
+            if abs(value) < 1024:
+                return f"{value:.1f} {suffix}"
+            value /= 1024
+        return f"{value:.1f} GB/s"
+    return f"{value:.1f}{unit}"
+
+def render_chart(metric, window):
+    """Построить график (выполняется в пуле потоков): (png, подпись)"""
+    store = get_store()
+    title, unit, fixed_max = CHART_METRICS[metric]
+    bucket = bucket_seconds(window)
+    count = CHART_WINDOWS[window] // bucket
+    end = time.time()
+    start = end - count * bucket
+    
+    values = bucketize(store.query(metric, start, end), start, bucket, count)
+    present = [v for v in values if v is not None]
+    if not present:
+        return None, f"📉 *{title}* за {window}\n\nНет данных за этот период"
+    
+    low = 0
+    high = fixed_max or max(present) * 1.1 or 1
+    png = render_png(values, low, high)
+    caption = (
+        f"📉 *{title}* за {window}\n\n"
+        f"• min / avg / max: {format_value(min(present), unit)} / "
+        f"{format_value(sum(present) / len(present), unit)} / "
+        f"{format_value(max(present), unit)}\n"
+        f"• Шкала: {format_value(low, unit)} – {format_value(high, unit)}\n"
+        f"• Точность: {bucket} с\n"
+        f"_Построен: {datetime.now().strftime('%H:%M:%S')}_"
+    )
+    return png, caption
+
+async def get_chart(metric, window):
+    """График из кэша; перестраивается, только когда в хранилище закрылась новая корзина"""
+    bucket = bucket_seconds(window)
+    key = (metric, window, bucket)
+    version = get_store().last_ts // bucket
+    
+    cached = _chart_cache.get(key)
+    if cached is None or cached[0] != version:
+        loop = asyncio.get_running_loop()
+        png, caption = await loop.run_in_executor(None, render_chart, metric, window)
+        cached = _chart_cache[key] = (version, png, caption)
+    
+    _, png, caption = cached
+    return Chart(key + (version,), png, _file_ids.get(key + (version,)), caption)
+
+def remember_file_id(chart, message):
+    """Запомнить file_id отправленной картинки, чтобы не загружать ее повторно"""
+    if message and message.photo:
+        # Старые версии этого графика больше не понадобятся
+        for stale in [k for k in _file_ids if k[:3] == chart.key[:3]]:
+            del _file_ids[stale]
+        _file_ids[chart.key] = message.photo[-1].file_id
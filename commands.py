@@ -1,43 +1,210 @@
-import subprocess
+import asyncio
+import codecs
+import os
 import shlex
+import signal
+import tempfile
+from collections import defaultdict, namedtuple
+from contextlib import asynccontextmanager
 import config
+import perf
+import procfs
+from output import store_file
 
-def execute_command(command, timeout=config.Config.COMMAND_TIMEOUT):
+# Ограничения на одновременное выполнение команд
+_global_slots = None
+_user_running = defaultdict(int)
+
+def _get_global_slots():
+    """Глобальный семафор создается лениво, внутри работающего event loop"""
+    global _global_slots
+    if _global_slots is None:
+        _global_slots = asyncio.Semaphore(config.Config.MAX_CONCURRENT_COMMANDS)
+    return _global_slots
+
+def needs_shell(command):
+    """Нужна ли команде оболочка (пайпы, перенаправления, sudo)"""
+    return '|' in command or '&&' in command or '>' in command or 'sudo' in command
+
+@perf.timed('command.spawn')
+async def spawn_command(command, **kwargs):
+    """Запуск процесса: shell для сложных команд, exec для простых"""
+    # Отдельная группа процессов, чтобы по таймауту убить весь пайплайн
+    kwargs.setdefault('start_new_session', True)
+    if needs_shell(command):
+        return await asyncio.create_subprocess_shell(command, **kwargs)
+    # Для простых команд безопаснее без shell
+    args = shlex.split(command)
+    return await asyncio.create_subprocess_exec(*args, **kwargs)
+
+async def kill_process(proc):
+    """Убить группу процессов и дождаться завершения (без зомби)"""
+    if proc.returncode is None:
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            try:
+                proc.kill()
+            except ProcessLookupError:
+                pass
+    await proc.wait()
+
+BUSY_MESSAGE = "⏳ Слишком много команд выполняется одновременно, дождитесь завершения"
+
+class CommandLimitError(Exception):
+    """Превышен лимит одновременных команд пользователя"""
+
+@asynccontextmanager
+async def command_slot(user_id):
+    """Слот выполнения: лимит на пользователя (сразу отказ) и общий лимит (ожидание)"""
+    if user_id is not None and _user_running[user_id] >= config.Config.MAX_COMMANDS_PER_USER:
+        raise CommandLimitError(BUSY_MESSAGE)
+    
+    _user_running[user_id] += 1
+    try:
+        async with _get_global_slots():
+            yield
+    finally:
+        _user_running[user_id] -= 1
+        if _user_running[user_id] <= 0:
+            del _user_running[user_id]
+
+def format_result(returncode, output):
+    """Итоговый текст результата команды"""
+    if returncode == 0:
+        return output if output else "✅ Команда выполнена успешно"
+    return f"❌ Ошибка (код {returncode}):\n{output}"
+
+@perf.timed('command.exec')
+async def execute_command(command, timeout=config.Config.COMMAND_TIMEOUT, user_id=None):
     """Выполнение команды в терминале"""
     try:
-        # Безопасное разделение команды на аргументы
-        if '|' in command or '&&' in command or '>' in command or 'sudo' in command:
-            # Для сложных команд используем shell=True
-            result = subprocess.run(
+        async with command_slot(user_id):
+            proc = await spawn_command(
                 command,
-                shell=True,
-                capture_output=True,
-                text=True,
-                timeout=timeout
-            )
-        else:
-            # Для простых команд безопаснее без shell
-            args = shlex.split(command)
-            result = subprocess.run(
-                args,
-                capture_output=True,
-                text=True,
-                timeout=timeout
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
             )
+            try:
+                stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+            except asyncio.TimeoutError:
+                await kill_process(proc)
+                return "⏰ Таймаут выполнения команды"
+            except asyncio.CancelledError:
+                await kill_process(proc)
+                raise
         
-        output = result.stdout if result.stdout else result.stderr
+        output = stdout if stdout else stderr
+        return format_result(proc.returncode, output.decode('utf-8', errors='replace'))
+    
+    except CommandLimitError as e:
+        return str(e)
+    except Exception as e:
+        return f"⚠️ Ошибка: {str(e)}"
+
+# Результат потокового выполнения: хвост вывода, id полного вывода в output.py и его размер
+StreamResult = namedtuple('StreamResult', ['text', 'output_id', 'size', 'truncated'])
+
+@perf.timed('command.stream')
+async def stream_command(command, on_output=None, timeout=config.Config.COMMAND_TIMEOUT,
+                         user_id=None, actions=None):
+    """Выполнение команды с чтением вывода по мере поступления
+
+    В памяти держится только хвост вывода (STREAM_TAIL_CHARS), он же передается
+    в on_output не чаще раза в STREAM_EDIT_INTERVAL секунд. Полный вывод пишется
+    во временный файл, а по завершении сжимается постранично в output.py в пуле
+    потоков (actions - кнопки, которые показываются под страницами).
+    """
+    limit = config.Config.STREAM_TAIL_CHARS
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    tail = ''
+    size = 0
+    timed_out = False
+    
+    try:
+        async with command_slot(user_id):
+            proc = await spawn_command(
+                command,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT
+            )
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + timeout
+            last_update = loop.time()
+            # Анонимный временный файл удаляется системой при закрытии
+            with tempfile.TemporaryFile(prefix='bot_output_') as spool:
+                try:
+                    while True:
+                        remaining = deadline - loop.time()
+                        if remaining <= 0:
+                            timed_out = True
+                            break
+                        try:
+                            chunk = await asyncio.wait_for(proc.stdout.read(65536), remaining)
+                        except asyncio.TimeoutError:
+                            timed_out = True
+                            break
+                        if not chunk:
+                            break
+                        
+                        spool.write(chunk)
+                        size += len(chunk)
+                        tail = (tail + decoder.decode(chunk))[-limit:]
+                        
+                        if on_output and loop.time() - last_update >= config.Config.STREAM_EDIT_INTERVAL:
+                            last_update = loop.time()
+                            await on_output(tail)
+                    
+                    if timed_out:
+                        await kill_process(proc)
+                    else:
+                        await proc.wait()
+                except asyncio.CancelledError:
+                    await kill_process(proc)
+                    raise
+                
+                tail = (tail + decoder.decode(b'', final=True))[-limit:]
+                truncated = size > len(tail.encode('utf-8'))
+                
+                if timed_out:
+                    text = f"{tail}\n⏰ Таймаут выполнения команды"
+                    prefix = "⏰ Таймаут выполнения команды\n"
+                else:
+                    text = format_result(proc.returncode, tail)
+                    prefix = format_result(proc.returncode, '') if proc.returncode or not size else ''
+                
+                spool.seek(0)
+                # Сжатие большого вывода - секунды работы CPU, не в event loop
+                output_id = await loop.run_in_executor(None, store_file, command, spool, prefix, None, actions)
         
-        if result.returncode == 0:
-            return output if output else "✅ Команда выполнена успешно"
-        else:
-            return f"❌ Ошибка (код {result.returncode}):\n{output}"
+        return StreamResult(text, output_id, size, truncated)
+    
+    except CommandLimitError as e:
+        return StreamResult(str(e), None, 0, False)
+    except Exception as e:
+        return StreamResult(f"⚠️ Ошибка: {str(e)}", None, 0, False)
+
+async def run_predefined(name, user_id=None):
+    """Выполнение заготовленной команды: встроенный сборщик или процесс"""
+    entry = predefined_commands[name]
+    native = entry.get('native')
+    if native is None:
+        return await execute_command(entry['command'], user_id=user_id)
     
-    except subprocess.TimeoutExpired:
-        return "⏰ Таймаут выполнения команды"
+    # Чтение /proc и /sys без fork/exec; обход процессов может занять
+    # десятки миллисекунд, поэтому в пуле потоков
+    try:
+        loop = asyncio.get_running_loop()
+        with perf.timer(f'command.native.{name}'):
+            output = await loop.run_in_executor(None, native)
+        return format_result(0, output)
     except Exception as e:
         return f"⚠️ Ошибка: {str(e)}"
 
-# Заготовленные команды
+# Заготовленные команды. 'native' - встроенный сборщик, который выдает тот же
+# результат, что и 'command', но без запуска процессов; 'screen' - экран бота,
+# который открывает быстрая команда вместо запуска (команда остается для
+# агентов, всех серверов и /cmd)
 predefined_commands = {
     'disk_usage': {
         'command': 'df -h -T',
@@ -53,18 +220,22 @@ predefined_commands = {
     },
     'memory_detailed': {
         'command': 'cat /proc/meminfo | head -20',
+        'native': procfs.meminfo_head,
         'description': '🧠 Детальная информация о памяти'
     },
     'uptime': {
         'command': 'uptime',
+        'native': procfs.uptime,
         'description': '⏱️ Время работы'
     },
     'top_processes': {
         'command': 'ps aux --sort=-%cpu | head -15',
+        'native': procfs.top_processes,
         'description': '📈 Топ процессов (CPU)'
     },
     'top_memory': {
         'command': 'ps aux --sort=-%mem | head -15',
+        'native': procfs.top_memory,
         'description': '📈 Топ процессов (память)'
     },
     'network_stats': {
@@ -85,18 +256,21 @@ predefined_commands = {
     },
     'system_logs': {
         'command': 'journalctl -n 20 --no-pager',
+        'screen': 'logs:journal',
         'description': '📋 Последние логи'
     },
     'service_status': {
-        'command': 'systemctl list-units --type=service --state=running | head -20',
+        'command': 'systemctl list-units --type=service --state=running --no-pager --no-legend --plain',
         'description': '🔄 Запущенные сервисы'
     },
     'cpu_info': {
         'command': 'lscpu | grep -E "Model name|CPU\(s\)|Architecture"',
+        'native': procfs.cpu_info,
         'description': '⚙️ Информация о CPU'
     },
     'temperature': {
         'command': 'cat /sys/class/thermal/thermal_zone*/temp 2>/dev/null | head -1',
+        'native': procfs.temperature,
         'description': '🌡️ Температура CPU'
     }
 }
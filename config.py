@@ -32,12 +32,154 @@ class Config:
     # Максимальное время выполнения команд (секунды)
     COMMAND_TIMEOUT = 30
     
-    # Интервал мониторинга (секунды)
+    # Максимум одновременно выполняемых команд (всего и на одного пользователя)
+    MAX_CONCURRENT_COMMANDS = 4
+    MAX_COMMANDS_PER_USER = 2
+    
+    # Потоковый вывод команд: сколько последних символов показывать
+    # и как часто обновлять сообщение (секунды)
+    STREAM_TAIL_CHARS = 3500
+    STREAM_EDIT_INTERVAL = 3
+    
+    # Какие из скрываемых по умолчанию ФС показывать в дисках: 'tmpfs', 'devtmpfs',
+    # 'ramfs', 'squashfs', 'overlay', 'loop' (read-only loop-образы вроде снапов)
+    DISK_INCLUDE_FS = ()
+    
+    # Кэш полных выводов: размер страницы, лимиты кэша (число выводов, сжатый объем),
+    # сжатый объем одного вывода (сверх него сохраняются только начало и конец),
+    # число отрендеренных страниц и размер, начиная с которого предлагается .gz файл
+    OUTPUT_PAGE_CHARS = 3500
+    OUTPUT_CACHE_ENTRIES = 50
+    OUTPUT_CACHE_BYTES = 8 * 1024 * 1024
+    OUTPUT_ENTRY_BYTES = 2 * 1024 * 1024
+    OUTPUT_PAGE_CACHE = 64
+    OUTPUT_DOCUMENT_THRESHOLD = 64 * 1024
+    
+    # Просмотр логов: текстовые файлы (имя источника -> путь, имя без ':'),
+    # сколько записей показывать за раз, сколько секунд длится слежение
+    # и где хранятся позиции чтения пользователей
+    LOG_FILES = {
+        'bot': 'logs/bot.log',
+        'syslog': '/var/log/syslog',
+    }
+    LOG_LINES = 20
+    LOG_FOLLOW_SECONDS = 300
+    LOG_CURSORS_FILE = 'data/log_cursors.json'
+    
+    # Интервал мониторинга (секунды): период фоновой проверки сервисов по умолчанию
     MONITORING_INTERVAL = 60
     
-    # Сервисы для мониторинга
+    # Интервал фонового сбора метрик для снимка (секунды)
+    SAMPLER_INTERVAL = 5
+    
+    # Интервал сэмплирования таблицы процессов (секунды) и длина истории на процесс
+    PROCESS_SAMPLE_INTERVAL = 10
+    PROCESS_HISTORY = 60
+    
+    # История метрик: каталог и емкость колец в записях (размер файлов фиксирован)
+    METRICS_DIR = 'data/metrics'
+    METRICS_RETENTION = {
+        'raw': 17280,  # сырые сэмплы: сутки при интервале 5 с (~0.8 MB)
+        '1m': 43200,   # минутные агрегаты: 30 дней (~5.3 MB)
+        '1h': 8760,    # часовые агрегаты: год (~1.1 MB)
+    }
+    
+    # Таймаут одной проверки сервиса и общий дедлайн проверки "сейчас" по кнопке (секунды)
+    SERVICE_TIMEOUT = 3
+    SERVICES_DEADLINE = 8
+    
+    # HTTP пробы: сколько держать соединение открытым между раундами (сек,
+    # больше интервала проверок - соединения остаются "теплыми"), сколько
+    # байт читать для поиска текста и за сколько дней предупреждать о сертификате
+    HTTP_KEEPALIVE = 300
+    HTTP_MATCH_BYTES = 65536
+    HTTP_CERT_WARN_DAYS = 14
+    
+    # Сколько секунд показывать кэшированный статус Minecraft сервера
+    MINECRAFT_CACHE_TTL = 15
+    
+    # Состояния юнитов systemd: сколько секунд один общий опрос systemctl show
+    # считается свежим и уведомлять ли администраторов о смене состояния.
+    # Смена состояния проверяет правила service:<имя проверки> из ALERT_RULES
+    # для systemd-проверок этого юнита; для юнита без проверки и правила
+    # действует неявное service:<юнит> down (с ALERT_COOLDOWN)
+    SYSTEMD_CACHE_TTL = 5
+    SYSTEMD_NOTIFY = True
+    
+    # Правила алертов: "<метрика> > <порог> [for <время>] [clear <порог>]"
+    # или "service:<имя> down [for <время>]". Проверяются на каждом снимке метрик,
+    # сервисы - по расписанию своих проверок (Config.SERVICES)
+    ALERT_RULES = [
+        'mem.percent > 90 for 5m',
+        'swap.percent > 80 for 10m',
+        'cpu > 95 for 5m',
+        'temp > 75 for 2m',
+        'disk.percent > 90',
+        'service:website down for 2m',
+        'service:cloud down for 2m',
+        'service:minecraft down for 5m',
+    ]
+    
+    # Гистерезис по умолчанию (доля порога) и пауза между повторными алертами
+    # одного правила (секунды)
+    ALERT_HYSTERESIS = 0.05
+    ALERT_COOLDOWN = 1800
+    
+    # Очередь отправки в Telegram: запросов в секунду (всего, в личный чат,
+    # в группу) и сколько можно отправить подряд, повторы после RetryAfter
+    SEND_GLOBAL_RATE = 25
+    SEND_CHAT_RATE = 1.0
+    SEND_CHAT_BURST = 4
+    SEND_GROUP_RATE = 20 / 60
+    SEND_GROUP_BURST = 3
+    SEND_MAX_RETRIES = 3
+    
+    # Метрики производительности в формате Prometheus: файл для textfile
+    # collector (перезаписывается раз в PERF_DUMP_INTERVAL сек) и/или порт
+    # HTTP-эндпоинта на 127.0.0.1. None - выключено
+    PERF_PROMETHEUS_FILE = None
+    PERF_PROMETHEUS_PORT = None
+    PERF_DUMP_INTERVAL = 60
+    
+    # Сторож event loop: пульс раз в LOOP_LAG_TICK сек, блокировка дольше
+    # LOOP_STALL_THRESHOLD сек пишется в лог со стеком и кнопкой/командой
+    LOOP_LAG_TICK = 0.1
+    LOOP_STALL_THRESHOLD = 0.5
+    LOOP_STALL_HISTORY = 20
+    
+    # Удаленные серверы с agent.py: имя -> 'host:port'. Токен общий для бота
+    # и агентов, берется из .env (AGENT_TOKEN)
+    AGENTS = {
+        # 'nas': '192.168.1.10:8765',
+    }
+    AGENT_TOKEN = os.getenv('AGENT_TOKEN', '')
+    AGENT_PORT = 8765
+    AGENT_TIMEOUT = 5
+    
+    # Команда на всех серверах: сколько серверов одновременно, таймаут
+    # одного сервера и общий дедлайн (сек)
+    FLEET_CONCURRENCY = 8
+    FLEET_HOST_TIMEOUT = 35
+    FLEET_DEADLINE = 60
+    
+    # Сервисы для мониторинга: имя -> проверка. Строка - адрес (URL, host:port,
+    # minecraft://host:port), тип определяется по нему. Словарь:
+    #   type     - http, tcp, minecraft, systemd, process, file_age
+    #   target   - URL, host:port, юнит systemd, имя процесса или путь к файлу
+    #   interval - период фоновой проверки (сек, по умолчанию MONITORING_INTERVAL)
+    #   timeout  - таймаут проверки (сек, по умолчанию SERVICE_TIMEOUT)
+    #   priority - порядок в списке (меньше - выше, по умолчанию 0)
+    #   match    - http: текст, который должен быть на странице
+    #   max_age  - file_age: максимальный возраст файла (сек)
+    # Конфигурация проверяется при запуске, ошибки пишутся в лог
     SERVICES = {
+        'SSH (22)': {'type': 'tcp', 'target': 'localhost:22', 'priority': -2},
+        'HTTP (80)': {'type': 'tcp', 'target': 'localhost:80', 'priority': -2},
+        'HTTPS (443)': {'type': 'tcp', 'target': 'localhost:443', 'priority': -2},
+        'ssh': {'type': 'systemd', 'target': 'ssh', 'interval': 120, 'priority': -1},
+        'apache2': {'type': 'systemd', 'target': 'apache2', 'interval': 120, 'priority': -1},
+        'mysql': {'type': 'systemd', 'target': 'mysql', 'interval': 120, 'priority': -1},
         'website': 'https://onex01.ru',
-	    'cloud': 'https://cloud.onex01.ru',
-        'minecraft': 'onex01.ddns.net:25565'
+        'cloud': {'type': 'http', 'target': 'https://cloud.onex01.ru', 'interval': 30},
+        'minecraft': {'type': 'minecraft', 'target': 'onex01.ddns.net:25565', 'interval': 30},
     }
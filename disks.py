@@ -0,0 +1,206 @@
+import os
+import select
+import threading
+from collections import namedtuple
+import config
+
+MOUNTINFO = '/proc/self/mountinfo'
+
+# Псевдо-файловые системы, которые df не показывает
+PSEUDO_FS = {
+    'proc', 'sysfs', 'cgroup', 'cgroup2', 'devpts', 'mqueue', 'debugfs', 'tracefs',
+    'securityfs', 'pstore', 'bpf', 'configfs', 'fusectl', 'hugetlbfs', 'autofs',
+    'binfmt_misc', 'rpc_pipefs', 'nsfs', 'efivarfs', 'selinuxfs',
+}
+
+# Файловые системы в памяти и образы (снапы, слои контейнеров): по умолчанию
+# не показываются, включаются через Config.DISK_INCLUDE_FS
+VIRTUAL_FS = {'tmpfs', 'devtmpfs', 'ramfs', 'squashfs', 'overlay'}
+
+# Точки монтирования, которые считаются внешними дисками
+EXTERNAL_PREFIXES = ('/mnt', '/media')
+
+# Запись из mountinfo
+Mount = namedtuple('Mount', ['device', 'mountpoint', 'fstype', 'major_minor', 'readonly'], defaults=(False,))
+
+# Использование одной точки монтирования (те же поля, что у psutil.disk_usage);
+# block - раздел блочного устройства (только такие учитываются в disk.percent)
+MountUsage = namedtuple('MountUsage', [
+    'device', 'mountpoint', 'fstype', 'total', 'used', 'free', 'percent', 'external', 'block'
+])
+
+# Блочное устройство из /sys/block
+BlockDevice = namedtuple('BlockDevice', ['name', 'size', 'removable', 'rotational', 'model', 'partitions'])
+Partition = namedtuple('Partition', ['name', 'size'])
+
+def unescape(field):
+    """Раскодировать \\040 и другие восьмеричные escape-последовательности mountinfo"""
+    if '\\' not in field:
+        return field
+    out = []
+    i = 0
+    while i < len(field):
+        if field[i] == '\\' and field[i + 1:i + 4].isdigit():
+            out.append(chr(int(field[i + 1:i + 4], 8)))
+            i += 4
+        else:
+            out.append(field[i])
+            i += 1
+    return ''.join(out)
+
+def parse_mountinfo(text):
+    """Разбор /proc/self/mountinfo (пробелы в путях закодированы, split безопасен)"""
+    mounts = []
+    for line in text.splitlines():
+        fields = line.split()
+        try:
+            sep = fields.index('-')
+        except ValueError:
+            continue
+        mounts.append(Mount(
+            device=unescape(fields[sep + 2]),
+            mountpoint=unescape(fields[4]),
+            fstype=fields[sep + 1],
+            major_minor=fields[2],
+            readonly='ro' in fields[5].split(',')
+        ))
+    return mounts
+
+def is_block_device(device):
+    return device.startswith('/dev/')
+
+def wanted(mount, include=()):
+    """Показывать ли точку монтирования: без псевдо-ФС, ФС в памяти и read-only loop-образов"""
+    if mount.fstype in PSEUDO_FS:
+        return False
+    if mount.fstype in VIRTUAL_FS and mount.fstype not in include:
+        return False
+    # Образы снапов и подобные: всегда заполнены на 100%
+    return not (mount.readonly and mount.device.startswith('/dev/loop') and 'loop' not in include)
+
+def unique_mounts(mounts):
+    """Без bind-монтирований и повторов: одна точка на устройство (первая в mountinfo)"""
+    seen = set()
+    result = []
+    for mount in mounts:
+        keys = {mount.major_minor}
+        if is_block_device(mount.device):
+            keys.add(mount.device)
+        if keys & seen:
+            continue
+        seen |= keys
+        result.append(mount)
+    return result
+
+def _read_sys(path, default=''):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return default
+
+def read_block_devices():
+    """Топология блочных устройств из /sys/block (без loop/ram без разделов)"""
+    devices = []
+    for name in sorted(os.listdir('/sys/block')):
+        base = f'/sys/block/{name}'
+        partitions = tuple(
+            Partition(part, int(_read_sys(f'{base}/{part}/size', '0')) * 512)
+            for part in sorted(os.listdir(base))
+            if os.path.exists(f'{base}/{part}/partition')
+        )
+        size = int(_read_sys(f'{base}/size', '0')) * 512
+        if not size or (name.startswith(('loop', 'ram')) and not partitions):
+            continue
+        devices.append(BlockDevice(
+            name=name,
+            size=size,
+            removable=_read_sys(f'{base}/removable') == '1',
+            rotational=_read_sys(f'{base}/queue/rotational') == '1',
+            model=_read_sys(f'{base}/device/model'),
+            partitions=partitions
+        ))
+    return tuple(devices)
+
+def statvfs_usage(mount):
+    """Использование точки монтирования (проценты считаются как в df/psutil)"""
+    st = os.statvfs(mount.mountpoint)
+    total = st.f_blocks * st.f_frsize
+    if not total:
+        return None
+    free = st.f_bavail * st.f_frsize
+    used = (st.f_blocks - st.f_bfree) * st.f_frsize
+    percent = round(used / (used + free) * 100, 1) if used + free else 0.0
+    return MountUsage(
+        device=mount.device,
+        mountpoint=mount.mountpoint,
+        fstype=mount.fstype,
+        total=total,
+        used=used,
+        free=free,
+        percent=percent,
+        external=mount.mountpoint.startswith(EXTERNAL_PREFIXES),
+        block=is_block_device(mount.device)
+    )
+
+class DiskCollector:
+    """Сбор использования дисков: mountinfo перечитывается только после изменений
+
+    Ядро помечает открытый /proc/self/mountinfo событием POLLPRI при любом
+    mount/umount, поэтому список точек, индекс устройство -> точки и топология
+    /sys/block пересобираются только тогда. На каждый сэмпл остается по одному
+    statvfs на устройство: bind-монтирования и повторы отбрасываются.
+    """
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.mounts = ()
+        self.unique = ()
+        self.by_device = {}
+        self.block_devices = ()
+        self.generation = 0
+        self._file = open(MOUNTINFO)
+        self._poll = select.poll()
+        self._poll.register(self._file, select.POLLPRI | select.POLLERR)
+        self._reload()
+    
+    def _reload(self):
+        self._file.seek(0)
+        include = set(config.Config.DISK_INCLUDE_FS)
+        mounts = [m for m in parse_mountinfo(self._file.read()) if wanted(m, include)]
+        by_device = {}
+        for mount in mounts:
+            by_device.setdefault(mount.device, []).append(mount.mountpoint)
+        self.mounts = tuple(mounts)
+        self.unique = tuple(unique_mounts(mounts))
+        self.by_device = by_device
+        self.block_devices = read_block_devices()
+        self.generation += 1
+    
+    def refresh(self):
+        """Перечитать монтирования, если ядро сообщило об изменениях"""
+        with self.lock:
+            if self._poll.poll(0):
+                self._reload()
+    
+    def sample(self):
+        """Использование реальных файловых систем, по одной на устройство (кортеж MountUsage)"""
+        self.refresh()
+        usages = []
+        for mount in self.unique:
+            try:
+                usage = statvfs_usage(mount)
+            except OSError:
+                continue  # недоступная сетевая ФС или нет прав
+            if usage is not None:
+                usages.append(usage)
+        return tuple(usages)
+
+_collector = None
+
+def get_collector():
+    """Общий сборщик дисков (создается при первом обращении)"""
+    global _collector
+    if _collector is None:
+        _collector = DiskCollector()
+    return _collector
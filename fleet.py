@@ -0,0 +1,292 @@
+import asyncio
+import logging
+import time
+from collections import namedtuple
+import config
+from agent import AgentError, read_frame, sign, write_frame
+
+logger = logging.getLogger(__name__)
+
+# Имя локального сервера (сам бот, без агента)
+LOCAL_HOST = 'local'
+
+class AgentClient:
+    """Постоянное соединение с одним агентом.
+
+    Запросы, пришедшие пока идет обмен, копятся и уходят следующим пакетом;
+    таймаут вызова покрывает и ожидание своей очереди на соединение.
+    """
+    
+    def __init__(self, name, address, token):
+        self.name = name
+        host, port = address.rsplit(':', 1)
+        self.host, self.port = host, int(port)
+        self.token = token
+        self.reader = self.writer = None
+        # Очередь (запрос, future, таймаут) и задача, отправляющая пакеты
+        self.pending = []
+        self.sender = None
+    
+    async def _connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        hello = await read_frame(self.reader)
+        if not hello or 'nonce' not in hello:
+            raise AgentError("Некорректное приветствие агента")
+        await write_frame(self.writer, {'auth': sign(self.token, hello['nonce'])})
+        answer = await read_frame(self.reader)
+        if not answer or not answer.get('ok'):
+            raise AgentError("Агент отклонил токен")
+    
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+    
+    async def call(self, request, timeout=None):
+        """Выполнить один запрос (в общем пакете с одновременными запросами)"""
+        timeout = timeout or config.Config.AGENT_TIMEOUT
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((request, future, timeout))
+        if self.sender is None:
+            self.sender = asyncio.create_task(self._send_batches())
+        # По таймауту future отменяется: еще не отправленный запрос выпадет из пакета
+        return await asyncio.wait_for(future, timeout)
+    
+    async def _send_batches(self):
+        try:
+            while self.pending:
+                batch = [item for item in self.pending if not item[1].done()]
+                self.pending.clear()
+                if not batch:
+                    continue
+                try:
+                    results = await asyncio.wait_for(
+                        self._call([request for request, _, _ in batch]),
+                        max(timeout for _, _, timeout in batch)
+                    )
+                except Exception as e:
+                    for _, future, _ in batch:
+                        if not future.done():
+                            future.set_exception(e)
+                    continue
+                for (_, future, _), result in zip(batch, results):
+                    if not future.done():
+                        future.set_result(result)
+        finally:
+            self.sender = None
+    
+    async def _call(self, requests):
+        # Одна повторная попытка: соединение могло закрыться со стороны агента
+        for attempt in range(2):
+            try:
+                if self.writer is None:
+                    await self._connect()
+                await write_frame(self.writer, {'requests': requests})
+                response = await read_frame(self.reader)
+                if response is None:
+                    raise ConnectionError("Агент закрыл соединение")
+                return response['results']
+            except (ConnectionError, OSError):
+                self.close()
+                if attempt:
+                    raise
+            except BaseException:
+                # Таймаут/отмена посреди обмена - соединение в неизвестном состоянии
+                self.close()
+                raise
+
+_agents = None
+
+def get_agents():
+    """Клиенты агентов из Config.AGENTS (создаются один раз)"""
+    global _agents
+    if _agents is None:
+        _agents = {
+            name: AgentClient(name, address, config.Config.AGENT_TOKEN)
+            for name, address in config.Config.AGENTS.items()
+        }
+    return _agents
+
+def host_names():
+    """Все серверы: локальный и агенты"""
+    return [LOCAL_HOST] + list(get_agents())
+
+async def call_one(host, request, timeout=None):
+    """Один запрос к агенту: результат или исключение AgentError"""
+    agent = get_agents().get(host)
+    if agent is None:
+        raise AgentError(f"Неизвестный сервер {host!r}")
+    try:
+        answer = await agent.call(request, timeout)
+    except asyncio.TimeoutError:
+        raise AgentError("таймаут")
+    except (ConnectionError, OSError) as e:
+        raise AgentError(f"недоступен ({e.__class__.__name__})")
+    if not answer['ok']:
+        raise AgentError(answer['error'])
+    return answer['result']
+
+async def fetch_view(host, name, **kwargs):
+    """Экран мониторинга с удаленного сервера"""
+    try:
+        return await call_one(host, {'op': 'view', 'name': name, 'kwargs': kwargs})
+    except AgentError as e:
+        return f"❌ *{host}*: {e}"
+
+async def run_remote_predefined(host, name, user_id=None):
+    """Заготовленная команда на удаленном сервере"""
+    try:
+        return await call_one(host, {'op': 'predefined', 'name': name, 'user_id': user_id})
+    except AgentError as e:
+        return f"⚠️ Ошибка: {e}"
+
+async def fetch_summaries():
+    """Сводки со всех серверов параллельно: {host: summary или AgentError}"""
+    from monitoring import snapshot_summary
+    
+    async def one(host):
+        try:
+            return await call_one(host, {'op': 'snapshot'})
+        except AgentError as e:
+            return e
+    
+    hosts = list(get_agents())
+    results = await asyncio.gather(*(one(host) for host in hosts))
+    summaries = {LOCAL_HOST: snapshot_summary()}
+    summaries.update(zip(hosts, results))
+    return summaries
+
+def render_overview(summaries):
+    """Таблица состояния всех серверов"""
+    lines = [f"{'Сервер':12} {'CPU':>4} {'RAM':>4} {'Disk':>4} {'Temp':>5} {'LA1':>5}"]
+    for host, summary in summaries.items():
+        if isinstance(summary, Exception):
+            lines.append(f"{host[:12]:12} ❌ {summary}")
+            continue
+        root = next((d[1] for d in summary['disks'] if d[0] == '/'), None)
+        disk = f"{root:3.0f}%" if root is not None else "   —"
+        temp = f"{summary['temp']:4.0f}°" if summary['temp'] is not None else "    —"
+        lines.append(
+            f"{host[:12]:12} {summary['cpu']:3.0f}% {summary['mem']:3.0f}% {disk} "
+            f"{temp} {summary['load'][0]:5.2f}"
+        )
+    
+    return (
+        "🌐 *Обзор серверов*\n\n```\n" + "\n".join(lines) + "\n```\n"
+        f"_Обновлено: {time.strftime('%H:%M:%S')}_"
+    )
+
+async def fleet_overview():
+    """Обзор всех серверов (опрос агентов идет параллельно)"""
+    return render_overview(await fetch_summaries())
+
+# Результат команды на одном сервере
+HostResult = namedtuple('HostResult', 'host ok text latency')
+
+async def run_on_host(host, name, user_id=None, timeout=None):
+    """Заготовленная команда на одном сервере (локальном или через агента)"""
+    from commands import run_predefined
+    timeout = timeout or config.Config.FLEET_HOST_TIMEOUT
+    started = time.perf_counter()
+    try:
+        if host == LOCAL_HOST:
+            text = await asyncio.wait_for(run_predefined(name, user_id=user_id), timeout)
+        else:
+            text = await call_one(host, {'op': 'predefined', 'name': name, 'user_id': user_id}, timeout)
+        ok = True
+    except asyncio.TimeoutError:
+        ok, text = False, "таймаут"
+    except AgentError as e:
+        ok, text = False, str(e)
+    return HostResult(host, ok, text, time.perf_counter() - started)
+
+async def iter_fleet_command(name, hosts=None, user_id=None, timeout=None, deadline=None):
+    """Команда на всех серверах параллельно: результаты отдаются по мере готовности"""
+    hosts = host_names() if hosts is None else hosts
+    deadline = deadline or config.Config.FLEET_DEADLINE
+    semaphore = asyncio.Semaphore(config.Config.FLEET_CONCURRENCY)
+    
+    async def limited(host):
+        async with semaphore:
+            return await run_on_host(host, name, user_id, timeout)
+    
+    tasks = {asyncio.create_task(limited(host)): host for host in hosts}
+    started = time.perf_counter()
+    pending = set(tasks)
+    try:
+        while pending:
+            remaining = deadline - (time.perf_counter() - started)
+            if remaining <= 0:
+                break
+            done, pending = await asyncio.wait(
+                pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                yield task.result()
+        
+        # Серверы, не ответившие до общего дедлайна
+        for task in pending:
+            task.cancel()
+            yield HostResult(tasks[task], False, "общий таймаут", deadline)
+    finally:
+        for task in pending:
+            task.cancel()
+
+def group_results(results):
+    """Группы серверов с одинаковым выводом: [(ok, text, [hosts])], крупные первыми"""
+    groups = {}
+    for result in results:
+        groups.setdefault((result.ok, result.text.strip()), []).append(result.host)
+    return sorted(
+        ((ok, text, hosts) for (ok, text), hosts in groups.items()),
+        key=lambda group: (not group[0], -len(group[2]))
+    )
+
+def fleet_summary(results, total):
+    """Строка-итог: сколько серверов ответили одинаково, по-разному и с ошибкой"""
+    groups = group_results(results)
+    ok_groups = [hosts for ok, _, hosts in groups if ok]
+    failed = sum(1 for result in results if not result.ok)
+    summary = [f"ответили {len(results)}/{total}"]
+    if ok_groups and len(ok_groups[0]) > 1:
+        summary.append(f"одинаковый вывод: {len(ok_groups[0])}")
+        if len(ok_groups) > 1:
+            summary.append(f"отличается: {sum(map(len, ok_groups[1:]))}")
+    if failed:
+        summary.append(f"ошибки: {failed}")
+    return "; ".join(summary)
+
+def render_groups(results, limit=None):
+    """Вывод по группам серверов (обычный текст, одинаковый вывод - один раз)"""
+    blocks = []
+    for ok, text, hosts in group_results(results):
+        if limit and len(text) > limit:
+            text = "..." + text[-limit:]
+        icon = "🟢" if ok else "❌"
+        blocks.append(f"{icon} {', '.join(hosts)} ({len(hosts)}):\n{text or '(пусто)'}")
+    return "\n\n".join(blocks)
+
+async def run_fleet_command(name, user_id=None, on_progress=None):
+    """Команда на всех серверах: (итог, вывод по группам).
+    on_progress получает промежуточные итог и сокращенный вывод"""
+    hosts = host_names()
+    results = []
+    async for result in iter_fleet_command(name, hosts, user_id=user_id):
+        results.append(result)
+        if on_progress and len(results) < len(hosts):
+            await on_progress(fleet_summary(results, len(hosts)), render_groups(results, limit=300))
+    # В итоге серверы перечисляются в порядке конфигурации, а не ответов
+    results.sort(key=lambda result: hosts.index(result.host))
+    return fleet_summary(results, len(hosts)), render_groups(results)
+
+async def close_agents():
+    for agent in (_agents or {}).values():
+        if agent.sender is not None:
+            agent.sender.cancel()
+        writer = agent.writer
+        agent.close()
+        if writer is not None:
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
@@ -0,0 +1,208 @@
+import asyncio
+import contextvars
+import logging
+import socket
+import ssl
+import time
+from collections import namedtuple
+import httpcore
+import httpx
+import config
+import perf
+
+logger = logging.getLogger(__name__)
+
+# Результат HTTP пробы: статус, фазы запроса (секунды; None - соединение
+# взято из пула и фаза не выполнялась), дни до истечения сертификата и
+# найден ли ожидаемый текст (None - проверка текста не задана)
+HttpTiming = namedtuple('HttpTiming', ['status', 'dns', 'connect', 'tls', 'ttfb', 'total',
+                                       'cert_days', 'matched', 'reused'])
+
+PHASES = ('dns', 'connect', 'tls', 'ttfb')
+
+# Фазы текущего запроса: заполняют сетевой бэкенд (DNS) и trace httpcore
+_phases = contextvars.ContextVar('http_phases', default=None)
+
+# Сайты, которые отвечают на HEAD ошибкой: для них сразу GET с Range
+_no_head = set()
+
+# Тело не больше этого дочитывается, чтобы соединение вернулось в пул
+SMALL_BODY = 1024
+
+class TimedBackend(httpcore.AsyncNetworkBackend):
+    """Сетевой бэкенд httpcore с отдельным замером DNS.
+
+    Адрес разрешается здесь, а соединение открывается уже по IP - так время
+    DNS не смешивается со временем TCP. SNI и проверка сертификата идут по
+    имени из URL, поэтому на TLS это не влияет.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend or httpcore.AnyIOBackend()
+
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        started = time.perf_counter()
+        infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        phases = _phases.get()
+        if phases is not None:
+            phases['dns'] = time.perf_counter() - started
+        error = None
+        for *_, sockaddr in infos:
+            try:
+                return await self.backend.connect_tcp(sockaddr[0], port, timeout, local_address, socket_options)
+            except httpcore.ConnectError as e:
+                error = e
+        raise error or httpcore.ConnectError(f"{host}: нет адресов")
+
+    async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        return await self.backend.connect_unix_socket(path, timeout, socket_options)
+
+    async def sleep(self, seconds):
+        await self.backend.sleep(seconds)
+
+async def _trace(event, info):
+    """trace httpcore: начало и конец фаз соединения и запроса"""
+    phases = _phases.get()
+    if phases is None:
+        return
+    now = time.perf_counter()
+    if event == 'connection.connect_tcp.started':
+        phases['connect_started'] = now
+    elif event == 'connection.connect_tcp.complete':
+        # connect_tcp включает разрешение имени в бэкенде - вычитаем его
+        phases['connect'] = now - phases.pop('connect_started', now) - phases.get('dns', 0)
+    elif event == 'connection.start_tls.started':
+        phases['tls_started'] = now
+    elif event == 'connection.start_tls.complete':
+        phases['tls'] = now - phases.pop('tls_started', now)
+    elif event.endswith('.send_request_headers.started'):
+        phases['request_started'] = now
+    elif event.endswith('.receive_response_headers.complete'):
+        phases['ttfb'] = now - phases.pop('request_started', now)
+
+# Общий пул keep-alive соединений: между раундами проверок соединения
+# остаются открытыми, и повторная проба измеряет только сам запрос
+_http_client = None
+
+def get_http_client():
+    """HTTP клиент с пулом соединений (создается один раз)"""
+    global _http_client
+    if _http_client is None:
+        limits = httpx.Limits(
+            max_connections=20,
+            max_keepalive_connections=10,
+            keepalive_expiry=config.Config.HTTP_KEEPALIVE
+        )
+        transport = httpx.AsyncHTTPTransport(limits=limits)
+        # httpx не принимает network_backend - подменяем его у пула транспорта
+        # (атрибут httpcore 1.0.x, версия закреплена в requirements.txt)
+        pool = getattr(transport, '_pool', None)
+        if hasattr(pool, '_network_backend'):
+            pool._network_backend = TimedBackend()
+        else:
+            logger.warning("httpcore без _network_backend: время DNS не измеряется отдельно")
+        _http_client = httpx.AsyncClient(transport=transport, limits=limits, follow_redirects=True)
+    return _http_client
+
+async def close_http_client():
+    """Закрыть пул соединений при остановке бота"""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+def cert_days_left(response):
+    """Дней до истечения сертификата сервера (None для http://)"""
+    stream = response.extensions.get('network_stream')
+    ssl_object = stream.get_extra_info('ssl_object') if stream is not None else None
+    if ssl_object is None:
+        return None
+    cert = ssl_object.getpeercert()
+    if not cert or 'notAfter' not in cert:
+        return None
+    return (ssl.cert_time_to_seconds(cert['notAfter']) - time.time()) / 86400
+
+async def _request(client, method, url, timeout, match):
+    """Один запрос без скачивания тела (кроме первых байт для поиска текста)"""
+    headers = {}
+    if method == 'GET':
+        # Без проверки текста достаточно одного байта
+        last = config.Config.HTTP_MATCH_BYTES - 1 if match is not None else 0
+        headers['Range'] = f"bytes=0-{last}"
+    request = client.build_request(method, url, headers=headers, timeout=timeout,
+                                   extensions={'trace': _trace})
+    response = await client.send(request, stream=True)
+    try:
+        cert_days = cert_days_left(response)
+        matched = None
+        if match is not None:
+            # Сервер может проигнорировать Range - читаем не больше лимита
+            body = b''
+            async for chunk in response.aiter_bytes():
+                body += chunk
+                if len(body) >= config.Config.HTTP_MATCH_BYTES:
+                    break
+            matched = match.encode() in body
+        elif _small_body(response):
+            # Короткое тело (HEAD, ответ на Range) дочитываем, иначе httpcore
+            # закроет соединение вместо возврата в пул. Большое не качаем
+            await response.aread()
+    finally:
+        await response.aclose()
+    return response, cert_days, matched
+
+def _small_body(response):
+    length = response.headers.get('content-length')
+    return response.request.method == 'HEAD' or (length is not None and length.isdigit() and
+                                                  int(length) <= SMALL_BODY)
+
+async def probe(url, timeout, match=None):
+    """HTTP проба: HEAD (или GET с Range, если нужен текст или HEAD не поддерживается)
+    с раздельным временем DNS, TCP, TLS и до первого байта"""
+    client = get_http_client()
+    phases = {}
+    token = _phases.set(phases)
+    started = time.perf_counter()
+    try:
+        method = 'GET' if match is not None or url in _no_head else 'HEAD'
+        response, cert_days, matched = await _request(client, method, url, timeout, match)
+        if method == 'HEAD' and response.status_code in (405, 501):
+            _no_head.add(url)
+            # Фазы DNS/TCP/TLS остаются от первой попытки, TTFB - от GET
+            response, cert_days, matched = await _request(client, 'GET', url, timeout, match)
+    finally:
+        _phases.reset(token)
+    total = time.perf_counter() - started
+    return HttpTiming(
+        status=response.status_code,
+        dns=phases.get('dns'),
+        connect=phases.get('connect'),
+        tls=phases.get('tls'),
+        ttfb=phases.get('ttfb'),
+        total=total,
+        cert_days=cert_days,
+        matched=matched,
+        reused='connect' not in phases,
+    )
+
+def observe_timing(name, timing):
+    """Фазы пробы в гистограммы http.<имя>.<фаза>"""
+    for phase in PHASES:
+        value = getattr(timing, phase)
+        if value is not None:
+            perf.observe(f'http.{name}.{phase}', value)
+
+def format_timing(timing):
+    """Фазы одной строкой: DNS 3 · TCP 20 · TLS 41 · TTFB 85 мс · 🔒 42 дн."""
+    parts = []
+    for phase, title in zip(PHASES, ('DNS', 'TCP', 'TLS', 'TTFB')):
+        value = getattr(timing, phase)
+        if value is not None:
+            parts.append(f"{title} {value * 1000:.0f}")
+    text = " · ".join(parts) + " мс" if parts else ""
+    if timing.reused:
+        text += " (соединение из пула)"
+    if timing.cert_days is not None:
+        warn = " ⚠️" if timing.cert_days < config.Config.HTTP_CERT_WARN_DAYS else ""
+        text += f" · 🔒 {timing.cert_days:.0f} дн.{warn}"
+    return text
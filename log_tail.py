@@ -0,0 +1,403 @@
+import asyncio
+import json
+import logging
+import os
+import re
+from collections import deque, namedtuple
+from datetime import datetime
+import config
+from commands import kill_process
+
+logger = logging.getLogger(__name__)
+
+JOURNAL = 'journal'
+
+# Фильтр просмотра: юнит (только журнал), максимальный приоритет syslog
+# (0 - emerg ... 7 - debug) и регулярное выражение по тексту
+LogFilter = namedtuple('LogFilter', ['unit', 'priority', 'grep'], defaults=(None, None, None))
+
+# Порция записей и новая позиция чтения (курсор журнала или [inode, смещение])
+LogChunk = namedtuple('LogChunk', ['lines', 'position', 'scanned', 'rotated'], defaults=(False,))
+
+PRIORITIES = {'emerg': 0, 'alert': 1, 'crit': 2, 'err': 3, 'warning': 4, 'notice': 5, 'info': 6, 'debug': 7}
+
+# Уровни в текстовых логах (формат logging и syslog) -> приоритет syslog
+_LEVELS = re.compile(r'\b(CRITICAL|FATAL|CRIT|ERROR|ERR|WARNING|WARN|NOTICE|INFO|DEBUG)\b', re.IGNORECASE)
+_LEVEL_PRIORITY = {'critical': 2, 'fatal': 2, 'crit': 2, 'error': 3, 'err': 3, 'warning': 4,
+                   'warn': 4, 'notice': 5, 'info': 6, 'debug': 7}
+
+_MARKDOWN = str.maketrans('', '', '*_`[')
+
+# Сколько записей просматривать за раз в поисках совпадений с фильтром
+SCAN_LIMIT = 5000
+# Сколько байт файла читать за раз (назад от конца или вперед от позиции)
+READ_BLOCK = 64 * 1024
+SCAN_BYTES = 4 * 1024 * 1024
+
+def sources():
+    """Доступные источники: журнал systemd и файлы из Config.LOG_FILES"""
+    return [JOURNAL, *config.Config.LOG_FILES]
+
+def parse_priority(text):
+    """'err' или '3' -> 3"""
+    if text.isdigit() and int(text) in PRIORITIES.values():
+        return int(text)
+    if text.lower() in PRIORITIES:
+        return PRIORITIES[text.lower()]
+    raise ValueError(f"Неизвестный приоритет {text!r} ({', '.join(PRIORITIES)})")
+
+def compile_grep(text):
+    """Регулярное выражение без учета регистра; некорректное - как обычный текст"""
+    try:
+        return re.compile(text, re.IGNORECASE)
+    except re.error:
+        return re.compile(re.escape(text), re.IGNORECASE)
+
+def line_priority(line):
+    match = _LEVELS.search(line)
+    return _LEVEL_PRIORITY[match.group(1).lower()] if match else 6
+
+def make_matcher(flt):
+    """Функция (строка, приоритет) -> подходит ли запись под фильтр"""
+    grep = compile_grep(flt.grep) if flt.grep else None
+
+    def matches(line, priority):
+        if flt.priority is not None and priority > flt.priority:
+            return False
+        return grep is None or grep.search(line) is not None
+    return matches
+
+def describe_filter(flt):
+    parts = []
+    if flt.unit:
+        parts.append(f"юнит {flt.unit}")
+    if flt.priority is not None:
+        parts.append(f"приоритет ≤ {next(n for n, p in PRIORITIES.items() if p == flt.priority)}")
+    if flt.grep:
+        parts.append(f"текст «{flt.grep}»")
+    return ", ".join(parts)
+
+# --- Позиции чтения пользователей -------------------------------------------
+
+class CursorStore:
+    """Позиции чтения и фильтры по (пользователь, источник); хранятся в JSON,
+    чтобы "Новые записи" продолжали с того же места и после перезапуска бота"""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        try:
+            with open(path) as f:
+                self.entries = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.error(f"Не удалось прочитать позиции логов {path}: {e!r}")
+
+    @staticmethod
+    def _key(user_id, source):
+        return f"{user_id}:{source}"
+
+    def position(self, user_id, source):
+        return self.entries.get(self._key(user_id, source), {}).get('position')
+
+    def filter(self, user_id, source):
+        return LogFilter(*self.entries.get(self._key(user_id, source), {}).get('filter', ()))
+
+    def update(self, user_id, source, position=None, flt=None, save=True):
+        entry = self.entries.setdefault(self._key(user_id, source), {})
+        if position is not None:
+            entry['position'] = position
+        if flt is not None:
+            entry['filter'] = list(flt)
+        if save:
+            self.save()
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        try:
+            with open(tmp, 'w') as f:
+                json.dump(self.entries, f)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logger.error(f"Не удалось сохранить позиции логов: {e!r}")
+
+_store = None
+
+def get_store():
+    global _store
+    if _store is None:
+        _store = CursorStore(config.Config.LOG_CURSORS_FILE)
+    return _store
+
+# --- Журнал systemd ----------------------------------------------------------
+
+def format_journal_entry(entry):
+    """Запись journalctl -o json -> строка как в journalctl"""
+    message = entry.get('MESSAGE', '')
+    if isinstance(message, list):
+        # Небинарно-безопасные сообщения journald отдает массивом байт
+        message = bytes(message).decode(errors='replace')
+    ts = int(entry.get('__REALTIME_TIMESTAMP', 0)) / 1e6
+    ident = entry.get('SYSLOG_IDENTIFIER') or entry.get('_COMM') or '?'
+    return f"{datetime.fromtimestamp(ts):%b %d %H:%M:%S} {ident}: {message}"
+
+def journal_args(flt, cursor=None, last=None, follow=False):
+    args = ['journalctl', '--no-pager', '-o', 'json']
+    if cursor:
+        args += ['--after-cursor', cursor]
+    elif last is not None:
+        args += ['-n', str(last)]
+    if flt.unit:
+        args += ['-u', flt.unit]
+    if flt.priority is not None:
+        args += ['-p', str(flt.priority)]
+    if follow:
+        args.append('-f')
+    return args
+
+async def spawn_journal(args):
+    # limit: одна запись JSON бывает длиннее стандартных 64 КБ
+    return await asyncio.create_subprocess_exec(
+        *args,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.DEVNULL,
+        start_new_session=True,
+        limit=1024 * 1024
+    )
+
+async def iter_journal(args):
+    """Записи журнала по мере чтения вывода journalctl (процесс убивается при выходе)"""
+    proc = await spawn_journal(args)
+    try:
+        while True:
+            line = await proc.stdout.readline()
+            if not line:
+                break
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+    finally:
+        await kill_process(proc)
+
+async def read_journal(flt, cursor, count):
+    """Без курсора - последние count записей; с курсором - первые count новых после него"""
+    matches = make_matcher(flt)
+    # Для поиска по тексту берем больше записей - совпадений среди них меньше
+    last = None if cursor else (SCAN_LIMIT if flt.grep else count)
+    lines = deque(maxlen=count) if not cursor else []
+    position = cursor
+    scanned = 0
+    async for entry in iter_journal(journal_args(flt, cursor, last)):
+        scanned += 1
+        position = entry.get('__CURSOR', position)
+        line = format_journal_entry(entry)
+        if matches(line, int(entry.get('PRIORITY', 6))):
+            lines.append(line)
+            if cursor and len(lines) >= count:
+                break
+        if cursor and scanned >= SCAN_LIMIT:
+            break
+    return LogChunk(list(lines), position, scanned)
+
+# --- Текстовые файлы -----------------------------------------------------------
+
+def tail_file(path, flt, count):
+    """Последние count подходящих строк: чтение блоками назад от конца файла"""
+    matches = make_matcher(flt)
+    with open(path, 'rb') as f:
+        st = os.fstat(f.fileno())
+        end = st.st_size
+        lines = []
+        offset = end
+        rest = b''
+        # Недописанная последняя строка (после последнего \n): не показываем ее
+        # и ставим позицию перед ней, чтобы "Новые записи" вернули ее целиком
+        partial = None
+        while offset > 0 and len(lines) < count and end - offset < SCAN_BYTES:
+            step = min(READ_BLOCK, offset)
+            offset -= step
+            f.seek(offset)
+            parts = (f.read(step) + rest).split(b'\n')
+            # Первая часть может быть обрезанной строкой - дочитаем со следующим блоком
+            rest = parts.pop(0) if offset > 0 else b''
+            for raw in reversed(parts):
+                if partial is None:
+                    partial = raw
+                    continue
+                line = raw.decode(errors='replace')
+                if line and matches(line, line_priority(line)):
+                    lines.append(line)
+                    if len(lines) >= count:
+                        break
+        return LogChunk(lines[::-1], [st.st_ino, end - len(partial or b'')], end - offset)
+
+def read_file(path, flt, position, count):
+    """Первые count подходящих строк после позиции; seek без перечитывания файла.
+    Если файл ротирован (другой inode или стал короче) - читаем с начала"""
+    matches = make_matcher(flt)
+    inode, offset = position
+    with open(path, 'rb') as f:
+        st = os.fstat(f.fileno())
+        rotated = st.st_ino != inode or st.st_size < offset
+        if rotated:
+            offset = 0
+        f.seek(offset)
+        lines = []
+        scanned = 0
+        while len(lines) < count and scanned < SCAN_BYTES:
+            block = f.read(READ_BLOCK)
+            # Только целые строки: недописанный хвост прочитаем в следующий раз
+            cut = block.rfind(b'\n')
+            if cut < 0:
+                if len(block) < READ_BLOCK:
+                    break
+                # Строка длиннее блока - берем ее кусок целиком
+                cut = len(block) - 1
+            for raw in block[:cut + 1].splitlines(keepends=True):
+                offset += len(raw)
+                scanned += len(raw)
+                line = raw.decode(errors='replace').rstrip('\n')
+                if line and matches(line, line_priority(line)):
+                    lines.append(line)
+                    if len(lines) >= count:
+                        break
+            f.seek(offset)
+            if len(block) < READ_BLOCK:
+                break
+    return LogChunk(lines, [st.st_ino, offset], scanned, rotated)
+
+# --- Общий интерфейс ---------------------------------------------------------
+
+async def read_latest(user_id, source, flt=None, count=None):
+    """Последние записи источника; позиция пользователя ставится на конец"""
+    store = get_store()
+    flt = store.filter(user_id, source) if flt is None else flt
+    count = count or config.Config.LOG_LINES
+    if source == JOURNAL:
+        chunk = await read_journal(flt, None, count)
+    else:
+        chunk = await asyncio.to_thread(tail_file, config.Config.LOG_FILES[source], flt, count)
+    store.update(user_id, source, chunk.position, flt)
+    return chunk
+
+async def read_new(user_id, source, count=None, save=True):
+    """Записи, появившиеся после позиции пользователя (save=False - позиция
+    остается в памяти, на диск ее запишет вызывающий)"""
+    store = get_store()
+    position = store.position(user_id, source)
+    if position is None:
+        return await read_latest(user_id, source, count=count)
+    flt = store.filter(user_id, source)
+    count = count or config.Config.LOG_LINES
+    if source == JOURNAL:
+        chunk = await read_journal(flt, position, count)
+    else:
+        chunk = await asyncio.to_thread(read_file, config.Config.LOG_FILES[source], flt, position, count)
+    store.update(user_id, source, chunk.position, save=save)
+    return chunk
+
+async def follow(user_id, source, on_update, duration=None):
+    """Слежение за логом: новые строки копятся в хвосте, on_update(строки)
+    вызывается не чаще раза в STREAM_EDIT_INTERVAL секунд"""
+    store = get_store()
+    flt = store.filter(user_id, source)
+    duration = duration or config.Config.LOG_FOLLOW_SECONDS
+    tail = deque(maxlen=config.Config.LOG_LINES)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + duration
+    last_update = 0
+    changed = False
+
+    async def flush(force=False):
+        nonlocal last_update, changed
+        if changed and (force or loop.time() - last_update >= config.Config.STREAM_EDIT_INTERVAL):
+            last_update = loop.time()
+            changed = False
+            await on_update(list(tail))
+
+    if store.position(user_id, source) is None:
+        await read_latest(user_id, source)
+
+    try:
+        if source == JOURNAL:
+            matches = make_matcher(flt)
+            args = journal_args(flt, store.position(user_id, source), last=0, follow=True)
+            proc = await spawn_journal(args)
+            try:
+                while loop.time() < deadline:
+                    # Отмена readline безопасна: недочитанная строка остается в буфере
+                    try:
+                        raw = await asyncio.wait_for(proc.stdout.readline(), min(deadline - loop.time(), 1))
+                    except asyncio.TimeoutError:
+                        await flush()
+                        continue
+                    if not raw:
+                        break
+                    try:
+                        entry = json.loads(raw)
+                    except ValueError:
+                        continue
+                    # Позицию сохраняем в конце: запись на диск на каждую строку не нужна
+                    store.update(user_id, source, entry.get('__CURSOR'), save=False)
+                    line = format_journal_entry(entry)
+                    if matches(line, int(entry.get('PRIORITY', 6))):
+                        tail.append(line)
+                        changed = True
+                    await flush()
+            finally:
+                await kill_process(proc)
+        else:
+            while loop.time() < deadline:
+                # Позиция сохраняется на диск один раз в конце (finally), не на каждый опрос
+                chunk = await read_new(user_id, source, count=config.Config.LOG_LINES, save=False)
+                if chunk.lines:
+                    tail.extend(chunk.lines)
+                    changed = True
+                await flush()
+                # Пока есть непрочитанное - без паузы, иначе опрос раз в секунду
+                if not chunk.lines:
+                    await asyncio.sleep(1)
+        await flush(force=True)
+    finally:
+        store.save()
+    return list(tail)
+
+# Активные слежения: user_id -> задача (у пользователя одно слежение за раз)
+_followers = {}
+
+def start_follow(user_id, coro):
+    stop_follow(user_id)
+    task = asyncio.create_task(coro)
+    _followers[user_id] = task
+    task.add_done_callback(lambda t: _followers.pop(user_id, None) if _followers.get(user_id) is t else None)
+    return task
+
+def stop_follow(user_id):
+    task = _followers.pop(user_id, None)
+    if task is not None:
+        task.cancel()
+    return task is not None
+
+async def stop_all():
+    tasks = list(_followers.values())
+    _followers.clear()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+def render_chunk(title, flt, lines, note=None):
+    """Текст сообщения с записями лога (Markdown)"""
+    text = f"📋 *{title}*"
+    # Текст фильтра вводит пользователь - убираем символы разметки
+    desc = describe_filter(flt).translate(_MARKDOWN)
+    if desc:
+        text += f"\n_Фильтр: {desc}_"
+    if note:
+        text += f"\n{note}"
+    body = "\n".join(lines) if lines else "Новых записей нет"
+    # Тройные кавычки в логе закрыли бы блок кода
+    body = body.replace('```', "'''")[-config.Config.OUTPUT_PAGE_CHARS:]
+    return f"{text}\n\n```\n{body}\n```"
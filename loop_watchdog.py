@@ -0,0 +1,198 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+import weakref
+from collections import Counter, deque, namedtuple
+import config
+import perf
+
+logger = logging.getLogger(__name__)
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Зависание event loop: когда началось, сколько длилось, что обрабатывалось
+# (кнопка/команда), строка кода проекта и полный стек главного потока
+Stall = namedtuple('Stall', 'started duration label location stack')
+
+def describe_update(update):
+    """Что пользователь нажал или отправил - для подписи зависаний"""
+    if update.callback_query is not None:
+        return f"кнопка {update.callback_query.data}"
+    message = update.effective_message
+    if message is not None and message.text:
+        kind = "команда" if message.text.startswith('/') else "сообщение"
+        return f"{kind} {message.text[:64]}"
+    return f"апдейт {update.update_id}"
+
+def project_location(frames):
+    """Самый глубокий кадр из кода бота (не stdlib и не библиотек)"""
+    for frame in reversed(frames):
+        if frame.filename.startswith(PROJECT_DIR) and 'site-packages' not in frame.filename:
+            return f"{os.path.relpath(frame.filename, PROJECT_DIR)}:{frame.lineno} {frame.name}"
+    return "вне кода бота"
+
+class LoopWatchdog:
+    """Сторож event loop.
+
+    Задача-пульс просыпается каждые tick секунд и пишет опоздание в
+    гистограмму loop.lag. Отдельный поток следит за пульсом: если его нет
+    дольше порога, loop занят синхронным кодом - поток снимает стек главного
+    потока прямо во время блокировки и берет подпись текущей задачи
+    (кнопку или команду, которую она обрабатывает).
+    """
+
+    def __init__(self, tick=None, threshold=None, history=None):
+        cfg = config.Config
+        self.tick = tick or cfg.LOOP_LAG_TICK
+        self.threshold = threshold or cfg.LOOP_STALL_THRESHOLD
+        self.lag = perf.histogram('loop.lag')
+        self.stalls = deque(maxlen=history or cfg.LOOP_STALL_HISTORY)
+        self.offenders = Counter()  # подпись -> суммарное время блокировок
+        self.stall_count = 0
+        self.labels = weakref.WeakKeyDictionary()  # задача -> подпись
+        self.loop = None
+        self.thread_id = None
+        self.beat = 0.0
+        self.captured = None  # (подпись, место, стек), снятые потоком для текущей блокировки
+        self.heartbeat = None
+        self.watcher = None
+        self.stopping = threading.Event()
+
+    def label(self, text):
+        """Подписать текущую задачу: что она сейчас обрабатывает"""
+        task = asyncio.current_task()
+        if task is not None:
+            self.labels[task] = text
+
+    def start(self):
+        """Запустить пульс и поток-наблюдатель (вызывать из работающего loop)"""
+        if self.heartbeat is not None:
+            return
+        self.loop = asyncio.get_running_loop()
+        self.thread_id = threading.get_ident()
+        self.beat = time.monotonic()
+        self.stopping.clear()
+        self.heartbeat = asyncio.create_task(self._heartbeat())
+        self.watcher = threading.Thread(target=self._watch, name='loop-watchdog', daemon=True)
+        self.watcher.start()
+
+    async def stop(self):
+        if self.heartbeat is None:
+            return
+        self.stopping.set()
+        self.heartbeat.cancel()
+        try:
+            await self.heartbeat
+        except asyncio.CancelledError:
+            pass
+        self.heartbeat = None
+        await asyncio.get_running_loop().run_in_executor(None, self.watcher.join)
+        self.watcher = None
+
+    async def _heartbeat(self):
+        while True:
+            expected = time.monotonic() + self.tick
+            await asyncio.sleep(self.tick)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            self.beat = now
+            self.lag.observe(lag)
+            if lag >= self.threshold:
+                self._record(lag)
+            else:
+                # Стек снят, но блокировка не дотянула до порога
+                self.captured = None
+
+    def _watch(self):
+        """Поток-наблюдатель: снимает стек, пока loop еще заблокирован"""
+        reported = None
+        while not self.stopping.wait(self.tick / 2):
+            beat = self.beat
+            # Снимаем стек чуть раньше порога: короткие блокировки иначе проскакивают
+            if beat != reported and time.monotonic() - beat > self.threshold:
+                reported = beat
+                self.captured = self._capture()
+
+    def _task_label(self, task):
+        if task is None:
+            return "колбэк event loop"
+        label = self.labels.get(task)
+        if label is None:
+            coro = task.get_coro()
+            label = f"задача {getattr(coro, '__qualname__', task.get_name())}"
+        return label
+
+    def _capture(self):
+        frame = sys._current_frames().get(self.thread_id)
+        if frame is None:
+            return None
+        frames = traceback.extract_stack(frame)
+        # Из другого потока: только чтение словаря текущих задач asyncio
+        task = asyncio.current_task(self.loop)
+        return self._task_label(task), project_location(frames), ''.join(frames.format())
+
+    def _record(self, duration):
+        captured, self.captured = self.captured, None
+        if captured is None:
+            # Блокировка закончилась раньше, чем поток успел ее заметить
+            captured = ("не определено", "стек не снят", '')
+        label, location, stack = captured
+        self.stalls.append(Stall(time.time() - duration, duration, label, location, stack))
+        self.offenders[label] += duration
+        self.stall_count += 1
+        perf.count('loop.stalls')
+        message = f"Event loop заблокирован на {duration:.2f} с: {label} ({location})"
+        if stack:
+            message += f"\nСтек во время блокировки:\n{stack.rstrip()}"
+        logger.warning(message)
+
+    def stats(self):
+        return {
+            'p50': self.lag.percentile(0.5),
+            'p95': self.lag.percentile(0.95),
+            'p99': self.lag.percentile(0.99),
+            'max': self.lag.max,
+            'samples': self.lag.count,
+            'stalls': self.stall_count,
+        }
+
+_watchdog = None
+
+def get_watchdog():
+    global _watchdog
+    if _watchdog is None:
+        _watchdog = LoopWatchdog()
+    return _watchdog
+
+async def label_update(update, context):
+    """Обработчик группы -1: подписывает задачу апдейта до остальных обработчиков"""
+    get_watchdog().label(describe_update(update))
+
+def format_loop_stats(watchdog=None):
+    """Задержка event loop и виновники блокировок для /lag"""
+    watchdog = watchdog or get_watchdog()
+    s = watchdog.stats()
+    if not s['samples']:
+        return "🐢 *Задержка event loop*\n\nЕще нет данных"
+    text = f"""🐢 *Задержка event loop*
+
+• p50: {perf.format_duration(s['p50'])}
+• p95: {perf.format_duration(s['p95'])}
+• p99: {perf.format_duration(s['p99'])}
+• max: {perf.format_duration(s['max'])}
+• Блокировок дольше {watchdog.threshold:g} с: {s['stalls']}"""
+
+    if watchdog.offenders:
+        lines = [f"{seconds:6.2f} с  {label[:40]}" for label, seconds in watchdog.offenders.most_common(5)]
+        text += "\n\n*Виновники (суммарно):*\n```\n" + "\n".join(lines) + "\n```"
+    if watchdog.stalls:
+        lines = []
+        for stall in reversed(watchdog.stalls):
+            when = time.strftime('%H:%M:%S', time.localtime(stall.started))
+            lines.append(f"{when} {stall.duration:5.2f} с  {stall.label[:40]}\n         {stall.location}")
+        text += "\n*Последние блокировки:*\n```\n" + "\n".join(lines[:5]) + "\n```"
+    return text
@@ -0,0 +1,378 @@
+from array import array
+import math
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+import config
+
+# Метрики, которые сохраняются в историю (порядок = порядок полей в записи)
+FIELDS = ('cpu', 'load1', 'load5', 'load15', 'mem', 'swap', 'temp', 'disk', 'net_tx', 'net_rx')
+
+# Заголовок файла: сигнатура, версия, размер записи, емкость, позиция записи, число записей
+HEADER = struct.Struct('<4sHHIII')
+MAGIC = b'TSDB'
+VERSION = 1
+
+# Сырая запись: время + значение каждой метрики
+RAW_RECORD = struct.Struct('<I' + 'f' * len(FIELDS))
+# Агрегат: время начала корзины, число сэмплов + (avg, min, max) каждой метрики
+ROLLUP_RECORD = struct.Struct('<II' + 'fff' * len(FIELDS))
+
+# Разрешения хранилища: имя -> (размер корзины в секундах, запись)
+RESOLUTIONS = {
+    'raw': (0, RAW_RECORD),
+    '1m': (60, ROLLUP_RECORD),
+    '1h': (3600, ROLLUP_RECORD),
+}
+
+# Сколько точек по умолчанию отдавать запросом (иначе берется более грубое разрешение)
+DEFAULT_MAX_POINTS = 2000
+
+class RingFile:
+    """Кольцевой буфер записей фиксированной длины в файле заранее известного размера"""
+    
+    def __init__(self, path, record, capacity, flush_every=1):
+        self.path = path
+        self.record = record
+        self.capacity = capacity
+        self.flush_every = flush_every
+        self.pending = []
+        
+        size = HEADER.size + record.size * capacity
+        exists = os.path.exists(path) and os.path.getsize(path) == size
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        
+        header = HEADER.unpack(os.pread(self.fd, HEADER.size, 0)) if exists else None
+        if header and header[:4] == (MAGIC, VERSION, record.size, capacity):
+            self.head, self.count = header[4], header[5]
+        else:
+            # Новый файл или другой формат - размечаем заново (место выделяется сразу)
+            os.ftruncate(self.fd, 0)
+            os.ftruncate(self.fd, size)
+            self.head, self.count = 0, 0
+            self._write_header()
+        
+        self.map = mmap.mmap(self.fd, size, access=mmap.ACCESS_READ)
+    
+    def _write_header(self):
+        os.pwrite(self.fd, HEADER.pack(MAGIC, VERSION, self.record.size,
+                                       self.capacity, self.head, self.count), 0)
+    
+    def append(self, values):
+        """Добавить запись (на диск попадает пачками по flush_every штук)"""
+        self.pending.append(self.record.pack(*values))
+        if len(self.pending) >= self.flush_every:
+            self.flush()
+    
+    def flush(self):
+        """Записать накопленные записи одним-двумя pwrite"""
+        if not self.pending:
+            return
+        data = self.pending[-self.capacity:]
+        self.pending = []
+        while data:
+            chunk = data[:self.capacity - self.head]
+            os.pwrite(self.fd, b''.join(chunk), HEADER.size + self.head * self.record.size)
+            self.head = (self.head + len(chunk)) % self.capacity
+            self.count = min(self.capacity, self.count + len(chunk))
+            data = data[len(chunk):]
+        self._write_header()
+    
+    def _timestamp(self, index):
+        """Время записи по логическому индексу (0 - самая старая)"""
+        physical = (self.head - self.count + index) % self.capacity
+        return struct.unpack_from('<I', self.map, HEADER.size + physical * self.record.size)[0]
+    
+    def _bisect(self, ts):
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._timestamp(mid) < ts:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+    
+    def oldest(self):
+        """Время самой старой записи (или None)"""
+        if self.count:
+            return self._timestamp(0)
+        if self.pending:
+            return self.record.unpack(self.pending[0])[0]
+        return None
+    
+    def newest(self):
+        """Время самой новой записи (или None)"""
+        if self.pending:
+            return self.record.unpack(self.pending[-1])[0]
+        if self.count:
+            return self._timestamp(self.count - 1)
+        return None
+    
+    def read_columns(self, start, end, columns):
+        """Столбцы записей с start <= ts < end в хронологическом порядке
+
+        columns - номера полей записи (0 - время). Все поля записей 32-битные,
+        поэтому столбец вырезается срезом массива без распаковки записей.
+        """
+        first, last = self._bisect(start), self._bisect(end)
+        begin = (self.head - self.count + first) % self.capacity
+        size = self.record.size
+        stride = size // 4
+        
+        # Диапазон может переходить через конец кольца - читаем двумя кусками
+        spans = []
+        n = last - first
+        if n > 0:
+            tail = min(n, self.capacity - begin)
+            spans.append((begin, tail))
+            if n > tail:
+                spans.append((0, n - tail))
+        
+        result = [[] for _ in columns]
+        for offset, length in spans:
+            data = self.map[HEADER.size + offset * size:HEADER.size + (offset + length) * size]
+            for out, column in zip(result, columns):
+                words = array(self.record.format[1 + column])
+                words.frombytes(data)
+                if sys.byteorder == 'big':
+                    words.byteswap()
+                out.extend(words[column::stride])
+        
+        # Еще не сброшенные на диск записи
+        for raw in self.pending:
+            values = self.record.unpack(raw)
+            if start <= values[0] < end:
+                for out, column in zip(result, columns):
+                    out.append(values[column])
+        return result
+    
+    def close(self):
+        self.flush()
+        self.map.close()
+        os.close(self.fd)
+
+class Bucket:
+    """Накопитель агрегата (count, sum, min, max) по всем метрикам"""
+    
+    def __init__(self, start):
+        self.start = start
+        self.count = 0
+        self.counts = [0] * len(FIELDS)
+        self.sums = [0.0] * len(FIELDS)
+        self.mins = [math.inf] * len(FIELDS)
+        self.maxs = [-math.inf] * len(FIELDS)
+    
+    def add(self, count, avgs, mins, maxs):
+        self.count += count
+        for i in range(len(FIELDS)):
+            if math.isnan(avgs[i]):
+                continue
+            self.counts[i] += count
+            self.sums[i] += avgs[i] * count
+            self.mins[i] = min(self.mins[i], mins[i])
+            self.maxs[i] = max(self.maxs[i], maxs[i])
+    
+    def record(self):
+        values = [self.start, self.count]
+        for i in range(len(FIELDS)):
+            if not self.counts[i]:
+                values += [math.nan] * 3
+            else:
+                values += [self.sums[i] / self.counts[i], self.mins[i], self.maxs[i]]
+        return values
+
+class MetricsStore:
+    """История метрик: сырые сэмплы -> агрегаты за минуту -> агрегаты за час"""
+    
+    def __init__(self, directory, retention=None, flush_every=6):
+        os.makedirs(directory, exist_ok=True)
+        retention = retention or config.Config.METRICS_RETENTION
+        self.rings = {}
+        for name, (step, record) in RESOLUTIONS.items():
+            self.rings[name] = RingFile(
+                os.path.join(directory, f'metrics_{name}.tsdb'),
+                record,
+                retention[name],
+                flush_every=flush_every if name == 'raw' else 1
+            )
+        self.buckets = {'1m': None, '1h': None}
+        self.last_ts = 0
+        self.last_net = None
+        self.version = 0
+        self.lock = threading.Lock()
+        self._restore()
+    
+    def _restore(self):
+        """Состояние после перезапуска: время последней записи (часов реального
+        времени на плате нет - до синхронизации NTP время может быть позади
+        сохраненного) и незакрытые корзины 1m/1h из более подробных колец"""
+        raw, minute, hour = self.rings['raw'], self.rings['1m'], self.rings['1h']
+        raw_last, minute_last, hour_last = raw.newest(), minute.newest(), hour.newest()
+        # Закрытая корзина означает, что данные были до ее конца
+        ends = [raw_last]
+        if minute_last is not None:
+            ends.append(minute_last + RESOLUTIONS['1m'][0] - 1)
+        if hour_last is not None:
+            ends.append(hour_last + RESOLUTIONS['1h'][0] - 1)
+        self.last_ts = max((ts for ts in ends if ts is not None), default=0)
+        
+        # Текущая минута: сырые сэмплы после последней закрытой минуты
+        if raw_last is not None:
+            start = raw_last - raw_last % RESOLUTIONS['1m'][0]
+            if minute_last is None or start > minute_last:
+                bucket = Bucket(start)
+                columns = raw.read_columns(start, raw_last + 1, range(1, len(FIELDS) + 1))
+                for values in zip(*columns):
+                    bucket.add(1, values, values, values)
+                if bucket.count:
+                    self.buckets['1m'] = bucket
+        
+        # Текущий час: закрытые минуты после последнего закрытого часа
+        if minute_last is not None:
+            start = minute_last - minute_last % RESOLUTIONS['1h'][0]
+            if hour_last is None or start > hour_last:
+                bucket = Bucket(start)
+                columns = minute.read_columns(start, minute_last + 1, range(1, 2 + len(FIELDS) * 3))
+                for record in zip(*columns):
+                    bucket.add(record[0], record[1::3], record[2::3], record[3::3])
+                if bucket.count:
+                    self.buckets['1h'] = bucket
+    
+    def add(self, ts, values):
+        """Добавить сырой сэмпл (values - по одному числу на каждое поле FIELDS)"""
+        ts = int(ts)
+        with self.lock:
+            if ts <= self.last_ts:
+                return  # время ушло назад или дубль - пропускаем
+            self.last_ts = ts
+            self.rings['raw'].append([ts] + list(values))
+            self._roll('1m', ts, 1, values, values, values)
+            self.version += 1
+    
+    def _roll(self, name, ts, count, avgs, mins, maxs):
+        """Добавить данные в корзину; закрытая корзина уходит в кольцо и выше"""
+        step = RESOLUTIONS[name][0]
+        start = ts - ts % step
+        bucket = self.buckets[name]
+        if bucket is not None and bucket.start != start:
+            record = bucket.record()
+            self.rings[name].append(record)
+            if name == '1m':
+                self._roll('1h', bucket.start, bucket.count,
+                           record[2::3], record[3::3], record[4::3])
+            bucket = None
+        if bucket is None:
+            bucket = self.buckets[name] = Bucket(start)
+        bucket.add(count, avgs, mins, maxs)
+    
+    def add_snapshot(self, snapshot):
+        """Добавить снимок из monitoring.MetricsSnapshot"""
+        net = snapshot.net_io
+        net_tx = net_rx = math.nan
+        if self.last_net is not None:
+            prev_ts, prev = self.last_net
+            elapsed = snapshot.timestamp - prev_ts
+            if elapsed > 0 and net.bytes_sent >= prev.bytes_sent and net.bytes_recv >= prev.bytes_recv:
+                net_tx = (net.bytes_sent - prev.bytes_sent) / elapsed
+                net_rx = (net.bytes_recv - prev.bytes_recv) / elapsed
+        self.last_net = (snapshot.timestamp, net)
+        
+        disk = next((usage.percent for usage in snapshot.disks if usage.mountpoint == '/'), math.nan)
+        temp = snapshot.cpu_temp if snapshot.cpu_temp is not None else math.nan
+        self.add(snapshot.timestamp, (
+            snapshot.cpu_percent,
+            *snapshot.load_avg,
+            snapshot.memory.percent,
+            snapshot.swap.percent,
+            temp,
+            disk,
+            net_tx,
+            net_rx,
+        ))
+    
+    def pick_resolution(self, start, end, max_points=None):
+        """Самое подробное разрешение, которое хранит данные с момента start
+        и дает не больше max_points точек за период"""
+        for name, (step, _) in RESOLUTIONS.items():
+            oldest = self.rings[name].oldest()
+            if oldest is None or oldest > start:
+                continue
+            step = step or config.Config.SAMPLER_INTERVAL
+            if max_points and (end - start) / step > max_points and name != '1h':
+                continue
+            return name
+        # Данных за такой период нет нигде - берем самое длинное непустое кольцо
+        for name in ('1h', '1m'):
+            if self.rings[name].oldest() is not None:
+                return name
+        return 'raw'
+    
+    def _read(self, start, end, resolution, max_points, columns):
+        with self.lock:
+            resolution = resolution or self.pick_resolution(start, end, max_points)
+            raw = resolution == 'raw'
+            data = self.rings[resolution].read_columns(
+                int(start), int(end) + 1, columns(raw)
+            )
+        return resolution, data
+    
+    def query(self, field, start, end=None, resolution=None, max_points=DEFAULT_MAX_POINTS):
+        """Точки (ts, value) метрики за период; для агрегатов value - среднее"""
+        index = FIELDS.index(field)
+        end = end or time.time()
+        _, (times, values) = self._read(
+            start, end, resolution, max_points,
+            lambda raw: (0, index + 1 if raw else 2 + index * 3)
+        )
+        return [(ts, value) for ts, value in zip(times, values) if not math.isnan(value)]
+    
+    def aggregate(self, field, start, end=None, resolution=None, max_points=DEFAULT_MAX_POINTS):
+        """Сводка по метрике за период: count, avg, min, max (или None, если данных нет)"""
+        index = FIELDS.index(field)
+        end = end or time.time()
+        resolution, data = self._read(
+            start, end, resolution, max_points,
+            lambda raw: (index + 1,) if raw else (1, 2 + index * 3, 3 + index * 3, 4 + index * 3)
+        )
+        
+        if resolution == 'raw':
+            values = [v for v in data[0] if not math.isnan(v)]
+            if not values:
+                return None
+            count, total, low, high = len(values), sum(values), min(values), max(values)
+        else:
+            count, total, low, high = 0, 0.0, math.inf, -math.inf
+            for n, avg, r_min, r_max in zip(*data):
+                if not math.isnan(avg):
+                    count += n
+                    total += avg * n
+                    low = min(low, r_min)
+                    high = max(high, r_max)
+            if not count:
+                return None
+        
+        return {'count': count, 'avg': total / count, 'min': low, 'max': high,
+                'resolution': resolution}
+    
+    def flush(self):
+        with self.lock:
+            for ring in self.rings.values():
+                ring.flush()
+    
+    def close(self):
+        with self.lock:
+            for ring in self.rings.values():
+                ring.close()
+
+_store = None
+
+def get_store():
+    """Общее хранилище истории метрик (открывается при первом обращении)"""
+    global _store
+    if _store is None:
+        _store = MetricsStore(config.Config.METRICS_DIR)
+    return _store
@@ -0,0 +1,240 @@
+"""Проверка Minecraft сервера по протоколу Server List Ping: рукопожатие,
+запрос статуса и ping/pong - то же, что делает список серверов в игре.
+
+Проверка сервера и локальная заглушка для отладки:
+    python minecraft.py onex01.ddns.net:25565
+    python minecraft.py --stub --port 25565
+"""
+import argparse
+import asyncio
+import json
+import re
+import struct
+import time
+from collections import namedtuple
+import config
+
+DEFAULT_PORT = 25565
+
+# Версия протокола в рукопожатии: -1 - "любая", сервер ответит своей
+PROTOCOL_VERSION = -1
+MAX_PACKET = 1024 * 1024
+
+# Статус сервера: игроки, версия, MOTD без цветовых кодов и время ping/pong
+McStatus = namedtuple('McStatus', ['online', 'max', 'version', 'motd', 'latency'])
+
+class McError(Exception):
+    """Сервер ответил не по протоколу"""
+
+def pack_varint(value):
+    """VarInt: 7 бит на байт, старший бит - "есть продолжение" (отрицательные - как uint32)"""
+    value &= 0xFFFFFFFF
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+def unpack_varint(data, offset=0):
+    """(значение, новое смещение) из буфера"""
+    value = 0
+    for i in range(5):
+        if offset >= len(data):
+            raise McError("Обрезанный VarInt")
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << (7 * i)
+        if not byte & 0x80:
+            if value & 0x80000000:
+                value -= 1 << 32
+            return value, offset
+    raise McError("Слишком длинный VarInt")
+
+async def read_varint(reader):
+    value = 0
+    for i in range(5):
+        byte = (await reader.readexactly(1))[0]
+        value |= (byte & 0x7F) << (7 * i)
+        if not byte & 0x80:
+            return value
+    raise McError("Слишком длинный VarInt")
+
+def pack_string(text):
+    data = text.encode()
+    return pack_varint(len(data)) + data
+
+def unpack_string(data, offset=0):
+    length, offset = unpack_varint(data, offset)
+    if length < 0 or offset + length > len(data):
+        raise McError("Обрезанная строка")
+    return data[offset:offset + length].decode(errors='replace'), offset + length
+
+def pack_packet(packet_id, payload=b''):
+    """Пакет: длина (VarInt) + id пакета (VarInt) + данные"""
+    body = pack_varint(packet_id) + payload
+    return pack_varint(len(body)) + body
+
+async def read_packet(reader):
+    """(id пакета, данные)"""
+    length = await read_varint(reader)
+    if not 0 < length <= MAX_PACKET:
+        raise McError(f"Некорректная длина пакета: {length}")
+    body = await reader.readexactly(length)
+    packet_id, offset = unpack_varint(body)
+    return packet_id, body[offset:]
+
+def handshake(host, port):
+    """Рукопожатие с переходом в состояние status (1)"""
+    return pack_packet(0x00, pack_varint(PROTOCOL_VERSION) + pack_string(host)
+                       + struct.pack('>H', port) + pack_varint(1))
+
+_FORMATTING = re.compile('§.')
+_MARKDOWN = str.maketrans('', '', '*_`[')
+
+def motd_text(description):
+    """MOTD из JSON-компонента чата (строка или {'text', 'extra'}) без кодов §"""
+    if isinstance(description, str):
+        text = description
+    elif isinstance(description, dict):
+        text = description.get('text', '') + ''.join(motd_text(part) for part in description.get('extra', ()))
+    elif isinstance(description, list):
+        text = ''.join(motd_text(part) for part in description)
+    else:
+        text = ''
+    return _FORMATTING.sub('', text)
+
+async def ping(host, port=DEFAULT_PORT, timeout=3):
+    """Server List Ping: статус сервера и задержка ping/pong"""
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    try:
+        writer.write(handshake(host, port) + pack_packet(0x00))
+        await writer.drain()
+        packet_id, data = await asyncio.wait_for(read_packet(reader), timeout)
+        if packet_id != 0x00:
+            raise McError(f"Неожиданный пакет 0x{packet_id:02x}")
+        raw, _ = unpack_string(data)
+        try:
+            status = json.loads(raw)
+        except ValueError:
+            raise McError("Некорректный JSON статуса")
+        if not isinstance(status, dict):
+            raise McError("Статус сервера - не JSON-объект")
+
+        payload = struct.pack('>q', time.monotonic_ns())
+        started = time.perf_counter()
+        writer.write(pack_packet(0x01, payload))
+        await writer.drain()
+        packet_id, data = await asyncio.wait_for(read_packet(reader), timeout)
+        latency = time.perf_counter() - started
+        if packet_id != 0x01 or data != payload:
+            raise McError("Некорректный pong")
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+
+    players = status.get('players')
+    version = status.get('version')
+    players = players if isinstance(players, dict) else {}
+    version = version if isinstance(version, dict) else {}
+    return McStatus(
+        online=players.get('online', 0),
+        max=players.get('max', 0),
+        version=version.get('name', '?'),
+        motd=motd_text(status.get('description', '')).strip(),
+        latency=latency,
+    )
+
+# Кэш статусов: частые нажатия в меню не долбят игровой сервер.
+# (host, port) -> (время, McStatus или исключение)
+_cache = {}
+_inflight = {}
+
+async def get_status(host, port=DEFAULT_PORT, timeout=3, ttl=None):
+    """Статус с кэшем на ttl секунд; одновременные запросы ждут один ping"""
+    ttl = config.Config.MINECRAFT_CACHE_TTL if ttl is None else ttl
+    key = (host, port)
+    hit = _cache.get(key)
+    if hit is not None and time.monotonic() - hit[0] < ttl:
+        result = hit[1]
+    else:
+        task = _inflight.get(key)
+        if task is None:
+            task = _inflight[key] = asyncio.create_task(_ping_cached(key, timeout))
+        # shield: отмена одного ожидающего не обрывает ping для остальных
+        result = await asyncio.shield(task)
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+async def _ping_cached(key, timeout):
+    try:
+        result = await ping(*key, timeout=timeout)
+    except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, McError) as e:
+        # Ошибки тоже кэшируем: лежащий сервер не опрашиваем на каждое нажатие
+        result = e
+    finally:
+        _inflight.pop(key, None)
+    _cache[key] = (time.monotonic(), result)
+    return result
+
+def format_status(status):
+    text = f"{status.online}/{status.max} игроков, {status.version}, {status.latency * 1000:.0f} мс"
+    if status.motd:
+        # MOTD попадает в Markdown-сообщение - убираем символы разметки
+        motd = status.motd.splitlines()[0][:40].translate(_MARKDOWN)
+        text += f" - {motd}"
+    return text
+
+def stub_handler(status):
+    """Обработчик asyncio.start_server, отвечающий как Minecraft сервер со статусом status"""
+    async def handle(reader, writer):
+        try:
+            packet_id, _ = await read_packet(reader)  # рукопожатие
+            if packet_id != 0x00:
+                return
+            while True:
+                packet_id, data = await read_packet(reader)
+                if packet_id == 0x00:
+                    writer.write(pack_packet(0x00, pack_string(json.dumps(status))))
+                elif packet_id == 0x01:
+                    writer.write(pack_packet(0x01, data))
+                    await writer.drain()
+                    return
+                await writer.drain()
+        except (asyncio.IncompleteReadError, McError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+    return handle
+
+STUB_STATUS = {
+    'version': {'name': '1.20.4', 'protocol': 765},
+    'players': {'online': 3, 'max': 20},
+    'description': {'text': '§aЗаглушка', 'extra': [{'text': ' server-bot'}]},
+}
+
+async def main(args):
+    if args.stub:
+        server = await asyncio.start_server(stub_handler(STUB_STATUS), args.host, args.port)
+        print(f"Заглушка Minecraft на {args.host}:{args.port}")
+        async with server:
+            await server.serve_forever()
+    host, port = args.address, DEFAULT_PORT
+    if ':' in host:
+        host, port = host.rsplit(':', 1)
+    print(format_status(await ping(host, int(port))))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Server List Ping для Minecraft')
+    parser.add_argument('address', nargs='?', default=f'127.0.0.1:{DEFAULT_PORT}')
+    parser.add_argument('--stub', action='store_true', help='запустить локальную заглушку сервера')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    asyncio.run(main(parser.parse_args()))
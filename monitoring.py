@@ -1,29 +1,89 @@
 import psutil
 import platform
-import socket
-import requests
+import time
+from collections import namedtuple
 from datetime import datetime
 import os
-import re
-import config
+import shutil
+import perf
+from services import format_seconds, get_checks, iter_services_status, latest_results
+from http_probe import HttpTiming, format_timing
+from disks import get_collector as get_disk_collector
+from network import get_collector as get_net_collector
+from processes import SORT_KEYS, get_tracker as get_process_tracker
 
-def get_system_info():
+# Неизменяемый снимок метрик, который собирает фоновая задача
+MetricsSnapshot = namedtuple('MetricsSnapshot', [
+    'timestamp',     # time.time() момента сбора
+    'cpu_percent',   # загрузка CPU в % с прошлого снимка
+    'per_cpu',       # кортеж загрузки по ядрам
+    'load_avg',      # (1, 5, 15 мин)
+    'memory',        # psutil.virtual_memory()
+    'swap',          # psutil.swap_memory()
+    'cpu_temp',      # температура в °C или None
+    'disks',         # кортеж disks.MountUsage
+    'net_io',        # psutil.net_io_counters()
+    'net_rates',     # кортеж network.InterfaceRates
+])
+
+_latest_snapshot = None
+
+# vcgencmd есть только на некоторых платах - ищем один раз
+_VCGENCMD = shutil.which('vcgencmd')
+
+# Первый вызов cpu_percent(interval=None) всегда 0.0 - "заводим" счетчики заранее
+psutil.cpu_percent(interval=None)
+psutil.cpu_percent(interval=None, percpu=True)
+
+@perf.timed('monitor.collect_snapshot')
+def collect_snapshot():
+    """Сбор всех метрик за один проход (без блокирующих интервалов)"""
+    return MetricsSnapshot(
+        timestamp=time.time(),
+        cpu_percent=psutil.cpu_percent(interval=None),
+        per_cpu=tuple(psutil.cpu_percent(interval=None, percpu=True)),
+        load_avg=psutil.getloadavg(),
+        memory=psutil.virtual_memory(),
+        swap=psutil.swap_memory(),
+        cpu_temp=read_cpu_temperature(),
+        disks=get_disk_collector().sample(),
+        net_io=psutil.net_io_counters(),
+        net_rates=get_net_collector().sample()
+    )
+
+def refresh_snapshot():
+    """Собрать новый снимок и сделать его текущим"""
+    global _latest_snapshot
+    _latest_snapshot = collect_snapshot()
+    return _latest_snapshot
+
+def get_snapshot():
+    """Последний снимок метрик (собирается сразу, если сборщик еще не запускался)"""
+    if _latest_snapshot is None:
+        return refresh_snapshot()
+    return _latest_snapshot
+
+def format_age(snapshot):
+    """Возраст снимка для отображения"""
+    age = max(0, int(time.time() - snapshot.timestamp))
+    return f"{age} с назад" if age < 120 else f"{age // 60} мин назад"
+
+@perf.timed('monitor.system_info')
+def get_system_info(snapshot=None):
     """Получение информации о системе для Orange Pi Zero 3"""
-    cpu_percent = psutil.cpu_percent(interval=1)
-    memory = psutil.virtual_memory()
-    load_avg = psutil.getloadavg()
-    
-    # Получаем температуру для Orange Pi
-    cpu_temp = get_cpu_temperature()
-    
-    # Получаем информацию о swap
-    swap = psutil.swap_memory()
+    snapshot = snapshot or get_snapshot()
+    memory = snapshot.memory
+    swap = snapshot.swap
+    load_avg = snapshot.load_avg
+    per_cpu = ', '.join(f"{p:.0f}%" for p in snapshot.per_cpu)
+    cpu_temp = f"{snapshot.cpu_temp:.1f}°C" if snapshot.cpu_temp is not None else "N/A"
     
     info = f"""
 📊 *Статус системы Orange Pi Zero 3*
 
-*CPU (4 ядра):*
-• Использование: {cpu_percent}%
+*CPU ({len(snapshot.per_cpu)} ядра):*
+• Использование: {snapshot.cpu_percent}%
+• По ядрам: {per_cpu}
 • Температура: {cpu_temp}
 • Загрузка (1, 5, 15 мин): {load_avg[0]:.2f}, {load_avg[1]:.2f}, {load_avg[2]:.2f}
 
@@ -43,123 +103,111 @@ def get_system_info():
 • Архитектура: {platform.machine()}
 • Время работы: {get_uptime()}
 • Дата/время: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+• Данные обновлены: {format_age(snapshot)}
     """
     
     return info
 
-def get_disk_info():
-    """Информация о дисках с исправлением для внешних HDD"""
-    disks = []
+@perf.timed('monitor.memory_info')
+def get_memory_info(snapshot=None):
+    """Информация о памяти из последнего снимка"""
+    snapshot = snapshot or get_snapshot()
+    memory = snapshot.memory
+    swap = snapshot.swap
     
-    # Используем команду df для более точной информации
-    try:
-        import subprocess
-        result = subprocess.run(['df', '-h', '-T'], 
-                              capture_output=True, 
-                              text=True)
-        lines = result.stdout.strip().split('\n')
-        
-        # Пропускаем заголовок
-        for line in lines[1:]:
-            parts = line.split()
-            if len(parts) >= 7:
-                filesystem = parts[0]
-                fstype = parts[1]
-                size = parts[2]
-                used = parts[3]
-                avail = parts[4]
-                use_percent = parts[5]
-                mountpoint = parts[6]
-                
-                # Форматируем информацию
-                disks.append(
-                    f"*{filesystem}* (`{mountpoint}`)\n"
-                    f"• Тип: {fstype}\n"
-                    f"• Размер: {size}\n"
-                    f"• Использовано: {used} ({use_percent})\n"
-                    f"• Свободно: {avail}\n"
-                )
-    except:
-        # Fallback на psutil если команда не сработала
-        for partition in psutil.disk_partitions(all=True):
-            try:
-                usage = psutil.disk_usage(partition.mountpoint)
-                disks.append(
-                    f"*{partition.device}* (`{partition.mountpoint}`)\n"
-                    f"• Тип: {partition.fstype}\n"
-                    f"• Размер: {bytes_to_gb(usage.total):.1f} GB\n"
-                    f"• Использовано: {bytes_to_gb(usage.used):.1f} GB ({usage.percent}%)\n"
-                    f"• Свободно: {bytes_to_gb(usage.free):.1f} GB\n"
-                )
-            except:
-                continue
+    return f"""🧠 *Детальная информация о памяти:*
+
+*Оперативная память:*
+• Всего: {bytes_to_gb(memory.total):.1f} GB
+• Использовано: {bytes_to_gb(memory.used):.1f} GB ({memory.percent}%)
+• Свободно: {bytes_to_gb(memory.free):.1f} GB
+• Доступно: {bytes_to_gb(memory.available):.1f} GB
+• Буферы/кэш: {bytes_to_gb(getattr(memory, 'buffers', 0) + getattr(memory, 'cached', 0)):.1f} GB
+
+*SWAP (подкачка):*
+• Всего: {bytes_to_gb(swap.total):.1f} GB
+• Использовано: {bytes_to_gb(swap.used):.1f} GB ({swap.percent}%)
+• Свободно: {bytes_to_gb(swap.free):.1f} GB
+
+_Данные обновлены: {format_age(snapshot)}_"""
+
+@perf.timed('monitor.disk_info')
+def get_disk_info(snapshot=None):
+    """Информация о дисках из последнего снимка"""
+    snapshot = snapshot or get_snapshot()
+    disks = []
     
-    # Дополнительно проверяем конкретные точки монтирования
-    special_mounts = ['/mnt/cloud', '/media', '/mnt']
-    for mount in special_mounts:
-        if os.path.ismount(mount):
-            try:
-                usage = psutil.disk_usage(mount)
-                # Найдем устройство для этой точки монтирования
-                device = "Unknown"
-                for part in psutil.disk_partitions(all=True):
-                    if part.mountpoint == mount:
-                        device = part.device
-                        break
-                
-                disks.append(
-                    f"*{device}* (`{mount}`) [External]\n"
-                    f"• Размер: {bytes_to_gb(usage.total):.1f} GB\n"
-                    f"• Использовано: {bytes_to_gb(usage.used):.1f} GB ({usage.percent}%)\n"
-                    f"• Свободно: {bytes_to_gb(usage.free):.1f} GB\n"
-                )
-            except:
-                pass
+    for usage in snapshot.disks:
+        external = " [External]" if usage.external else ""
+        disks.append(
+            f"*{usage.device}* (`{usage.mountpoint}`){external}\n"
+            f"• Тип: {usage.fstype}\n"
+            f"• Размер: {format_size(usage.total)}\n"
+            f"• Использовано: {format_size(usage.used)} ({usage.percent}%)\n"
+            f"• Свободно: {format_size(usage.free)}\n"
+        )
     
     if not disks:
         return "💾 *Информация о дисках:*\n\nНет информации о дисках"
     
-    return "💾 *Информация о дисках:*\n\n" + "\n".join(disks)
+    return ("💾 *Информация о дисках:*\n\n" + "\n".join(disks) +
+            f"\n_Данные обновлены: {format_age(snapshot)}_")
 
-def get_detailed_disk_info():
-    """Детальная информация о дисках через lsblk"""
-    try:
-        import subprocess
-        
-        # Получаем информацию о блочных устройствах
-        result = subprocess.run(['lsblk', '-o', 'NAME,SIZE,TYPE,MOUNTPOINT,FSTYPE', '-r'],
-                              capture_output=True, text=True)
-        
-        devices = []
-        current_device = ""
-        
-        for line in result.stdout.strip().split('\n')[1:]:  # Пропускаем заголовок
-            parts = line.split()
-            if len(parts) >= 4:
-                name = parts[0]
-                size = parts[1]
-                dev_type = parts[2]
-                mountpoint = parts[3] if len(parts) > 3 else ""
-                fstype = parts[4] if len(parts) > 4 else ""
-                
-                if dev_type == "disk":
-                    current_device = name
-                    devices.append(f"\n*Диск {name}:* {size}")
-                elif dev_type == "part" and mountpoint:
-                    devices.append(f"  └─ {name}: {size} → `{mountpoint}` ({fstype})")
+@perf.timed('monitor.detailed_disk_info')
+def get_detailed_disk_info(snapshot=None):
+    """Детальная информация о дисках: топология /sys/block и точки монтирования"""
+    snapshot = snapshot or get_snapshot()
+    collector = get_disk_collector()
+    usage_by_mount = {usage.mountpoint: usage for usage in snapshot.disks}
+    fstype_by_device = {mount.device: mount.fstype for mount in collector.mounts}
+    
+    def mount_line(prefix, device_path):
+        mountpoints = collector.by_device.get(device_path, [])
+        if not mountpoints:
+            return None
+        targets = ", ".join(f"`{mount}`" for mount in mountpoints)
+        usage = next((usage_by_mount[m] for m in mountpoints if m in usage_by_mount), None)
+        used = f", занято {usage.percent}%" if usage else ""
+        return f"{prefix} → {targets} ({fstype_by_device.get(device_path, '?')}{used})"
+    
+    devices = []
+    for device in collector.block_devices:
+        details = [format_size(device.size)]
+        if device.model:
+            details.append(device.model)
+        if device.removable:
+            details.append("съемный")
+        devices.append(f"\n*Диск {device.name}:* {', '.join(details)}")
         
-        return "💽 *Детальная информация о дисках:*\n" + "\n".join(devices)
-    except Exception as e:
-        return f"💽 *Информация о дисках:*\n\nНе удалось получить детальную информацию: {str(e)}"
+        line = mount_line("  └─", f"/dev/{device.name}")
+        if line:
+            devices.append(line)
+        for part in device.partitions:
+            line = mount_line(f"  └─ {part.name}: {format_size(part.size)}", f"/dev/{part.name}")
+            if line:
+                devices.append(line)
+    
+    if not devices:
+        return "💽 *Информация о дисках:*\n\nБлочные устройства не найдены"
+    
+    return "💽 *Детальная информация о дисках:*\n" + "\n".join(devices)
 
-def get_network_info():
-    """Информация о сети"""
-    net_io = psutil.net_io_counters()
+def format_rate(bytes_per_second):
+    """Скорость передачи данных"""
+    return f"{format_size(bytes_per_second)}/s"
+
+@perf.timed('monitor.network_info')
+def get_network_info(snapshot=None):
+    """Информация о сети: скорости по интерфейсам и адреса"""
+    snapshot = snapshot or get_snapshot()
+    net_io = snapshot.net_io
+    collector = get_net_collector()
+    rates = {r.name: r for r in snapshot.net_rates}
     
     info = f"""
 🌐 *Сетевая информация*
 
-*Передача данных:*
+*Передача данных (с момента загрузки):*
 • Отправлено: {bytes_to_mb(net_io.bytes_sent):.1f} MB
 • Получено: {bytes_to_mb(net_io.bytes_recv):.1f} MB
 • Пакеты отправлено: {net_io.packets_sent:,}
@@ -168,12 +216,23 @@ def get_network_info():
 *Сетевые интерфейсы:*
     """
     
-    interfaces = psutil.net_if_addrs()
-    stats = psutil.net_if_stats()
+    stats, interfaces = collector.interfaces()
     
     for interface, addrs in interfaces.items():
         if interface in stats and stats[interface].isup:
             info += f"\n• *{interface}* (UP, скорость: {stats[interface].speed} Mbps):"
+            rate = rates.get(interface)
+            if rate:
+                info += (f"\n  ⬇️ {format_rate(rate.rx_bytes)} ({rate.rx_packets:.0f} pkt/s)"
+                         f"  ⬆️ {format_rate(rate.tx_bytes)} ({rate.tx_packets:.0f} pkt/s)")
+                if rate.errors or rate.drops:
+                    info += f"\n  ⚠️ Ошибки: {rate.errors:.1f}/s, потери: {rate.drops:.1f}/s"
+                averages = collector.averages(interface)
+                if averages:
+                    info += "\n  Среднее " + ", ".join(
+                        f"{window // 60}м: ⬇️ {format_rate(rx)} ⬆️ {format_rate(tx)}"
+                        for window, (rx, tx) in sorted(averages.items())
+                    )
             for addr in addrs:
                 if addr.family == 2:  # IPv4
                     info += f"\n  IPv4: `{addr.address}`"
@@ -184,65 +243,54 @@ def get_network_info():
                 elif addr.family == 17:  # MAC
                     info += f"\n  MAC: `{addr.address}`"
     
+    info += f"\n\n_Данные обновлены: {format_age(snapshot)}_"
     return info
 
-def get_services_status():
-    """Статус сервисов"""
+def render_services_status(checks, results, checked=None):
+    """Текст статуса сервисов: готовые результаты и еще идущие проверки.
+    checked - время каждой проверки (для результатов фонового планировщика)"""
     status_text = "📡 *Статус сервисов*\n\n"
+    now = time.time()
     
-    # Базовые сервисы для проверки
-    services_to_check = [
-        ('SSH (22)', 'localhost', 22),
-        ('HTTP (80)', 'localhost', 80),
-        ('HTTPS (443)', 'localhost', 443),
-    ]
-    
-    # Проверка портов
-    for name, host, port in services_to_check:
-        status = check_port(host, port)
-        status_text += f"{status} *{name}*: {'Онлайн' if '✅' in status else 'Офлайн'}\n"
+    for check in checks:
+        result = results.get(check)
+        if result is None:
+            status_text += f"⏳ *{check.name}*: проверка...\n"
+        else:
+            icon = "✅" if result.ok else "❌"
+            status_text += f"{icon} *{check.name}*: {result.text} ({result.latency * 1000:.0f} мс)\n"
+            if isinstance(result.details, HttpTiming):
+                status_text += f"    {format_timing(result.details)}\n"
+            if checked is not None:
+                status_text += f"    _проверено {format_seconds(max(0, now - checked[check]))} назад_\n"
     
-    # Проверка системных сервисов через systemctl
-    try:
-        import subprocess
-        services = ['ssh', 'apache2', 'mysql',]
-        
-        for service in services:
-            try:
-                result = subprocess.run(['systemctl', 'is-active', service], 
-                                      capture_output=True, text=True)
-                if result.stdout.strip() == 'active':
-                    status_text += f"✅ *{service}*: Запущен\n"
-                else:
-                    status_text += f"❌ *{service}*: Не запущен\n"
-            except:
-                pass
-    except:
-        pass
+    return status_text
+
+def get_cached_services_status():
+    """Статус сервисов из последних фоновых проверок - без запросов к сервисам"""
+    checks = get_checks()
+    results, checked = {}, {}
+    for timestamp, result in latest_results().values():
+        results[result.check] = result
+        checked[result.check] = timestamp
+    return render_services_status(checks, results, checked)
+
+@perf.timed('monitor.services_status')
+async def get_services_status(on_progress=None):
+    """Статус сервисов (все проверки идут параллельно под общим дедлайном)"""
+    checks = get_checks()
+    results = {}
     
-    # Проверка дополнительных сервисов из конфига
-    for name, address in config.Config.SERVICES.items():
-        try:
-            if address.startswith('http'):
-                response = requests.get(address, timeout=3)
-                if 200 <= response.status_code < 300:
-                    status_text += f"✅ *{name}*: Онлайн ({response.status_code})\n"
-                else:
-                    status_text += f"⚠️ *{name}*: Ошибка {response.status_code}\n"
-            elif ':' in address:
-                host, port = address.split(':')
-                port = int(port)
-                if check_port(host, port, timeout=2) == "✅":
-                    status_text += f"✅ *{name}*: Онлайн\n"
-                else:
-                    status_text += f"❌ *{name}*: Офлайн\n"
-        except Exception as e:
-            status_text += f"⚠️ *{name}*: Ошибка проверки\n"
+    async for result in iter_services_status(checks):
+        results[result.check] = result
+        if on_progress and len(results) < len(checks):
+            await on_progress(render_services_status(checks, results))
     
-    return status_text
+    return render_services_status(checks, results)
 
-def get_cpu_temperature():
-    """Получение температуры CPU для Orange Pi"""
+@perf.timed('monitor.read_cpu_temperature')
+def read_cpu_temperature():
+    """Температура CPU для Orange Pi в °C (или None)"""
     temp_paths = [
         '/sys/class/thermal/thermal_zone0/temp',
         '/sys/class/hwmon/hwmon0/temp1_input',
@@ -256,38 +304,29 @@ def get_cpu_temperature():
                     temp = float(f.read().strip())
                     if temp > 1000:  # Если в миллиградусах
                         temp = temp / 1000
-                    return f"{temp:.1f}°C"
+                    return temp
             except:
                 continue
     
     # Попробуем через команду
+    if not _VCGENCMD:
+        return None
     try:
         import subprocess
-        result = subprocess.run(['vcgencmd', 'measure_temp'], 
+        result = subprocess.run([_VCGENCMD, 'measure_temp'], 
                               capture_output=True, text=True)
         if result.returncode == 0:
             temp_str = result.stdout.strip()
-            temp = float(temp_str.split('=')[1].split("'")[0])
-            return f"{temp:.1f}°C"
+            return float(temp_str.split('=')[1].split("'")[0])
     except:
         pass
     
-    return "N/A"
+    return None
 
-def check_port(host, port, timeout=3):
-    """Проверка доступности порта"""
-    try:
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.settimeout(timeout)
-        
-        if sock.connect_ex((host, port)) == 0:
-            sock.close()
-            return "✅"
-        else:
-            sock.close()
-            return "❌"
-    except:
-        return "⚠️"
+def get_cpu_temperature():
+    """Получение температуры CPU для Orange Pi"""
+    temp = read_cpu_temperature()
+    return f"{temp:.1f}°C" if temp is not None else "N/A"
 
 def get_uptime():
     """Время работы системы"""
@@ -307,30 +346,96 @@ def bytes_to_gb(bytes_value):
     """Конвертация байтов в гигабайты"""
     return bytes_value / (1024 ** 3)
 
+def format_size(bytes_value):
+    """Размер в удобных единицах"""
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if bytes_value < 1024:
+            return f"{bytes_value:.1f} {unit}"
+        bytes_value /= 1024
+    return f"{bytes_value:.1f} TB"
+
 def bytes_to_mb(bytes_value):
     """Конвертация байтов в мегабайты"""
     return bytes_value / (1024 ** 2)
 
-def get_processes_info(top_n=10):
-    """Информация о процессах"""
-    try:
-        processes = []
-        for proc in psutil.process_iter(['pid', 'name', 'cpu_percent', 'memory_percent']):
-            try:
-                processes.append(proc.info)
-            except:
-                pass
-        
-        # Сортируем по использованию CPU
-        processes.sort(key=lambda x: x['cpu_percent'], reverse=True)
-        
-        info = "📈 *Топ процессов по CPU:*\n\n"
-        info += "PID | Имя | CPU% | Память%\n"
-        info += "-" * 40 + "\n"
-        
-        for proc in processes[:top_n]:
-            info += f"{proc['pid']:5} | {proc['name'][:15]:15} | {proc['cpu_percent']:5.1f} | {proc['memory_percent']:6.2f}\n"
-        
-        return info
-    except Exception as e:
-        return f"❌ Ошибка получения процессов: {str(e)}"
+@perf.timed('monitor.processes_info')
+def get_processes_info(sort='cpu', top_n=10):
+    """Топ процессов из фонового трекера"""
+    tracker = get_process_tracker()
+    if tracker.last_update is None:
+        # Сюда доходят только из пула потоков (экран агента): бот прогревает
+        # трекер в executor до вызова
+        tracker.update()
+    
+    info = f"📈 *Топ процессов по {SORT_KEYS[sort][1]}:*\n\n```\n"
+    info += f"{'PID':>7} {'Имя':15} {'CPU%':>5} {'Mem%':>5} {'IO/s':>8} {'Thr':>3}\n"
+    
+    for proc in tracker.top(sort, top_n):
+        info += (f"{proc.pid:>7} {proc.name[:15]:15} {proc.cpu:5.1f} {proc.mem:5.1f} "
+                 f"{format_size(proc.io):>8} {proc.threads:>3}\n")
+    
+    info += "```"
+    age = max(0, int(time.time() - tracker.last_update))
+    info += f"\n_Данные обновлены: {age} с назад_"
+    return info
+
+@perf.timed('monitor.process_history')
+def get_process_history(pid):
+    """История загрузки одного процесса"""
+    sample, history = get_process_tracker().process_history(pid)
+    if sample is None:
+        return f"🔍 Процесс {pid} завершился или еще не отслеживается"
+    
+    cpu = [h[1] for h in history]
+    mem = [h[2] for h in history]
+    span = int(history[-1][0] - history[0][0]) if len(history) > 1 else 0
+    
+    return f"""🔍 *Процесс {pid}* (`{sample.name}`)
+
+*Сейчас:*
+• CPU: {sample.cpu:.1f}%
+• Память: {sample.mem:.2f}%
+• Ввод-вывод: {format_size(sample.io)}/s
+• Потоков: {sample.threads}
+
+*История ({len(history)} сэмплов, {span // 60} мин):*
+• CPU min / avg / max: {min(cpu):.1f} / {sum(cpu) / len(cpu):.1f} / {max(cpu):.1f}%
+• Память min / max: {min(mem):.2f} / {max(mem):.2f}%"""
+
+def snapshot_summary(snapshot=None):
+    """Краткая сводка снимка в виде JSON-совместимого словаря (для агентов)"""
+    snapshot = snapshot or get_snapshot()
+    return {
+        'host': platform.node(),
+        'timestamp': snapshot.timestamp,
+        'cpu': snapshot.cpu_percent,
+        'per_cpu': list(snapshot.per_cpu),
+        'load': list(snapshot.load_avg),
+        'mem': snapshot.memory.percent,
+        'mem_total': snapshot.memory.total,
+        'swap': snapshot.swap.percent,
+        'temp': snapshot.cpu_temp,
+        'disks': [[d.mountpoint, d.percent, d.total] for d in snapshot.disks],
+        'uptime': get_uptime(),
+        'services': services_summary(),
+    }
+
+def services_summary():
+    """Последние результаты фоновых проверок сервисов (с фазами HTTP запроса)"""
+    summary = {}
+    for name, (checked, result) in latest_results().items():
+        entry = {'ok': result.ok, 'text': result.text, 'latency': result.latency, 'checked': checked}
+        if isinstance(result.details, HttpTiming):
+            entry.update(result.details._asdict())
+        summary[name] = entry
+    return summary
+
+# Экраны мониторинга, которые можно запросить и у удаленного агента
+VIEWS = {
+    'system': get_system_info,
+    'memory': get_memory_info,
+    'disk': get_disk_info,
+    'disk_detailed': get_detailed_disk_info,
+    'network': get_network_info,
+    'processes': get_processes_info,
+}
@@ -0,0 +1,122 @@
+import threading
+import time
+from collections import deque, namedtuple
+import psutil
+import config
+
+# Скорости интерфейса за последний интервал (в секунду)
+InterfaceRates = namedtuple('InterfaceRates', [
+    'name', 'rx_bytes', 'tx_bytes', 'rx_packets', 'tx_packets', 'errors', 'drops'
+])
+
+# Окна средних значений (секунды)
+AVERAGE_WINDOWS = (60, 300, 900)
+
+def counter_delta(new, old):
+    """Прирост счетчика с учетом переполнения 32/64-битных счетчиков ядра"""
+    if new >= old:
+        return new - old
+    if old < 2 ** 32:
+        delta = new + 2 ** 32 - old
+        if delta < 2 ** 31:
+            return delta
+    # Счетчик сброшен (интерфейс пересоздан) - считаем с нуля
+    return new
+
+class NetworkCollector:
+    """Скорости по интерфейсам на фоновом тике
+
+    Кроме мгновенных скоростей хранится кольцо накопленных (с учетом
+    переполнения) байтов за 15 минут, из которого считаются средние за 1/5/15 мин.
+    Адреса интерфейсов меняются редко и перечитываются, только когда
+    изменилось net_if_stats (up/down, скорость, MTU).
+    """
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.prev = None          # (ts, счетчики pernic)
+        self.totals = {}          # имя -> [rx, tx] накопленные байты
+        self.rates = ()
+        self.ring = deque(maxlen=max(AVERAGE_WINDOWS) // config.Config.SAMPLER_INTERVAL + 2)
+        self.stats = {}
+        self.addresses = {}
+        self._stats_key = None
+    
+    def sample(self, now=None):
+        """Новый сэмпл счетчиков; возвращает кортеж InterfaceRates"""
+        now = now or time.time()
+        counters = psutil.net_io_counters(pernic=True)
+        
+        with self.lock:
+            rates = []
+            if self.prev is not None:
+                prev_ts, prev = self.prev
+                elapsed = now - prev_ts
+                for name, c in counters.items():
+                    p = prev.get(name)
+                    if p is None or elapsed <= 0:
+                        continue
+                    rx = counter_delta(c.bytes_recv, p.bytes_recv)
+                    tx = counter_delta(c.bytes_sent, p.bytes_sent)
+                    total = self.totals.setdefault(name, [0, 0])
+                    total[0] += rx
+                    total[1] += tx
+                    rates.append(InterfaceRates(
+                        name=name,
+                        rx_bytes=rx / elapsed,
+                        tx_bytes=tx / elapsed,
+                        rx_packets=counter_delta(c.packets_recv, p.packets_recv) / elapsed,
+                        tx_packets=counter_delta(c.packets_sent, p.packets_sent) / elapsed,
+                        errors=(counter_delta(c.errin, p.errin) + counter_delta(c.errout, p.errout)) / elapsed,
+                        drops=(counter_delta(c.dropin, p.dropin) + counter_delta(c.dropout, p.dropout)) / elapsed
+                    ))
+            
+            # Интерфейсы, которые пропали, больше не учитываем
+            for name in list(self.totals):
+                if name not in counters:
+                    del self.totals[name]
+            
+            self.prev = (now, counters)
+            self.rates = tuple(rates)
+            self.ring.append((now, {name: tuple(total) for name, total in self.totals.items()}))
+            return self.rates
+    
+    def averages(self, name):
+        """Средние скорости (rx, tx) интерфейса за окна AVERAGE_WINDOWS"""
+        with self.lock:
+            if not self.ring:
+                return {}
+            now, latest = self.ring[-1]
+            if name not in latest:
+                return {}
+            result = {}
+            for window in AVERAGE_WINDOWS:
+                # Самая старая точка, попадающая в окно; окно без достаточной
+                # истории (сразу после запуска) не показываем
+                for ts, totals in self.ring:
+                    if now - ts <= window and name in totals and now - ts >= window * 0.9:
+                        rx = (latest[name][0] - totals[name][0]) / (now - ts)
+                        tx = (latest[name][1] - totals[name][1]) / (now - ts)
+                        result[window] = (rx, tx)
+                        break
+            return result
+    
+    def interfaces(self):
+        """(net_if_stats, адреса); адреса перечитываются только при изменении статистики"""
+        stats = psutil.net_if_stats()
+        key = {name: (s.isup, s.speed, s.mtu) for name, s in stats.items()}
+        with self.lock:
+            if key != self._stats_key:
+                self.addresses = psutil.net_if_addrs()
+                self._stats_key = key
+            self.stats = stats
+            return stats, self.addresses
+
+_collector = None
+
+def get_collector():
+    """Общий сборщик сетевой статистики"""
+    global _collector
+    if _collector is None:
+        _collector = NetworkCollector()
+    return _collector
@@ -0,0 +1,180 @@
+import codecs
+import gzip
+import threading
+import uuid
+from collections import OrderedDict, deque, namedtuple
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+import config
+
+# Сохраненный вывод команды. pages - страницы, каждая сжата отдельным gzip-членом:
+# страница распаковывается независимо, а склейка всех членов - корректный .gz файл.
+# skipped - сколько байт из середины вывода не сохранено (см. OUTPUT_ENTRY_BYTES)
+OutputEntry = namedtuple('OutputEntry', ['command', 'title', 'pages', 'size', 'compressed', 'actions', 'skipped'],
+                         defaults=(0,))
+
+# run_id -> OutputEntry, самые давно использованные вытесняются первыми
+_outputs = OrderedDict()
+_outputs_bytes = 0
+
+# store_file вызывается из пула потоков, поэтому кэши меняются под блокировкой
+_lock = threading.Lock()
+
+# Отрендеренные страницы: (run_id, номер) -> текст
+_page_cache = OrderedDict()
+
+def split_pages(chunks, page_chars=None):
+    """Нарезка потока текста на страницы по границам строк"""
+    page_chars = page_chars or config.Config.OUTPUT_PAGE_CHARS
+    buffer = ''
+    for chunk in chunks:
+        buffer += chunk
+        start = 0
+        while len(buffer) - start > page_chars:
+            cut = buffer.rfind('\n', start, start + page_chars)
+            cut = cut + 1 if cut > start else start + page_chars
+            yield buffer[start:cut]
+            start = cut
+        buffer = buffer[start:]
+    if buffer:
+        yield buffer
+
+def _compress_pages(text_chunks):
+    """Сжать страницы с ограничением OUTPUT_ENTRY_BYTES на вывод
+
+    Сохраняются первые и последние страницы (по половине лимита), середина
+    заменяется одной страницей с пометкой о пропуске. Возвращает
+    (страницы, исходный размер, пропущено байт).
+    """
+    half = config.Config.OUTPUT_ENTRY_BYTES // 2
+    head, tail = [], deque()
+    head_bytes = tail_bytes = 0
+    size = skipped = skipped_pages = 0
+    for page in split_pages(text_chunks):
+        data = page.encode('utf-8')
+        size += len(data)
+        packed = gzip.compress(data, compresslevel=6)
+        if not tail and head_bytes + len(packed) <= half:
+            head.append(packed)
+            head_bytes += len(packed)
+            continue
+        tail.append((packed, len(data)))
+        tail_bytes += len(packed)
+        while tail_bytes > half:
+            old, old_size = tail.popleft()
+            tail_bytes -= len(old)
+            skipped += old_size
+            skipped_pages += 1
+    
+    pages = head
+    if skipped:
+        note = f"\n... пропущено {skipped_pages} стр. ({skipped / 1024:.0f} KB) из середины вывода ...\n"
+        pages.append(gzip.compress(note.encode('utf-8')))
+    pages.extend(packed for packed, _ in tail)
+    if not pages:
+        pages.append(gzip.compress(b''))
+    return pages, size, skipped
+
+def _store(command, title, text_chunks, actions):
+    """Сжать страницы и положить вывод в LRU кэш"""
+    global _outputs_bytes
+    pages, size, skipped = _compress_pages(text_chunks)
+    compressed = sum(len(p) for p in pages)
+    run_id = uuid.uuid4().hex[:8]
+    
+    with _lock:
+        _outputs[run_id] = OutputEntry(command, title, pages, size, compressed, tuple(actions or ()), skipped)
+        _outputs_bytes += compressed
+        
+        # Ограничение кэша по числу выводов и суммарному сжатому объему
+        while _outputs and (len(_outputs) > config.Config.OUTPUT_CACHE_ENTRIES or
+                            _outputs_bytes > config.Config.OUTPUT_CACHE_BYTES):
+            old_id, old = _outputs.popitem(last=False)
+            _outputs_bytes -= old.compressed
+            for key in [k for k in _page_cache if k[0] == old_id]:
+                del _page_cache[key]
+    return run_id
+
+def store_text(command, text, title=None, actions=None):
+    """Сохранить готовый текст вывода; возвращает run_id"""
+    return _store(command, title, [text], actions)
+
+def store_file(command, f, prefix='', title=None, actions=None):
+    """Сохранить вывод из бинарного файла (читается кусками, целиком в память не попадает)
+
+    Сжатие занимает заметное время, поэтому из event loop вызывать через run_in_executor.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    
+    def chunks():
+        if prefix:
+            yield prefix
+        while True:
+            data = f.read(65536)
+            if not data:
+                break
+            yield decoder.decode(data)
+        yield decoder.decode(b'', final=True)
+    
+    return _store(command, title, chunks(), actions)
+
+def get_output(run_id):
+    """Сохраненный вывод (и отметка об использовании для LRU)"""
+    with _lock:
+        entry = _outputs.get(run_id)
+        if entry is not None:
+            _outputs.move_to_end(run_id)
+    return entry
+
+def render_page(run_id, page):
+    """Текст страницы вывода с заголовком; None, если вывод вытеснен из кэша"""
+    entry = get_output(run_id)
+    if entry is None:
+        return None
+    page = max(0, min(page, len(entry.pages) - 1))
+    
+    key = (run_id, page)
+    with _lock:
+        text = _page_cache.get(key)
+        if text is not None:
+            _page_cache.move_to_end(key)
+    if text is None:
+        body = gzip.decompress(entry.pages[page]).decode('utf-8', errors='replace')
+        counter = f" (стр. {page + 1}/{len(entry.pages)})" if len(entry.pages) > 1 else ""
+        header = entry.title or f"*Команда:* `{entry.command}`"
+        text = f"{header}\n\n*Результат{counter}:*\n```\n{body}\n```"
+        with _lock:
+            _page_cache[key] = text
+            while len(_page_cache) > config.Config.OUTPUT_PAGE_CACHE:
+                _page_cache.popitem(last=False)
+    return text
+
+def page_keyboard(run_id, page):
+    """Кнопки ◀ ▶, скачивание .gz для больших выводов и действия экрана"""
+    entry = get_output(run_id)
+    keyboard = []
+    if entry is None:
+        return None
+    
+    total = len(entry.pages)
+    if total > 1:
+        keyboard.append([
+            InlineKeyboardButton("◀", callback_data=f'page:{run_id}:{(page - 1) % total}'),
+            InlineKeyboardButton(f"{page + 1}/{total}", callback_data=f'page:{run_id}:{page}'),
+            InlineKeyboardButton("▶", callback_data=f'page:{run_id}:{(page + 1) % total}'),
+        ])
+    if entry.size > config.Config.OUTPUT_DOCUMENT_THRESHOLD:
+        label = "Скачать без середины" if entry.skipped else "Скачать целиком"
+        keyboard.append([InlineKeyboardButton(
+            f"📦 {label} ({(entry.size - entry.skipped) / 1024:.0f} KB, .gz)",
+            callback_data=f'gz:{run_id}'
+        )])
+    for label, callback in entry.actions:
+        keyboard.append([InlineKeyboardButton(label, callback_data=callback)])
+    return InlineKeyboardMarkup(keyboard) if keyboard else None
+
+def gzip_document(run_id):
+    """Сохраненный вывод одним .gz файлом (склейка уже сжатых страниц, без пересжатия)"""
+    entry = get_output(run_id)
+    if entry is None:
+        return None
+    return b''.join(entry.pages)
@@ -0,0 +1,200 @@
+import asyncio
+import logging
+import os
+import time
+from array import array
+from bisect import bisect_left
+from functools import wraps
+import config
+
+logger = logging.getLogger(__name__)
+
+# Общие для всех гистограмм границы корзин (секунды): от 1 мкс до ~100 с,
+# каждая следующая на 15% больше. Погрешность перцентиля - не больше 15%
+BUCKET_FACTOR = 1.15
+BOUNDS = []
+_bound = 1e-6
+while _bound < 100:
+    BOUNDS.append(_bound)
+    _bound *= BUCKET_FACTOR
+BOUNDS = tuple(BOUNDS)
+
+# Границы для экспорта в Prometheus: постоянный набор из ~15 корзин, чтобы
+# ряды le не появлялись и не пропадали между опросами. Берутся ближайшие
+# внутренние границы - тогда накопленные счетчики точные
+EXPORT_TARGETS = (1e-5, 1e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+EXPORT_INDEXES = tuple(sorted({
+    min(range(len(BOUNDS)), key=lambda i: abs(BOUNDS[i] - target)) for target in EXPORT_TARGETS
+}))
+
+class Histogram:
+    """Гистограмма длительностей с фиксированными корзинами.
+
+    observe() - один bisect и инкремент, без блокировок: сборщики вызываются и
+    из пула потоков, потеря редкого отсчета при гонке допустима.
+    """
+
+    __slots__ = ('name', 'counts', 'count', 'sum', 'max')
+
+    def __init__(self, name):
+        self.name = name
+        self.counts = array('L', [0]) * (len(BOUNDS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(BOUNDS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, p):
+        """Верхняя граница корзины, в которую попадает p-й перцентиль"""
+        if not self.count:
+            return 0.0
+        rank = p * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(BOUNDS[i], self.max) if i < len(BOUNDS) else self.max
+        return self.max
+
+_histograms = {}
+_counters = {}
+
+def histogram(name):
+    """Гистограмма по имени (создается при первом обращении)"""
+    hist = _histograms.get(name)
+    if hist is None:
+        hist = _histograms[name] = Histogram(name)
+    return hist
+
+def observe(name, seconds):
+    histogram(name).observe(seconds)
+
+def count(name, n=1):
+    """Увеличить счетчик"""
+    _counters[name] = _counters.get(name, 0) + n
+
+def timed(name):
+    """Декоратор: время каждого вызова функции (обычной или async) в гистограмму name"""
+    def decorator(func):
+        hist = histogram(name)
+        if asyncio.iscoroutinefunction(func):
+            @wraps(func)
+            async def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    hist.observe(time.perf_counter() - started)
+        else:
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    hist.observe(time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+class timer:
+    """Контекстный менеджер: with timer('name'): ..."""
+
+    __slots__ = ('hist', 'started')
+
+    def __init__(self, name):
+        self.hist = histogram(name)
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.hist.observe(time.perf_counter() - self.started)
+
+def format_duration(seconds):
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.0f}µs"
+    if seconds < 1:
+        return f"{seconds * 1e3:.1f}ms"
+    return f"{seconds:.2f}s"
+
+def format_perf(prefix=''):
+    """Таблица гистограмм и счетчиков для /perf"""
+    names = sorted(name for name, hist in _histograms.items() if hist.count and name.startswith(prefix))
+    if not names and not _counters:
+        return "⏱ *Производительность*\n\nЕще нет данных"
+
+    lines = [f"{'Операция':24} {'N':>6} {'p50':>7} {'p95':>7} {'p99':>7}"]
+    for name in names:
+        hist = _histograms[name]
+        lines.append(
+            f"{name[:24]:24} {hist.count:6} "
+            + " ".join(f"{format_duration(hist.percentile(p)):>7}" for p in (0.5, 0.95, 0.99))
+        )
+    counters = [f"{name}: {value}" for name, value in sorted(_counters.items()) if name.startswith(prefix)]
+
+    text = "⏱ *Производительность*\n\n```\n" + "\n".join(lines) + "\n```"
+    if counters:
+        text += "\n*Счетчики:*\n```\n" + "\n".join(counters) + "\n```"
+    return text
+
+def _metric_name(name):
+    return 'serverbot_' + ''.join(c if c.isalnum() else '_' for c in name)
+
+def render_prometheus():
+    """Все метрики в текстовом формате Prometheus"""
+    lines = []
+    for name, hist in sorted(_histograms.items()):
+        metric = _metric_name(name) + '_seconds'
+        lines.append(f"# TYPE {metric} histogram")
+        cumulative = 0
+        start = 0
+        for index in EXPORT_INDEXES:
+            cumulative += sum(hist.counts[start:index + 1])
+            start = index + 1
+            lines.append(f'{metric}_bucket{{le="{BOUNDS[index]:.6g}"}} {cumulative}')
+        lines.append(f'{metric}_bucket{{le="+Inf"}} {hist.count}')
+        lines.append(f"{metric}_sum {hist.sum:.6f}")
+        lines.append(f"{metric}_count {hist.count}")
+    for name, value in sorted(_counters.items()):
+        metric = _metric_name(name) + '_total'
+        lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric} {value}")
+    return "\n".join(lines) + "\n"
+
+def write_prometheus_file(path=None):
+    """Записать метрики в файл атомарно (для node_exporter textfile collector)"""
+    path = path or config.Config.PERF_PROMETHEUS_FILE
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w') as f:
+        f.write(render_prometheus())
+    os.replace(tmp, path)
+
+async def _serve_metrics(reader, writer):
+    try:
+        await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), 5)
+        body = render_prometheus().encode()
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: text/plain; version=0.0.4\r\n"
+            b"Content-Length: " + str(len(body)).encode() + b"\r\n"
+            b"Connection: close\r\n\r\n" + body
+        )
+        await writer.drain()
+    except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+async def start_metrics_server(host='127.0.0.1', port=None):
+    """HTTP-эндпоинт с метриками для Prometheus (любой путь отдает метрики)"""
+    port = port or config.Config.PERF_PROMETHEUS_PORT
+    server = await asyncio.start_server(_serve_metrics, host, port)
+    logger.info(f"Метрики Prometheus: http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,130 @@
+import heapq
+import os
+import threading
+import time
+from collections import deque, namedtuple
+from operator import attrgetter
+import psutil
+import config
+from procfs import CLOCK_TICKS, PAGE_SIZE
+
+# Состояние процесса на последнем сэмпле
+ProcessSample = namedtuple('ProcessSample', ['pid', 'name', 'cpu', 'mem', 'io', 'threads'])
+
+# Ключи сортировки: имя -> (поле ProcessSample, подпись)
+SORT_KEYS = {
+    'cpu': ('cpu', 'CPU'),
+    'mem': ('mem', 'памяти'),
+    'io': ('io', 'вводу-выводу'),
+    'threads': ('threads', 'потокам'),
+}
+
+def _read(path):
+    """Быстрое чтение небольшого файла /proc (os.read без буферизации)"""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        return os.read(fd, 4096)
+    finally:
+        os.close(fd)
+
+class ProcessTracker:
+    """Таблица процессов между сэмплами
+
+    Для каждого PID хранится состояние с прошлого сэмпла (тики CPU, байты IO,
+    время старта), поэтому загрузка считается как разница за интервал, а не
+    0.0, как у свежего psutil.Process. Данные читаются прямо из
+    /proc/<pid>/stat и /proc/<pid>/io - это один-два read на процесс.
+    Новые PID добавляются, завершившиеся удаляются, для каждого процесса
+    хранится короткая история (ts, cpu, mem).
+    """
+    
+    def __init__(self, history=None):
+        self.history_size = history or config.Config.PROCESS_HISTORY
+        self.state = {}        # pid -> (starttime, тики CPU, байты IO)
+        self.samples = {}      # pid -> ProcessSample
+        self.history = {}      # pid -> deque[(ts, cpu, mem)]
+        self.last_update = None
+        # lock - короткий, на подмену данных (его берут и читатели из event loop);
+        # update_lock - на весь обход /proc, чтобы два обновления не шли разом
+        self.lock = threading.Lock()
+        self.update_lock = threading.Lock()
+    
+    def update(self):
+        """Один сэмпл всех процессов (вызывается из фоновой задачи).
+        Обход /proc идет без общей блокировки: новые словари строятся рядом
+        и подменяются целиком"""
+        with self.update_lock:
+            now = time.time()
+            elapsed = now - self.last_update if self.last_update else None
+            mem_total = psutil.virtual_memory().total
+            pids = [int(entry) for entry in os.listdir('/proc') if entry.isdigit()]
+            # state меняет только update (под update_lock) - читаем без lock
+            old_state = self.state
+            state, samples = {}, {}
+            reused = set()
+            
+            for pid in pids:
+                try:
+                    stat = _read(f'/proc/{pid}/stat')
+                except OSError:
+                    continue
+                try:
+                    io = _read(f'/proc/{pid}/io').split()
+                    io_total = int(io[9]) + int(io[11])  # read_bytes + write_bytes
+                except (OSError, IndexError, ValueError):
+                    io_total = None  # чужой процесс без прав
+                
+                # Имя в скобках может содержать пробелы - режем по последней ')'
+                name_end = stat.rfind(b')')
+                name = stat[stat.find(b'(') + 1:name_end].decode(errors='replace')
+                fields = stat[name_end + 2:].split()
+                ticks = int(fields[11]) + int(fields[12])
+                threads = int(fields[17])
+                starttime = int(fields[19])
+                rss = int(fields[21]) * PAGE_SIZE
+                
+                prev = old_state.get(pid)
+                if prev is not None and prev[0] != starttime:
+                    reused.add(pid)  # PID переиспользован другим процессом
+                    prev = None
+                
+                cpu = io_rate = 0.0
+                if prev is not None and elapsed:
+                    cpu = (ticks - prev[1]) / CLOCK_TICKS / elapsed * 100
+                    if io_total is not None and prev[2] is not None:
+                        io_rate = max(0, io_total - prev[2]) / elapsed
+                state[pid] = (starttime, ticks, io_total)
+                samples[pid] = ProcessSample(pid, name, cpu, rss / mem_total * 100, io_rate, threads)
+            
+            with self.lock:
+                # История: у завершившихся и переиспользованных PID - заново
+                history = {
+                    pid: self.history[pid] for pid in samples
+                    if pid in self.history and pid not in reused
+                }
+                for pid, sample in samples.items():
+                    if pid not in history:
+                        history[pid] = deque(maxlen=self.history_size)
+                    history[pid].append((now, sample.cpu, sample.mem))
+                self.state, self.samples, self.history = state, samples, history
+                self.last_update = now
+    
+    def top(self, key='cpu', n=10):
+        """Топ-N процессов по ключу из SORT_KEYS (heapq, без полной сортировки)"""
+        field = attrgetter(SORT_KEYS[key][0])
+        with self.lock:
+            return heapq.nlargest(n, self.samples.values(), key=field)
+    
+    def process_history(self, pid):
+        """Последний сэмпл процесса и его история"""
+        with self.lock:
+            return self.samples.get(pid), list(self.history.get(pid, ()))
+
+_tracker = None
+
+def get_tracker():
+    """Общий трекер процессов"""
+    global _tracker
+    if _tracker is None:
+        _tracker = ProcessTracker()
+    return _tracker
@@ -0,0 +1,172 @@
+import glob
+import os
+import platform
+import pwd
+import threading
+from datetime import datetime
+
+# Открытые файлы /proc и /sys: для этих файлов повторное чтение после seek(0)
+# возвращает свежие данные, поэтому open() не нужен на каждый вызов
+_handles = {}
+_handles_lock = threading.Lock()
+
+# Частота тиков ядра и размер страницы для разбора /proc/<pid>/stat
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK')
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+
+# Имена ядер ARM по "CPU part" из /proc/cpuinfo (как в lscpu)
+ARM_PARTS = {
+    '0xc07': 'Cortex-A7',
+    '0xc0f': 'Cortex-A15',
+    '0xd03': 'Cortex-A53',
+    '0xd04': 'Cortex-A35',
+    '0xd05': 'Cortex-A55',
+    '0xd07': 'Cortex-A57',
+    '0xd08': 'Cortex-A72',
+    '0xd09': 'Cortex-A73',
+    '0xd0a': 'Cortex-A75',
+    '0xd0b': 'Cortex-A76',
+}
+
+_users = {}
+
+def read_file(path):
+    """Прочитать файл /proc или /sys через переиспользуемый дескриптор"""
+    with _handles_lock:
+        f = _handles.get(path)
+        if f is None:
+            f = _handles[path] = open(path, 'r')
+        try:
+            f.seek(0)
+            return f.read()
+        except OSError:
+            # Файл пропал (например, отключили датчик) - забываем дескриптор
+            f.close()
+            del _handles[path]
+            raise
+
+def meminfo_head(lines=20):
+    """Аналог `cat /proc/meminfo | head -20`"""
+    return ''.join(read_file('/proc/meminfo').splitlines(keepends=True)[:lines])
+
+def temperature():
+    """Аналог `cat /sys/class/thermal/thermal_zone*/temp | head -1`"""
+    for path in sorted(glob.glob('/sys/class/thermal/thermal_zone*/temp')):
+        try:
+            return read_file(path)
+        except OSError:
+            continue
+    return ''
+
+def cpu_info():
+    """Аналог `lscpu | grep -E "Model name|CPU\\(s\\)|Architecture"`"""
+    cpuinfo = read_file('/proc/cpuinfo')
+    model = None
+    for line in cpuinfo.splitlines():
+        key, _, value = line.partition(':')
+        key, value = key.strip(), value.strip()
+        if key == 'model name':
+            model = value
+            break
+        if key == 'CPU part' and model is None:
+            model = ARM_PARTS.get(value.lower(), value)
+    
+    online = read_file('/sys/devices/system/cpu/online').strip()
+    rows = [
+        ('Architecture', platform.machine()),
+        ('CPU(s)', str(os.cpu_count())),
+        ('On-line CPU(s) list', online),
+    ]
+    if model:
+        rows.append(('Model name', model))
+    return ''.join(f"{name + ':':<41}{value}\n" for name, value in rows)
+
+def format_uptime_duration(seconds):
+    """Длительность в формате uptime: '2 days,  3:04', '5 min'"""
+    minutes = int(seconds // 60)
+    days, minutes = divmod(minutes, 1440)
+    hours, minutes = divmod(minutes, 60)
+    text = f"{days} day{'s' if days != 1 else ''}, " if days else ''
+    if hours:
+        return text + f"{hours:2}:{minutes:02}"
+    return text + f"{minutes} min"
+
+def count_users():
+    """Число сеансов пользователей из utmp (как считает uptime)"""
+    try:
+        import psutil
+        return len(psutil.users())
+    except Exception:
+        return 0
+
+def uptime():
+    """Аналог `uptime`"""
+    seconds = float(read_file('/proc/uptime').split()[0])
+    load = read_file('/proc/loadavg').split()[:3]
+    users = count_users()
+    return (
+        f" {datetime.now().strftime('%H:%M:%S')} up {format_uptime_duration(seconds)},  "
+        f"{users} user{'s' if users != 1 else ''},  "
+        f"load average: {', '.join(load)}\n"
+    )
+
+def _user_name(uid):
+    name = _users.get(uid)
+    if name is None:
+        try:
+            name = pwd.getpwuid(uid).pw_name
+        except KeyError:
+            name = str(uid)
+        _users[uid] = name
+    return name
+
+def read_processes():
+    """Процессы из /proc: (user, pid, %cpu, %mem, vsz KB, rss KB, state, command)
+
+    %CPU считается как у ps: процессорное время за все время жизни процесса.
+    """
+    uptime_seconds = float(read_file('/proc/uptime').split()[0])
+    mem_total_kb = int(read_file('/proc/meminfo').split(None, 2)[1])
+    
+    processes = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat', 'rb') as f:
+                stat = f.read().decode(errors='replace')
+            with open(f'/proc/{entry}/cmdline', 'rb') as f:
+                cmdline = f.read().rstrip(b'\0').replace(b'\0', b' ').decode(errors='replace')
+            uid = os.stat(f'/proc/{entry}').st_uid
+        except OSError:
+            continue  # процесс завершился во время обхода
+        
+        # Имя процесса в скобках может содержать пробелы - режем по последней ')'
+        name_end = stat.rfind(')')
+        name = stat[stat.find('(') + 1:name_end]
+        fields = stat[name_end + 2:].split()
+        state = fields[0]
+        cpu_time = (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+        elapsed = uptime_seconds - int(fields[19]) / CLOCK_TICKS
+        vsz_kb = int(fields[20]) // 1024
+        rss_kb = int(fields[21]) * PAGE_SIZE // 1024
+        
+        cpu = cpu_time / elapsed * 100 if elapsed > 0 else 0.0
+        mem = rss_kb / mem_total_kb * 100 if mem_total_kb else 0.0
+        processes.append((_user_name(uid), int(entry), cpu, mem, vsz_kb, rss_kb, state,
+                          cmdline or f'[{name}]'))
+    return processes
+
+def format_processes(processes):
+    lines = [f"{'USER':<10} {'PID':>7} {'%CPU':>4} {'%MEM':>4} {'VSZ':>8} {'RSS':>7} STAT COMMAND"]
+    for user, pid, cpu, mem, vsz, rss, state, command in processes:
+        lines.append(f"{user[:10]:<10} {pid:>7} {cpu:4.1f} {mem:4.1f} {vsz:>8} {rss:>7} {state:<4} {command}")
+    return '\n'.join(lines) + '\n'
+
+def top_processes(limit=14):
+    """Аналог `ps aux --sort=-%cpu | head -15`"""
+    return format_processes(sorted(read_processes(), key=lambda p: p[2], reverse=True)[:limit])
+
+def top_memory(limit=14):
+    """Аналог `ps aux --sort=-%mem | head -15`"""
+    return format_processes(sorted(read_processes(), key=lambda p: p[3], reverse=True)[:limit])
@@ -0,0 +1,154 @@
+import logging
+import time
+from collections import namedtuple
+from functools import partial
+import perf
+from screens import Screen, show
+
+logger = logging.getLogger(__name__)
+
+class Route:
+    """Маршрут кнопки: обработчик, поля данных и готовая цепочка middleware"""
+
+    __slots__ = ('name', 'handler', 'payload', 'converters', 'chain', 'timings')
+
+    def __init__(self, name, handler, fields, middleware):
+        self.name = name
+        self.handler = handler
+        self.payload = namedtuple('Payload', list(fields)) if fields else None
+        self.converters = tuple(fields.values())
+        self.timings = perf.histogram(f'button.{name}')
+        # Цепочка собирается один раз: middleware[0](middleware[1](...(handler)))
+        chain = self.call
+        for mw in reversed(middleware):
+            chain = partial(mw, chain, self)
+        self.chain = chain
+
+    def parse(self, rest):
+        """Разобрать данные кнопки в типизированный payload (None - данные некорректны)"""
+        if self.payload is None:
+            return () if not rest else None
+        parts = rest.split(':', len(self.converters) - 1)
+        if len(parts) != len(self.converters):
+            return None
+        try:
+            return self.payload(*(convert(part) for convert, part in zip(self.converters, parts)))
+        except ValueError:
+            return None
+
+    async def call(self, query, context, payload):
+        result = await self.handler(query, context, payload)
+        # Обработчик может вернуть готовый экран - его показывает роутер
+        if isinstance(result, Screen):
+            await show(query, result)
+        return result
+
+class Router:
+    """Маршрутизация callback_data: точное имя или "имя:поле:поле" через словарь,
+    префиксы ('quick_...') - перебором короткого списка"""
+
+    def __init__(self, middleware=()):
+        self.middleware = list(middleware)
+        self.routes = {}
+        self.prefixes = []
+
+    def route(self, key, middleware=(), **fields):
+        """Декоратор: кнопка key или key:<поля> (поля - имя=тип в порядке следования)"""
+        def decorator(handler):
+            self.routes[key] = Route(key, handler, fields, self.middleware + list(middleware))
+            return handler
+        return decorator
+
+    def prefix(self, prefix, field='name', middleware=()):
+        """Декоратор: кнопки вида <prefix><значение>, значение - одно строковое поле"""
+        def decorator(handler):
+            route = Route(prefix, handler, {field: str}, self.middleware + list(middleware))
+            self.prefixes.append((prefix, route))
+            return handler
+        return decorator
+
+    def add(self, key, handler, middleware=(), **fields):
+        self.route(key, middleware, **fields)(handler)
+
+    def resolve(self, data):
+        """Найти маршрут и payload для callback_data"""
+        name, _, rest = data.partition(':')
+        route = self.routes.get(name)
+        if route is not None:
+            return route, route.parse(rest)
+        for prefix, route in self.prefixes:
+            if data.startswith(prefix):
+                return route, route.parse(data[len(prefix):])
+        return None, None
+
+    async def dispatch(self, update, context):
+        """Обработчик CallbackQueryHandler"""
+        query = update.callback_query
+        route, payload = self.resolve(query.data or '')
+        if route is None or payload is None:
+            logger.warning(f"Неизвестная кнопка: {query.data!r}")
+            await query.answer()
+            return
+        await route.chain(query, context, payload)
+
+    def stats(self):
+        """Задержка обработчиков по маршрутам: [(имя, число, p50, p95, max)], медленные первыми"""
+        rows = []
+        for route in list(self.routes.values()) + [route for _, route in self.prefixes]:
+            hist = route.timings
+            if hist.count:
+                rows.append((route.name, hist.count, hist.percentile(0.5), hist.percentile(0.95), hist.max))
+        return sorted(rows, key=lambda row: row[3], reverse=True)
+
+# Стандартные middleware: (next, route, query, context, payload)
+
+def admin_only(is_admin):
+    """Проверка доступа до любых действий с запросом"""
+    async def middleware(call_next, route, query, context, payload):
+        if not is_admin(query.from_user.id):
+            await query.answer("⛔ Доступ запрещен", show_alert=True)
+            return
+        return await call_next(query, context, payload)
+    return middleware
+
+async def answer(call_next, route, query, context, payload):
+    """Убрать "часики" с кнопки сразу, до долгой обработки"""
+    await query.answer()
+    return await call_next(query, context, payload)
+
+async def timed(call_next, route, query, context, payload):
+    """Замер времени обработчика маршрута"""
+    started = time.perf_counter()
+    try:
+        return await call_next(query, context, payload)
+    finally:
+        elapsed = time.perf_counter() - started
+        route.timings.observe(elapsed)
+        if elapsed > 2:
+            logger.info(f"Медленная кнопка {route.name}: {elapsed:.2f} с")
+
+def cached(ttl):
+    """Кэш экрана на ttl секунд (для экранов, которые строятся из снимка метрик)"""
+    cache = {}
+
+    async def middleware(call_next, route, query, context, payload):
+        now = time.monotonic()
+        hit = cache.get((route.name, payload))
+        if hit is not None and now - hit[0] < ttl:
+            await show(query, hit[1])
+            return hit[1]
+        result = await call_next(query, context, payload)
+        if isinstance(result, Screen):
+            cache[(route.name, payload)] = (now, result)
+        return result
+    return middleware
+
+def format_route_stats(router):
+    """Таблица задержек кнопок для /routes"""
+    rows = router.stats()
+    if not rows:
+        return "⏱ *Кнопки*\n\nЕще нет данных"
+    lines = [f"{'Маршрут':16} {'N':>5} {'p50':>7} {'p95':>7} {'max':>7}"]
+    for name, n, p50, p95, worst in rows:
+        lines.append(f"{name[:16]:16} {n:5} {p50 * 1000:7.0f} {p95 * 1000:7.0f} {worst * 1000:7.0f}")
+    return "⏱ *Время обработки кнопок (мс)*\n\n```\n" + "\n".join(lines) + "\n```"
@@ -0,0 +1,290 @@
+from collections import OrderedDict, namedtuple
+from functools import lru_cache
+from types import MappingProxyType
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Message
+from telegram.error import BadRequest
+from commands import predefined_commands
+from charts import CHART_METRICS
+from log_tail import JOURNAL, sources as log_sources
+
+# Готовый экран: текст (Markdown) и клавиатура. Объекты telegram неизменяемы,
+# поэтому один экран можно отдавать всем пользователям
+Screen = namedtuple('Screen', 'text reply_markup')
+
+MAIN_MENU_TEXT = "👋 *Добро пожаловать в панель управления сервером!*\n\nВыберите раздел:"
+
+HELP_MENU_TEXT = """
+🆘 *Помощь по управлению ботом*
+
+*Основные команды в чате:*
+`/start` - Главное меню
+`/menu` - Показать меню
+`/status` - Краткий статус
+`/cmd <команда>` - Выполнить команду
+`/graph <метрика> [окно]` - График метрики
+`/alerts` - Правила алертов
+`/fleet <команда>` - Команда на всех серверах
+`/queue` - Очередь отправки сообщений
+`/routes` - Время обработки кнопок
+`/perf [префикс]` - Время операций (p50/p95/p99)
+`/lag` - Задержка event loop и блокировки
+`/logs [источник] [-u юнит] [-p приоритет] [текст]` - Логи с фильтром
+`/help` - Эта справка
+
+*Быстрые команды в меню:*
+• 📊 Мониторинг - информация о системе
+• ⚡ Быстрые команды - готовые команды
+• 🖥️ Терминал - ввод своих команд
+• 🔧 Управление - управление сервером
+
+*Безопасность:*
+• Только администраторы имеют доступ
+• Все действия логируются
+• Опасные команды требуют подтверждения
+    """
+
+HELP_TEXT = """
+*Быстрые команды в чате:*
+
+`/start` - Главное меню с кнопками
+`/menu` - Показать меню
+`/status` - Краткий статус системы
+`/cmd <команда>` - Выполнить команду
+`/graph cpu 6h` - График метрики
+`/alerts` - Состояние алертов
+`/fleet uptime` - Команда на всех серверах
+`/logs journal -p err` - Ошибки из журнала
+`/help` - Справка
+
+*Быстрые клавиши:*
+Для быстрого доступа закрепите эти команды:
+• `Статус` → `/status`
+• `Диски` → `/cmd df -h`
+• `Память` → `/cmd free -h`
+• `Процессы` → `/cmd ps aux --sort=-%cpu | head -10`
+
+Используйте `/menu` для полного меню с кнопками!
+    """
+
+# Экраны и команды, доступные на удаленных серверах
+REMOTE_VIEWS = [
+    ('system', "📈 Статус системы"),
+    ('memory', "🧠 Память"),
+    ('disk', "💾 Диски"),
+    ('network', "🌐 Сеть"),
+    ('processes', "📈 Топ процессов"),
+]
+
+def keyboard(*rows):
+    """Клавиатура из строк кнопок (title, callback_data)"""
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton(title, callback_data=data) for title, data in row]
+        for row in rows
+    ])
+
+def columns(buttons, width):
+    """Разбить кнопки на строки по width штук"""
+    return [buttons[i:i + width] for i in range(0, len(buttons), width)]
+
+@lru_cache(maxsize=None)
+def back_markup(callback='main_menu', title=None):
+    """Одна кнопка "Назад" - общая клавиатура для экранов с данными"""
+    if title is None:
+        title = "🔙 Главное меню" if callback == 'main_menu' else "🔙 Назад"
+    return keyboard([(title, callback)])
+
+def view_screen(text, back='monitoring'):
+    """Шаблон экрана с данными: меняется только текст"""
+    return Screen(text, back_markup(back))
+
+def build_screens():
+    """Построить все статические экраны (один раз при запуске)"""
+    # Импорт здесь: список агентов нужен только при сборке меню
+    from fleet import LOCAL_HOST, get_agents
+    agents = list(get_agents())
+
+    main_rows = [
+        [("📊 Мониторинг", 'monitoring')],
+        [("⚡ Быстрые команды", 'quick_cmds')],
+        [("🖥️ Терминал", 'terminal')],
+        [("🔧 Управление", 'management')],
+        [("ℹ️ Помощь", 'help_menu')],
+    ]
+    if agents:
+        main_rows.append([("🌐 Серверы", 'fleet')])
+    main_markup = keyboard(*main_rows)
+
+    quick = [(info['description'], info.get('screen', f'quick_{name}')) for name, info in predefined_commands.items()]
+    fleet_cmds = [(info['description'], f'fleetrun:{name}') for name, info in predefined_commands.items()]
+
+    screens = {
+        'main_menu': Screen(MAIN_MENU_TEXT, main_markup),
+        'menu': Screen("👋 *Главное меню*\n\nВыберите раздел:", main_markup),
+        'monitoring': Screen(
+            "📊 *Мониторинг сервера*\n\n"
+            "Выберите что хотите посмотреть:",
+            keyboard(
+                [("📈 Статус системы", 'system_status')],
+                [("💾 Дисковое пространство", 'disk_status')],
+                [("💽 Детально о дисках", 'disk_detailed')],
+                [("🧠 Использование памяти", 'memory_status')],
+                [("🌐 Сетевая информация", 'network_status')],
+                [("📡 Состояние сервисов", 'services_status')],
+                [("📈 Топ процессов", 'processes_status')],
+                [("📉 Графики", 'graphs')],
+                [("🔙 Главное меню", 'main_menu')],
+            )
+        ),
+        'graphs': Screen(
+            "📉 *Графики*\n\n"
+            "Выберите метрику (по умолчанию за 6 часов):",
+            keyboard(
+                *[[(f"📉 {title}", f'graph:{metric}:6h')] for metric, (title, _, _) in CHART_METRICS.items()],
+                [("🔙 Назад", 'monitoring')]
+            )
+        ),
+        'quick_cmds': Screen(
+            "⚡ *Быстрые команды*\n\n"
+            "Выберите команду для выполнения:",
+            keyboard(*[[button] for button in quick], [("🔙 Главное меню", 'main_menu')])
+        ),
+        'terminal': Screen(
+            "🖥️ *Терминал сервера*\n\n"
+            "Вы можете выполнить любую команду на сервере.\n"
+            "⚠️ *Внимание:* Выполняйте только проверенные команды!",
+            keyboard([("📝 Ввести команду", 'custom_command')], [("🔙 Главное меню", 'main_menu')])
+        ),
+        'custom_command': Screen(
+            "📝 *Введите команду для выполнения:*\n\n"
+            "Примеры:\n"
+            "• `ls -la`\n"
+            "• `df -h`\n"
+            "• `systemctl status nginx`\n\n"
+            "⚠️ *Будьте осторожны с командами!*",
+            keyboard([("❌ Отмена", 'terminal')])
+        ),
+        'management': Screen(
+            "🔧 *Управление сервером*\n\n"
+            "Выберите действие:",
+            keyboard(
+                [("🔄 Перезагрузить сервер", 'quick_reboot')],
+                [("⏹️ Остановить сервер", 'quick_shutdown')],
+                [("📊 Логи системы", 'logs_menu')],
+                [("🔙 Главное меню", 'main_menu')],
+            )
+        ),
+        'help_menu': Screen(HELP_MENU_TEXT, back_markup('main_menu')),
+        'help': Screen(HELP_TEXT, keyboard([("📋 Открыть меню", 'main_menu')])),
+        'fleetcmds': Screen(
+            f"⚡ *Команда на всех серверах ({len(agents) + 1})*\n\n"
+            "Одинаковый вывод будет показан один раз:",
+            keyboard(*columns(fleet_cmds, 2), [("🔙 К серверам", 'fleet')])
+        ),
+    }
+
+    # Меню удаленных серверов тоже статичны: список агентов задан в конфиге
+    for host in agents:
+        remote_quick = [(info['description'], f'rquick:{host}:{name}') for name, info in predefined_commands.items()]
+        screens[f'host:{host}'] = Screen(
+            f"🖥️ *Сервер {host}*\n\nВыберите действие:",
+            keyboard(
+                *[[(title, f'rview:{host}:{view}')] for view, title in REMOTE_VIEWS],
+                *columns(remote_quick, 2),
+                [("🔙 К серверам", 'fleet')]
+            )
+        )
+    screens[f'host:{LOCAL_HOST}'] = screens['monitoring']
+
+    # Шаблоны динамических экранов: клавиатура готова, текст подставляет fill()
+    hosts = [(f"🖥️ {host}", f'host:{host}') for host in [LOCAL_HOST] + agents]
+    screens['services'] = Screen(None, keyboard(
+        [("🔄 Проверить сейчас", 'services_refresh')],
+        [("🔙 Назад", 'monitoring')]
+    ))
+    # Логи: выбор источника и шаблоны просмотра каждого источника
+    log_titles = [("📜 Журнал systemd" if source == JOURNAL else f"📄 {source}", f'logs:{source}')
+                  for source in log_sources()]
+    screens['logs_menu'] = Screen(
+        "📊 *Логи*\n\n"
+        "Выберите источник. \"Новые записи\" продолжают с места, где вы остановились.\n"
+        "Фильтр: `/logs [источник] [-u юнит] [-p приоритет] [текст]`",
+        keyboard(*columns(log_titles, 2), [("🔙 Назад", 'management')])
+    )
+    for source in log_sources():
+        screens[f'logs:{source}'] = Screen(None, keyboard(
+            [("⬇️ Новые записи", f'logsmore:{source}'), ("▶️ Следить", f'logsfollow:{source}')],
+            [("🔙 К логам", 'logs_menu')]
+        ))
+        screens[f'logsfollow:{source}'] = Screen(None, keyboard(
+            [("⏹ Остановить", f'logsstop:{source}')]
+        ))
+    screens['fleet'] = Screen(None, keyboard(
+        *columns(hosts, 3),
+        [("⚡ Команда на всех", 'fleetcmds')],
+        [("🔄 Обновить", 'fleet')],
+        [("🔙 Главное меню", 'main_menu')]
+    ))
+    return MappingProxyType(screens)
+
+_screens = None
+
+def get_screens():
+    global _screens
+    if _screens is None:
+        _screens = build_screens()
+    return _screens
+
+def get_screen(name):
+    return get_screens()[name]
+
+def fill(name, text):
+    """Экран-шаблон с подставленным текстом"""
+    return get_screen(name)._replace(text=text)
+
+# Как Telegram показал Markdown-текст (без разметки) - чтобы сравнивать
+# новый экран с тем, что уже в сообщении
+_rendered = OrderedDict()
+RENDERED_CACHE = 512
+
+def _remember(text, message):
+    if isinstance(message, Message) and message.text is not None:
+        _rendered[text] = message.text
+        _rendered.move_to_end(text)
+        while len(_rendered) > RENDERED_CACHE:
+            _rendered.popitem(last=False)
+
+def is_shown(message, screen):
+    """Сообщение уже показывает этот экран (текст и кнопки совпадают)"""
+    return (
+        message is not None
+        and message.text is not None
+        and message.reply_markup == screen.reply_markup
+        and _rendered.get(screen.text) == message.text
+    )
+
+async def show(query, screen):
+    """Показать экран в сообщении с кнопкой; без запроса, если ничего не изменилось"""
+    if is_shown(query.message, screen):
+        return query.message
+    try:
+        sent = await query.edit_message_text(
+            screen.text,
+            reply_markup=screen.reply_markup,
+            parse_mode='Markdown'
+        )
+    except BadRequest as e:
+        if 'not modified' not in str(e):
+            raise
+        return query.message
+    _remember(screen.text, sent)
+    return sent
+
+async def reply(message, screen):
+    """Отправить экран новым сообщением"""
+    sent = await message.reply_text(
+        screen.text,
+        reply_markup=screen.reply_markup,
+        parse_mode='Markdown'
+    )
+    _remember(screen.text, sent)
+    return sent
@@ -0,0 +1,315 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+import config
+import perf
+
+logger = logging.getLogger(__name__)
+
+# Приоритеты (rate_limit_args): ответы пользователю раньше фоновых уведомлений
+INTERACTIVE = 0
+BACKGROUND = 1
+
+# Правки сообщения, которые можно схлопнуть: в очереди остается только последняя
+EDIT_ENDPOINTS = {'editMessageText', 'editMessageReplyMarkup', 'editMessageCaption', 'editMessageMedia'}
+
+class TokenBucket:
+    """Ведро токенов: rate токенов в секунду, не больше burst подряд"""
+
+    __slots__ = ('rate', 'burst', 'tokens', 'updated')
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now):
+        """Через сколько секунд будет доступен токен (0 - уже есть)"""
+        self.refill(now)
+        return 0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+    def full(self, now):
+        self.refill(now)
+        return self.tokens >= self.burst
+
+class Request:
+    """Запрос к Bot API, ожидающий отправки"""
+
+    __slots__ = ('priority', 'seq', 'endpoint', 'chat_id', 'key', 'callback', 'args', 'kwargs',
+                 'futures', 'enqueued', 'retries')
+
+    def __init__(self, priority, seq, endpoint, chat_id, key, callback, args, kwargs):
+        self.priority = priority
+        self.endpoint = endpoint
+        self.seq = seq
+        self.chat_id = chat_id
+        self.key = key
+        self.callback = callback
+        self.args = args
+        self.kwargs = kwargs
+        self.futures = [asyncio.get_running_loop().create_future()]
+        self.enqueued = time.monotonic()
+        self.retries = 0
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+class SendQueue(BaseRateLimiter):
+    """Общая очередь исходящих запросов бота.
+
+    Все вызовы Bot API с chat_id проходят через очередь с приоритетами:
+    ведра токенов на чат и общее, не больше одного запроса к чату
+    одновременно (порядок сообщений сохраняется), схлопывание правок одного
+    сообщения и общая пауза после RetryAfter.
+    """
+
+    def __init__(self):
+        cfg = config.Config
+        self.global_bucket = TokenBucket(cfg.SEND_GLOBAL_RATE, cfg.SEND_GLOBAL_RATE)
+        self.chat_buckets = {}
+        # Куча запросов, которые можно отправлять; запросы занятых чатов (в
+        # полете или без токенов) ждут в кучах своих чатов, чтобы выбор
+        # следующего запроса стоил O(log n), а не перебор всей очереди
+        self.heap = []
+        self.deferred = {}  # chat_id -> куча отложенных запросов чата
+        self.throttled = []  # куча (когда появится токен, chat_id)
+        self.depth = 0
+        self.edits = {}  # (endpoint, chat_id, message_id) -> Request в очереди
+        self.in_flight = set()  # чаты с запросом "в полете"
+        self.seq = itertools.count()
+        self.paused_until = 0
+        self.wakeup = None
+        self.dispatcher = None
+        self.senders = set()
+        # Метрики
+        self.sent = 0
+        self.coalesced = 0
+        self.retry_after = 0
+        self.max_depth = 0
+        # Постановка в очередь -> ответ Telegram
+        self.latency = perf.histogram('send.latency')
+
+    async def initialize(self):
+        # Application и Updater инициализируют одного и того же бота - дважды
+        if self.dispatcher is not None:
+            return
+        self.wakeup = asyncio.Event()
+        self.dispatcher = asyncio.create_task(self._dispatch())
+
+    async def shutdown(self):
+        if self.dispatcher:
+            self.dispatcher.cancel()
+            try:
+                await self.dispatcher
+            except asyncio.CancelledError:
+                pass
+            self.dispatcher = None
+        for request in self.heap + [r for requests in self.deferred.values() for r in requests]:
+            for future in request.futures:
+                future.cancel()
+        self.heap.clear()
+        self.deferred.clear()
+        self.throttled.clear()
+        self.depth = 0
+        self.edits.clear()
+
+    def _chat_bucket(self, chat_id):
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            cfg = config.Config
+            # Группы и каналы (отрицательный id) ограничены строже личных чатов
+            if isinstance(chat_id, str) or chat_id < 0:
+                bucket = TokenBucket(cfg.SEND_GROUP_RATE, cfg.SEND_GROUP_BURST)
+            else:
+                bucket = TokenBucket(cfg.SEND_CHAT_RATE, cfg.SEND_CHAT_BURST)
+            self.chat_buckets[chat_id] = bucket
+        return bucket
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        chat_id = data.get('chat_id')
+        if chat_id is None or self.dispatcher is None:
+            # getUpdates, answerCallbackQuery и т.п. не привязаны к чату
+            return await callback(*args, **kwargs)
+        try:
+            chat_id = int(chat_id)
+        except (TypeError, ValueError):
+            pass
+        priority = INTERACTIVE if rate_limit_args is None else rate_limit_args
+
+        key = None
+        if endpoint in EDIT_ENDPOINTS and data.get('message_id') is not None:
+            key = (endpoint, chat_id, data['message_id'])
+            queued = self.edits.get(key)
+            if queued is not None:
+                # Правка еще не ушла: подменяем ее текст новым, ответ получат оба
+                queued.args, queued.kwargs = args, kwargs
+                future = asyncio.get_running_loop().create_future()
+                queued.futures.append(future)
+                if priority < queued.priority:
+                    queued.priority = priority
+                    deferred = self.deferred.get(chat_id)
+                    heapq.heapify(deferred if deferred and queued in deferred else self.heap)
+                self.coalesced += 1
+                return await future
+
+        request = Request(priority, next(self.seq), endpoint, chat_id, key, callback, args, kwargs)
+        if key:
+            self.edits[key] = request
+        heapq.heappush(self.heap, request)
+        self.depth += 1
+        self.max_depth = max(self.max_depth, self.depth)
+        self.wakeup.set()
+        return await request.futures[0]
+
+    def _defer(self, request):
+        heapq.heappush(self.deferred.setdefault(request.chat_id, []), request)
+
+    def _release(self, chat_id):
+        """Вернуть отложенные запросы чата в общую кучу"""
+        for request in self.deferred.pop(chat_id, ()):
+            heapq.heappush(self.heap, request)
+
+    def _next_ready(self, now):
+        """Первый по приоритету запрос, который можно отправить сейчас;
+        иначе (None, сколько ждать)"""
+        # Чаты, у которых появились токены, возвращаются в общую кучу
+        while self.throttled and self.throttled[0][0] <= now:
+            _, chat_id = heapq.heappop(self.throttled)
+            if chat_id not in self.in_flight:
+                self._release(chat_id)
+
+        while self.heap:
+            request = heapq.heappop(self.heap)
+            chat_id = request.chat_id
+            if chat_id in self.in_flight or chat_id in self.deferred:
+                # Чат занят или уже ждет - запрос встает за его запросами
+                self._defer(request)
+                continue
+            wait = self._chat_bucket(chat_id).wait_time(now)
+            if wait:
+                self._defer(request)
+                heapq.heappush(self.throttled, (now + wait, chat_id))
+                continue
+            return request, 0
+        return None, (self.throttled[0][0] - now if self.throttled else None)
+
+    async def _dispatch(self):
+        while True:
+            now = time.monotonic()
+            if not self.depth or now < self.paused_until:
+                timeout = None if not self.depth else self.paused_until - now
+                await self._sleep(timeout)
+                continue
+
+            wait = self.global_bucket.wait_time(now)
+            request, delay = self._next_ready(now) if wait == 0 else (None, wait)
+            if request is None:
+                await self._sleep(delay)
+                continue
+
+            self.depth -= 1
+            if request.key:
+                self.edits.pop(request.key, None)
+            self.global_bucket.take()
+            self._chat_bucket(request.chat_id).take()
+            self.in_flight.add(request.chat_id)
+            task = asyncio.create_task(self._send(request))
+            self.senders.add(task)
+            task.add_done_callback(self.senders.discard)
+
+    async def _sleep(self, timeout):
+        """Ждать нового запроса, освобождения чата или истечения timeout"""
+        self.wakeup.clear()
+        try:
+            await asyncio.wait_for(self.wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _send(self, request):
+        try:
+            with perf.timer(f'telegram.{request.endpoint}'):
+                result = await request.callback(*request.args, **request.kwargs)
+        except RetryAfter as e:
+            self.retry_after += 1
+            perf.count('telegram.retry_after')
+            request.retries += 1
+            if request.retries <= config.Config.SEND_MAX_RETRIES:
+                # Пауза для всех чатов, запрос возвращается в очередь на свое место
+                logger.warning(f"Telegram RetryAfter {e.retry_after} с, очередь на паузе")
+                self.paused_until = max(self.paused_until, time.monotonic() + e.retry_after + 0.1)
+                heapq.heappush(self.heap, request)
+                self.depth += 1
+                if request.key and request.key not in self.edits:
+                    self.edits[request.key] = request
+                return
+            self._finish(request, exception=e)
+        except Exception as e:
+            self._finish(request, exception=e)
+        else:
+            self.sent += 1
+            self._finish(request, result=result)
+        finally:
+            self.in_flight.discard(request.chat_id)
+            self._release(request.chat_id)
+            self.wakeup.set()
+            self._forget_idle_chats()
+
+    def _finish(self, request, result=None, exception=None):
+        self.latency.observe(time.monotonic() - request.enqueued)
+        for future in request.futures:
+            if future.done():
+                continue
+            if exception is not None:
+                future.set_exception(exception)
+            else:
+                future.set_result(result)
+
+    def _forget_idle_chats(self):
+        # Полные ведра ничем не отличаются от новых - не держим их в памяти
+        if len(self.chat_buckets) > 1000:
+            now = time.monotonic()
+            for chat_id in [c for c, b in self.chat_buckets.items() if b.full(now)]:
+                del self.chat_buckets[chat_id]
+
+    def stats(self):
+        return {
+            'depth': self.depth,
+            'max_depth': self.max_depth,
+            'in_flight': len(self.in_flight),
+            'sent': self.sent,
+            'coalesced': self.coalesced,
+            'retry_after': self.retry_after,
+            'latency_p50': self.latency.percentile(0.5),
+            'latency_p95': self.latency.percentile(0.95),
+            'latency_max': self.latency.max,
+        }
+
+def format_send_stats(queue):
+    """Метрики очереди отправки для /queue"""
+    if queue is None:
+        return "📤 *Очередь отправки*\n\nНе используется"
+    s = queue.stats()
+    return f"""📤 *Очередь отправки*
+
+• В очереди: {s['depth']} (максимум {s['max_depth']})
+• Отправляется: {s['in_flight']}
+• Отправлено: {s['sent']}
+• Схлопнуто правок: {s['coalesced']}
+• RetryAfter от Telegram: {s['retry_after']}
+
+*Задержка (постановка → ответ):*
+• p50: {s['latency_p50'] * 1000:.0f} мс
+• p95: {s['latency_p95'] * 1000:.0f} мс
+• max: {s['latency_max'] * 1000:.0f} мс"""
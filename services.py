@@ -1,43 +1,359 @@
-import socket
-import requests
-from requests.exceptions import RequestException
+import asyncio
+import heapq
+import itertools
 import logging
+import os
+import time
+from collections import namedtuple
+import httpx
+import psutil
+import config
+import perf
+import http_probe
+import minecraft
+import systemd_units
 
 logger = logging.getLogger(__name__)
 
-def check_service_status(url, timeout=5):
-    """Проверка доступности HTTP/HTTPS сервиса"""
-    try:
-        response = requests.get(url, timeout=timeout)
-        if 200 <= response.status_code < 300:
-            return "🟢 Онлайн"
-        else:
-            return f"🟡 Ошибка {response.status_code}"
-    except RequestException as e:
-        logger.error(f"Ошибка проверки сервиса {url}: {e}")
-        return "🔴 Офлайн"
-
-def check_minecraft_server(address, timeout=5):
-    """Проверка Minecraft сервера"""
-    try:
-        if ':' in address:
-            host, port = address.split(':')
-            port = int(port)
-        else:
-            host = address
-            port = 25565
-        
-        # Создаем сокет
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.settimeout(timeout)
-        
-        result = sock.connect_ex((host, port))
-        sock.close()
-        
-        if result == 0:
-            return "🟢 Онлайн"
-        else:
-            return "🔴 Офлайн"
+# Скомпилированная проверка из Config.SERVICES: тип пробы, имя, цель (URL,
+# host:port, юнит, имя процесса, путь), параметры пробы и расписание
+ServiceCheck = namedtuple('ServiceCheck', [
+    'kind',      # тип пробы (ключ PROBES)
+    'name',      # отображаемое имя
+    'target',    # что проверять
+    'match',     # http: текст, который должен быть на странице
+    'max_age',   # file_age: максимальный возраст файла (сек)
+    'interval',  # период фоновой проверки (сек)
+    'timeout',   # таймаут одной проверки (сек)
+    'priority',  # порядок в списке: меньше - выше
+], defaults=(None, None, None, None, 0))
+
+# Результат проверки; details - подробности пробы (http_probe.HttpTiming для HTTP)
+ServiceResult = namedtuple('ServiceResult', ['check', 'ok', 'text', 'latency', 'details'], defaults=(None,))
+
+# Последний результат каждой проверки (для снимка метрик и агентов)
+_latest_results = {}
+
+def split_address(address, default_port=25565):
+    """Разбор строки host:port"""
+    if ':' in address:
+        host, port = address.rsplit(':', 1)
+        return host, int(port)
+    return address, default_port
+
+async def probe_http(check, timeout):
+    """Проверка HTTP/HTTPS сервиса без скачивания страницы: статус, фазы запроса,
+    срок сертификата и (если задан) текст на странице"""
+    try:
+        timing = await http_probe.probe(check.target, timeout, check.match)
+    except httpx.HTTPError as e:
+        logger.error(f"Ошибка проверки сервиса {check.target}: {e!r}")
+        return False, "Офлайн"
+    http_probe.observe_timing(check.name, timing)
+    # 206 - ответ на GET с Range
+    if not 200 <= timing.status < 300:
+        return False, f"Ошибка {timing.status}", timing
+    if timing.matched is False:
+        return False, f"Нет текста «{check.match}» ({timing.status})", timing
+    return True, f"Онлайн ({timing.status})", timing
+
+async def probe_tcp(check, timeout):
+    """Проверка доступности TCP порта"""
+    host, port = split_address(check.target)
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return False, "Офлайн"
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    return True, "Онлайн"
+
+async def probe_minecraft(check, timeout):
+    """Проверка Minecraft сервера по Server List Ping (результат кэшируется)"""
+    host, port = split_address(check.target.removeprefix('minecraft://'), minecraft.DEFAULT_PORT)
+    try:
+        status = await minecraft.get_status(host, port, timeout)
+    except (OSError, asyncio.IncompleteReadError) as e:
+        logger.error(f"Ошибка проверки Minecraft {check.target}: {e!r}")
+        return False, "Офлайн"
+    except minecraft.McError as e:
+        # Порт открыт, но сервер не отвечает по протоколу (завис или не Minecraft)
+        return False, f"Не отвечает: {e}"
+    return True, f"Онлайн: {minecraft.format_status(status)}", status
+
+async def probe_systemd(check, timeout):
+    """Проверка состояния юнита: общий для всех юнитов запрос systemctl show с кэшем"""
+    try:
+        state = await systemd_units.get_collector().state(check.target, timeout=timeout)
+    except (OSError, systemd_units.SystemdError) as e:
+        logger.error(f"Ошибка опроса systemd: {e!r}")
+        return False, "systemd недоступен"
+    if state is None:
+        return False, "Нет данных"
+    if state.load == 'not-found':
+        return False, "Юнит не найден"
+    if state.active == 'active':
+        return True, f"Запущен ({state.sub})", state
+    return False, f"Не запущен ({state.active}/{state.sub})", state
+
+def count_processes(name):
+    return sum(1 for proc in psutil.process_iter(['name']) if proc.info['name'] == name)
+
+async def probe_process(check, timeout):
+    """Проверка, что запущен хотя бы один процесс с таким именем"""
+    count = await asyncio.to_thread(count_processes, check.target)
+    if count:
+        return True, f"Запущен ({count} шт.)"
+    return False, "Не запущен"
+
+def format_seconds(seconds):
+    if seconds < 120:
+        return f"{seconds:.0f} с"
+    if seconds < 7200:
+        return f"{seconds / 60:.0f} мин"
+    if seconds < 172800:
+        return f"{seconds / 3600:.0f} ч"
+    return f"{seconds / 86400:.0f} дн."
+
+async def probe_file_age(check, timeout):
+    """Проверка, что файл обновлялся не дольше max_age секунд назад (бэкапы, heartbeat-файлы)"""
+    try:
+        age = max(0, time.time() - os.stat(check.target).st_mtime)
+    except OSError:
+        return False, "Файл не найден"
+    text = f"обновлен {format_seconds(age)} назад"
+    if age > check.max_age:
+        return False, f"Устарел: {text}"
+    return True, f"Свежий: {text}"
+
+# Реестр типов проб
+PROBES = {
+    'http': probe_http,
+    'tcp': probe_tcp,
+    'minecraft': probe_minecraft,
+    'systemd': probe_systemd,
+    'process': probe_process,
+    'file_age': probe_file_age,
+}
+
+# Параметры записи Config.SERVICES: допустимые типы значений
+SPEC_FIELDS = {
+    'type': str,
+    'target': str,
+    'match': str,
+    'max_age': (int, float),
+    'interval': (int, float),
+    'timeout': (int, float),
+    'priority': int,
+}
+
+def guess_kind(address):
+    """Тип пробы по строке адреса из Config.SERVICES"""
+    if address.startswith('http'):
+        return 'http'
+    if address.startswith('minecraft://'):
+        return 'minecraft'
+    return 'tcp'
+
+def compile_check(name, spec):
+    """Проверка из записи Config.SERVICES: строка адреса или словарь параметров.
+    Ошибки конфигурации - ValueError с понятным текстом"""
+    if isinstance(spec, str):
+        spec = {'type': guess_kind(spec), 'target': spec}
+    if not isinstance(spec, dict):
+        raise ValueError(f"Сервис {name!r}: ожидается строка или словарь")
+    
+    unknown = sorted(set(spec) - set(SPEC_FIELDS))
+    if unknown:
+        raise ValueError(f"Сервис {name!r}: неизвестные параметры {', '.join(unknown)}")
+    for key, value in spec.items():
+        if isinstance(value, bool) or not isinstance(value, SPEC_FIELDS[key]):
+            raise ValueError(f"Сервис {name!r}: некорректное значение {key}={value!r}")
+    
+    kind = spec.get('type')
+    if kind not in PROBES:
+        raise ValueError(f"Сервис {name!r}: неизвестный тип {kind!r} (доступны: {', '.join(PROBES)})")
+    target = spec.get('target')
+    if not target:
+        raise ValueError(f"Сервис {name!r}: не задан target")
+    for key in ('interval', 'timeout', 'max_age'):
+        if key in spec and spec[key] <= 0:
+            raise ValueError(f"Сервис {name!r}: {key} должен быть больше нуля")
+    
+    if kind == 'http' and not target.startswith(('http://', 'https://')):
+        raise ValueError(f"Сервис {name!r}: для http нужен URL, а не {target!r}")
+    if kind == 'tcp' and ':' not in target:
+        raise ValueError(f"Сервис {name!r}: для tcp нужен адрес host:port")
+    if kind in ('tcp', 'minecraft'):
+        try:
+            _, port = split_address(target.removeprefix('minecraft://'), minecraft.DEFAULT_PORT)
+        except ValueError:
+            port = None
+        if port is None or not 0 < port < 65536:
+            raise ValueError(f"Сервис {name!r}: некорректный адрес {target!r}")
+    if kind == 'file_age' and 'max_age' not in spec:
+        raise ValueError(f"Сервис {name!r}: для file_age нужен max_age")
+    if 'match' in spec and kind != 'http':
+        raise ValueError(f"Сервис {name!r}: match поддерживается только для http")
+    
+    cfg = config.Config
+    return ServiceCheck(
+        kind=kind,
+        name=name,
+        target=target,
+        match=spec.get('match'),
+        max_age=spec.get('max_age'),
+        interval=spec.get('interval', cfg.MONITORING_INTERVAL),
+        timeout=spec.get('timeout', cfg.SERVICE_TIMEOUT),
+        priority=spec.get('priority', 0),
+    )
+
+def compile_checks(services):
+    """Все проверки из конфига; некорректные записи пропускаются с ошибкой в логе"""
+    checks = []
+    for name, spec in services.items():
+        try:
+            checks.append(compile_check(name, spec))
+        except ValueError as e:
+            logger.error(str(e))
+    # sorted устойчив: при равном приоритете порядок как в конфиге
+    return sorted(checks, key=lambda check: check.priority)
+
+_checks = None
+
+def get_checks():
+    """Проверки из Config.SERVICES (разбираются один раз)"""
+    global _checks
+    if _checks is None:
+        _checks = compile_checks(config.Config.SERVICES)
+        # Все юниты опрашиваются одним вызовом - регистрируем их заранее
+        systemd_units.get_collector().watch(check.target for check in _checks if check.kind == 'systemd')
+    return _checks
+
+async def run_check(check, timeout=None):
+    """Выполнить одну проверку, не выпуская исключения наружу"""
+    timeout = timeout or check.timeout or config.Config.SERVICE_TIMEOUT
+    start = time.perf_counter()
+    details = None
+    try:
+        # Проба возвращает (ok, текст) или (ok, текст, подробности)
+        ok, text, *rest = await asyncio.wait_for(PROBES[check.kind](check, timeout), timeout)
+        if rest:
+            details = rest[0]
+    except asyncio.TimeoutError:
+        ok, text = False, "Таймаут"
     except Exception as e:
-        logger.error(f"Ошибка проверки Minecraft сервера {address}: {e}")
-        return "🔴 Ошибка"
+        logger.error(f"Ошибка проверки {check.name}: {e!r}")
+        ok, text = False, "Ошибка проверки"
+    latency = time.perf_counter() - start
+    perf.observe(f'probe.{check.kind}', latency)
+    if not ok:
+        perf.count(f'probe.{check.kind}.failed')
+    result = ServiceResult(check, ok, text, latency, details)
+    _latest_results[check.name] = (time.time(), result)
+    return result
+
+def latest_results():
+    """Последние результаты проверок: имя -> (время, ServiceResult)"""
+    return dict(_latest_results)
+
+async def iter_services_status(checks=None, timeout=None, deadline=None):
+    """Параллельная проверка сервисов: результаты отдаются по мере готовности"""
+    checks = get_checks() if checks is None else checks
+    deadline = deadline or config.Config.SERVICES_DEADLINE
+    
+    tasks = {asyncio.create_task(run_check(check, timeout)): check for check in checks}
+    started = time.perf_counter()
+    pending = set(tasks)
+    try:
+        while pending:
+            remaining = deadline - (time.perf_counter() - started)
+            if remaining <= 0:
+                break
+            done, pending = await asyncio.wait(
+                pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                yield task.result()
+        
+        # Все, что не уложилось в общий дедлайн, считаем таймаутом
+        for task in pending:
+            task.cancel()
+            yield ServiceResult(tasks[task], False, "Таймаут", deadline)
+    finally:
+        for task in pending:
+            task.cancel()
+
+class ProbeScheduler:
+    """Фоновый запуск проверок: у каждой свой интервал.
+    
+    Очередь - куча (время следующего запуска, проверка). Проверки, у которых
+    подошел срок, запускаются вместе; результаты отдаются в on_results.
+    Проверка не запускается повторно, пока не закончилась предыдущая.
+    """
+    
+    def __init__(self, checks=None):
+        self.checks = get_checks() if checks is None else checks
+        self.heap = []
+        self.seq = itertools.count()
+        self.running = set()
+        self.tasks = set()
+        self.task = None
+        self.on_results = None
+    
+    def start(self, on_results=None):
+        if self.task is not None:
+            return
+        self.on_results = on_results
+        now = time.monotonic()
+        # Первый раунд - с небольшим разносом, чтобы не открывать все соединения разом
+        for i, check in enumerate(self.checks):
+            heapq.heappush(self.heap, (now + i * 0.1, next(self.seq), check))
+        self.task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        tasks = [self.task, *self.tasks] if self.task else list(self.tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.task = None
+        self.heap.clear()
+    
+    async def _run(self):
+        while self.heap:
+            now = time.monotonic()
+            due = []
+            while self.heap and self.heap[0][0] <= now:
+                planned, _, check = heapq.heappop(self.heap)
+                # Следующий запуск - от планового времени, без накопления сдвига
+                heapq.heappush(self.heap, (max(planned + check.interval, now), next(self.seq), check))
+                if check not in self.running:
+                    due.append(check)
+            if due:
+                task = asyncio.create_task(self._run_batch(due))
+                self.tasks.add(task)
+                task.add_done_callback(self.tasks.discard)
+            await asyncio.sleep(max(0, self.heap[0][0] - time.monotonic()))
+    
+    async def _run_batch(self, checks):
+        self.running.update(checks)
+        try:
+            results = await asyncio.gather(*(run_check(check) for check in checks))
+        finally:
+            self.running.difference_update(checks)
+        if self.on_results:
+            try:
+                self.on_results(results)
+            except Exception as e:
+                logger.error(f"Ошибка обработки результатов проверок: {e!r}")
+
+_scheduler = None
+
+def get_scheduler():
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = ProbeScheduler()
+    return _scheduler
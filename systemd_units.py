@@ -0,0 +1,139 @@
+import asyncio
+import logging
+import time
+from collections import namedtuple
+import config
+import perf
+
+logger = logging.getLogger(__name__)
+
+# Состояние юнита из systemctl show
+UnitState = namedtuple('UnitState', ['unit', 'load', 'active', 'sub'])
+
+# Смена ActiveState юнита между двумя опросами
+UnitEvent = namedtuple('UnitEvent', ['unit', 'old', 'new', 'timestamp'])
+
+PROPERTIES = 'Id,LoadState,ActiveState,SubState'
+
+class SystemdError(Exception):
+    """systemctl недоступен или завершился с ошибкой"""
+
+def unit_name(name):
+    """'ssh' -> 'ssh.service' (так systemctl называет юнит в выводе)"""
+    return name if '.' in name else f"{name}.service"
+
+def parse_show(units, text):
+    """Разбор вывода systemctl show: блоки KEY=VALUE через пустую строку,
+    по одному на юнит в порядке аргументов"""
+    blocks = []
+    for block in text.strip().split('\n\n'):
+        fields = dict(line.split('=', 1) for line in block.splitlines() if '=' in line)
+        if fields:
+            blocks.append(fields)
+    if len(blocks) == len(units):
+        # По порядку: Id у псевдонима (sshd -> ssh.service) не совпадает с запрошенным именем
+        pairs = zip(units, blocks)
+    else:
+        by_id = {fields.get('Id'): fields for fields in blocks}
+        pairs = ((unit, by_id[unit_name(unit)]) for unit in units if unit_name(unit) in by_id)
+    return {
+        unit: UnitState(unit, fields.get('LoadState', ''), fields.get('ActiveState', ''), fields.get('SubState', ''))
+        for unit, fields in pairs
+    }
+
+async def systemctl_show(units, timeout):
+    """Состояния нескольких юнитов одним процессом systemctl"""
+    proc = await asyncio.create_subprocess_exec(
+        'systemctl', 'show', '--no-pager', '-p', PROPERTIES, *units,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        raise
+    if proc.returncode != 0 and not stdout:
+        raise SystemdError(stderr.decode(errors='replace').strip() or f"код {proc.returncode}")
+    return parse_show(units, stdout.decode(errors='replace'))
+
+class SystemdCollector:
+    """Состояния всех наблюдаемых юнитов.
+
+    Один вызов systemctl show на все юниты вместо is-active на каждый;
+    результат кэшируется, одновременные запросы ждут один и тот же вызов.
+    При смене ActiveState слушателям отдаются UnitEvent.
+    """
+
+    def __init__(self):
+        self.units = []
+        self.states = {}
+        self.updated = 0.0
+        self.refreshing = None
+        self.listeners = []
+        self.refreshes = 0
+
+    def watch(self, units):
+        """Добавить юниты в общий запрос"""
+        for unit in units:
+            if unit not in self.units:
+                self.units.append(unit)
+
+    def subscribe(self, listener):
+        """listener(events) вызывается со списком UnitEvent после опроса"""
+        self.listeners.append(listener)
+
+    async def refresh(self, timeout=None):
+        """Опросить все юниты (если опрос уже идет - дождаться его)"""
+        if self.refreshing is None:
+            self.refreshing = asyncio.create_task(self._refresh(timeout or config.Config.SERVICE_TIMEOUT))
+            self.refreshing.add_done_callback(self._refreshed)
+        # shield: таймаут одной проверки не отменяет общий запрос
+        return await asyncio.shield(self.refreshing)
+
+    def _refreshed(self, task):
+        self.refreshing = None
+
+    async def _refresh(self, timeout):
+        units = list(self.units)
+        with perf.timer('systemd.show'):
+            states = await systemctl_show(units, timeout)
+        self.refreshes += 1
+        now = time.time()
+        events = []
+        for unit, state in states.items():
+            old = self.states.get(unit)
+            if old is not None and old.active != state.active:
+                events.append(UnitEvent(unit, old.active, state.active, now))
+        self.states.update(states)
+        self.updated = time.monotonic()
+        if events:
+            perf.count('systemd.transitions', len(events))
+            for event in events:
+                logger.info(f"Юнит {event.unit}: {event.old} -> {event.new}")
+            for listener in self.listeners:
+                try:
+                    listener(events)
+                except Exception as e:
+                    logger.error(f"Ошибка обработки событий systemd: {e!r}")
+        return states
+
+    async def state(self, unit, max_age=None, timeout=None):
+        """Состояние юнита: из кэша, если он моложе max_age, иначе общий опрос"""
+        max_age = config.Config.SYSTEMD_CACHE_TTL if max_age is None else max_age
+        self.watch([unit])
+        if unit not in self.states or time.monotonic() - self.updated > max_age:
+            await self.refresh(timeout)
+            if unit not in self.states:
+                # Юнит добавили, пока шел опрос без него
+                await self.refresh(timeout)
+        return self.states.get(unit)
+
+_collector = None
+
+def get_collector():
+    global _collector
+    if _collector is None:
+        _collector = SystemdCollector()
+    return _collector
@@ -0,0 +1,191 @@
+"""Протокол агента: кадры, авторизация вызов-ответ и пакеты запросов
+
+Запуск из корня репозитория:
+    python -m pytest tests
+"""
+import asyncio
+import os
+import sys
+import zlib
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import agent
+import config
+import fleet
+from agent import FRAME_HEADER, AgentError, read_frame, serve, write_frame
+
+TOKEN = 'test-token'
+
+class Buffer:
+    """writer для write_frame, собирающий байты в память"""
+
+    def __init__(self):
+        self.data = b''
+
+    def write(self, data):
+        self.data += data
+
+    async def drain(self):
+        pass
+
+def reader_for(data):
+    reader = asyncio.StreamReader()
+    reader.feed_data(data)
+    reader.feed_eof()
+    return reader
+
+def read(data, limit=agent.MAX_FRAME):
+    """read_frame по готовым байтам (StreamReader создается внутри цикла)"""
+    async def main():
+        return await read_frame(reader_for(data), limit)
+    return asyncio.run(main())
+
+def raw_frame(body):
+    return FRAME_HEADER.pack(len(body)) + body
+
+async def encode(message):
+    buffer = Buffer()
+    await write_frame(buffer, message)
+    return buffer.data
+
+def test_frame_roundtrip():
+    async def main():
+        message = {'requests': [{'op': 'snapshot'}], 'text': 'привет'}
+        return await read_frame(reader_for(await encode(message)))
+    assert asyncio.run(main()) == {'requests': [{'op': 'snapshot'}], 'text': 'привет'}
+
+def test_closed_connection_returns_none():
+    assert read(b'') is None
+
+def test_oversized_frame_rejected():
+    with pytest.raises(AgentError):
+        read(FRAME_HEADER.pack(agent.MAX_FRAME + 1))
+
+def test_zlib_bomb_rejected():
+    # ~20 КБ сжатых данных распаковываются в 20 МБ - больше MAX_FRAME
+    bomb = zlib.compress(b' ' * (20 * 1024 * 1024), 9)
+    assert len(bomb) < agent.MAX_FRAME
+    with pytest.raises(AgentError):
+        read(raw_frame(bomb))
+
+def test_hello_limit_applies_after_decompression():
+    body = zlib.compress(b'{"auth": "' + b'a' * agent.HELLO_MAX_FRAME + b'"}')
+    assert len(body) < agent.HELLO_MAX_FRAME
+    with pytest.raises(AgentError):
+        read(raw_frame(body), agent.HELLO_MAX_FRAME)
+
+def test_truncated_and_corrupt_frames_rejected():
+    body = zlib.compress(b'{"ok": true}')
+    for broken in (body[:-4], b'not zlib'):
+        with pytest.raises(AgentError):
+            read(raw_frame(broken))
+
+def test_sign_depends_on_token_and_nonce():
+    assert agent.sign(TOKEN, 'abc') == agent.sign(TOKEN, 'abc')
+    assert agent.sign(TOKEN, 'abc') != agent.sign(TOKEN, 'abd')
+    assert agent.sign(TOKEN, 'abc') != agent.sign('other', 'abc')
+
+async def start_agent():
+    server = await serve('127.0.0.1', 0, TOKEN, sample=False)
+    return server, server.sockets[0].getsockname()[1]
+
+async def stop_agent(server, *clients):
+    for client in clients:
+        client.close()
+    server.close()
+    await server.wait_closed()
+
+def test_handshake_accepts_token():
+    async def main():
+        server, port = await start_agent()
+        client = fleet.AgentClient('a', f'127.0.0.1:{port}', TOKEN)
+        try:
+            return await client.call({'op': 'nope'})
+        finally:
+            await stop_agent(server, client)
+    answer = asyncio.run(main())
+    assert answer['ok'] is False and 'nope' in answer['error']
+
+def test_handshake_rejects_wrong_token():
+    async def main():
+        server, port = await start_agent()
+        client = fleet.AgentClient('a', f'127.0.0.1:{port}', 'wrong')
+        try:
+            await client.call({'op': 'snapshot'})
+        finally:
+            await stop_agent(server, client)
+    with pytest.raises(AgentError):
+        asyncio.run(main())
+
+def test_unauthenticated_bomb_closes_connection():
+    async def main():
+        server, port = await start_agent()
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        try:
+            assert 'nonce' in await read_frame(reader)
+            writer.write(raw_frame(zlib.compress(b'{' * (1024 * 1024), 9)))
+            await writer.drain()
+            # Агент закрывает соединение, не распаковывая кадр целиком
+            return await asyncio.wait_for(reader.read(), 5)
+        finally:
+            writer.close()
+            await stop_agent(server)
+    assert asyncio.run(main()) == b''
+
+def test_concurrent_calls_share_one_batch(monkeypatch):
+    batches = []
+
+    async def slow_request(request):
+        await asyncio.sleep(request.get('delay', 0))
+        return {'ok': True, 'result': request['n']}
+
+    async def main():
+        server, port = await start_agent()
+        client = fleet.AgentClient('a', f'127.0.0.1:{port}', TOKEN)
+        original_call = client._call
+
+        async def counting_call(requests):
+            batches.append(len(requests))
+            return await original_call(requests)
+        client._call = counting_call
+        try:
+            first = asyncio.create_task(client.call({'n': 0, 'delay': 0.2}))
+            await asyncio.sleep(0.05)
+            # Пока идет первый пакет, остальные копятся и уходят вместе
+            rest = await asyncio.gather(*(client.call({'n': i}) for i in range(1, 5)))
+            return [await first] + rest
+        finally:
+            await stop_agent(server, client)
+
+    monkeypatch.setattr(agent, 'run_request', slow_request)
+    answers = asyncio.run(main())
+    assert [answer['result'] for answer in answers] == [0, 1, 2, 3, 4]
+    assert batches == [1, 4]
+
+def test_timeout_covers_waiting_for_busy_connection(monkeypatch):
+    async def slow_request(request):
+        await asyncio.sleep(request.get('delay', 0))
+        return {'ok': True, 'result': None}
+
+    async def main():
+        server, port = await start_agent()
+        client = fleet.AgentClient('a', f'127.0.0.1:{port}', TOKEN)
+        try:
+            long_call = asyncio.create_task(client.call({'delay': 1}, timeout=5))
+            await asyncio.sleep(0.05)
+            loop = asyncio.get_running_loop()
+            started = loop.time()
+            with pytest.raises(asyncio.TimeoutError):
+                await client.call({'op': 'snapshot'}, timeout=0.2)
+            waited = loop.time() - started
+            await long_call
+            return waited
+        finally:
+            await stop_agent(server, client)
+
+    monkeypatch.setattr(agent, 'run_request', slow_request)
+    monkeypatch.setattr(config.Config, 'AGENT_TIMEOUT', 5)
+    assert asyncio.run(main()) < 0.5
@@ -0,0 +1,117 @@
+"""Server List Ping: VarInt, пакеты и опрос заглушки minecraft.stub_handler
+
+Запуск из корня репозитория:
+    python -m pytest tests
+"""
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import minecraft
+from minecraft import McError, pack_packet, pack_string, pack_varint, unpack_string, unpack_varint
+
+# Примеры из описания протокола: значение -> байты VarInt
+VARINTS = [
+    (0, b'\x00'),
+    (1, b'\x01'),
+    (127, b'\x7f'),
+    (128, b'\x80\x01'),
+    (255, b'\xff\x01'),
+    (25565, b'\xdd\xc7\x01'),
+    (2097151, b'\xff\xff\x7f'),
+    (2147483647, b'\xff\xff\xff\xff\x07'),
+    (-1, b'\xff\xff\xff\xff\x0f'),
+    (-2147483648, b'\x80\x80\x80\x80\x08'),
+]
+
+@pytest.mark.parametrize('value, data', VARINTS)
+def test_varint(value, data):
+    assert pack_varint(value) == data
+    assert unpack_varint(data) == (value, len(data))
+
+def test_varint_errors():
+    with pytest.raises(McError):
+        unpack_varint(b'\x80\x80')
+    with pytest.raises(McError):
+        unpack_varint(b'\xff\xff\xff\xff\xff\x01')
+
+def test_string_roundtrip():
+    data = pack_string('Привет') + b'tail'
+    assert unpack_string(data) == ('Привет', len(data) - 4)
+    with pytest.raises(McError):
+        unpack_string(pack_varint(10) + b'short')
+
+def read_packet(data):
+    async def main():
+        reader = asyncio.StreamReader()
+        reader.feed_data(data)
+        reader.feed_eof()
+        return await minecraft.read_packet(reader)
+    return asyncio.run(main())
+
+def test_packet_roundtrip():
+    assert read_packet(pack_packet(0x01, b'payload')) == (0x01, b'payload')
+
+def test_packet_length_checked():
+    with pytest.raises(McError):
+        read_packet(pack_varint(0))
+    with pytest.raises(McError):
+        read_packet(pack_varint(minecraft.MAX_PACKET + 1))
+
+def test_handshake_layout():
+    packet_id, body = read_packet(minecraft.handshake('localhost', 25565))
+    assert packet_id == 0x00
+    version, offset = unpack_varint(body)
+    host, offset = unpack_string(body, offset)
+    assert (version, host) == (minecraft.PROTOCOL_VERSION, 'localhost')
+    assert body[offset:] == b'\x63\xdd\x01'  # порт 25565 big-endian, next state 1
+
+def test_motd_text():
+    description = {'text': '§aЗаглушка', 'extra': [{'text': ' §lserver'}, ' bot']}
+    assert minecraft.motd_text(description) == 'Заглушка server bot'
+
+def ping_stub(status):
+    async def main():
+        server = await asyncio.start_server(minecraft.stub_handler(status), '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            return await minecraft.ping('127.0.0.1', port, timeout=2)
+        finally:
+            server.close()
+            await server.wait_closed()
+    return asyncio.run(main())
+
+def test_ping_stub():
+    status = ping_stub(minecraft.STUB_STATUS)
+    assert (status.online, status.max, status.version) == (3, 20, '1.20.4')
+    assert status.motd == 'Заглушка server-bot'
+    assert status.latency >= 0
+    assert '3/20 игроков' in minecraft.format_status(status)
+
+@pytest.mark.parametrize('status', [[1, 2], 'text', None])
+def test_ping_rejects_non_object_status(status):
+    with pytest.raises(McError):
+        ping_stub(status)
+
+def test_ping_tolerates_missing_fields():
+    status = ping_stub({'players': [], 'description': 'hi'})
+    assert (status.online, status.max, status.version, status.motd) == (0, 0, '?', 'hi')
+
+def test_get_status_caches_errors():
+    async def main():
+        server = await asyncio.start_server(minecraft.stub_handler([]), '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            for _ in range(2):
+                with pytest.raises(McError):
+                    await minecraft.get_status('127.0.0.1', port, timeout=2, ttl=60)
+        finally:
+            server.close()
+            await server.wait_closed()
+        return port
+    port = asyncio.run(main())
+    assert isinstance(minecraft._cache.pop(('127.0.0.1', port))[1], McError)